@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of PDF extraction results
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger("PDFExtractor")
+
+# Bump whenever extraction, OCR routing or preprocessing changes what a PDF
+# turns into, so results from older code are not served
+EXTRACTOR_VERSION = "2"
+
+# What is kept per document
+CACHED_FIELDS = ('text', 'pages', 'page_methods', 'parser', 'ocr', 'fallback', 'sentences')
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """Extraction results on disk, keyed by file content hash and extractor version.
+
+    Renamed, moved or duplicated PDFs hit the same entry; a changed file or a
+    new EXTRACTOR_VERSION misses.
+    """
+    def __init__(self, cache_dir, version=EXTRACTOR_VERSION):
+        self.cache_dir = cache_dir
+        self.version = version
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-v{self.version}.json.gz")
+
+    def get(self, digest):
+        """The cached result for a content hash, or None."""
+        path = self._path(digest)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put(self, digest, result, filename=None):
+        """Store the cacheable fields of a result (written atomically)."""
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {field: result[field] for field in CACHED_FIELDS if field in result}
+        entry['filename'] = filename
+        entry['version'] = self.version
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
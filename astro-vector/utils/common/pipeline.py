@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Staged worker pipeline with bounded queues between stages
+"""
+import queue
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("PDFExtractor")
+
+_DONE = object()
+
+class Stage:
+    """One pipeline stage.
+
+    func(payload) returns (name of the next stage, payload), or (None, payload)
+    when the item leaves the pipeline. Stages run on their own worker threads;
+    with processes=True each worker hands its items to the stage's process pool,
+    so CPU-bound stages are not serialized by the GIL. Routing must only move
+    items forward, so a full queue can never wait on itself. queue_size
+    overrides the pipeline's bound on the stage's input queue; 0 leaves it
+    unbounded, so the stages before it never block handing items over.
+    """
+    def __init__(self, name, func, workers=1, processes=False, queue_size=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.processes = processes
+        self.queue_size = queue_size
+
+def run_pipeline(items, stages, queue_size=8):
+    """Run items through the stages (the first stage receives them).
+
+    Yields (index, payload) as each item leaves the pipeline, in completion
+    order; an item whose stage raised comes out with the exception as payload.
+    Every stage reads from a queue of at most queue_size items (or its own
+    Stage.queue_size), so a slow stage holds back the stages before it
+    instead of buffering the corpus.
+    """
+    items = list(items)
+    stages = {stage.name: stage for stage in stages}
+    entry = next(iter(stages))
+    inputs = {name: queue.Queue(maxsize=queue_size if stage.queue_size is None else stage.queue_size)
+              for name, stage in stages.items()}
+    results = queue.Queue()
+    pools = {name: ProcessPoolExecutor(max_workers=stage.workers) if stage.processes else None
+             for name, stage in stages.items()}
+    stopping = threading.Event()
+
+    def work(stage):
+        pool = pools[stage.name]
+        while True:
+            item = inputs[stage.name].get()
+            if item is _DONE:
+                return
+            index, payload = item
+            try:
+                if pool:
+                    target, payload = pool.submit(stage.func, payload).result()
+                else:
+                    target, payload = stage.func(payload)
+                # Routing is guarded too (a bad target or result shape): every
+                # item must reach results, or the consumer waits forever
+                if target is None:
+                    results.put((index, payload))
+                else:
+                    inputs[target].put((index, payload))
+            except Exception as e:
+                if stopping.is_set():
+                    return
+                logger.debug(f"Stage {stage.name} failed on item {index}", exc_info=True)
+                results.put((index, e))
+
+    def feed():
+        for index, payload in enumerate(items):
+            if stopping.is_set():
+                return
+            inputs[entry].put((index, payload))
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for stage in stages.values():
+        threads += [threading.Thread(target=work, args=(stage,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+                    for n in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+
+    finished = False
+    try:
+        for _ in range(len(items)):
+            yield results.get()
+        finished = True
+    finally:
+        if finished:
+            # Every item is out, so the queues are empty and the workers idle
+            for name, stage in stages.items():
+                for _ in range(stage.workers):
+                    inputs[name].put(_DONE)
+            for thread in threads:
+                thread.join()
+        else:
+            # Abandoned (error or interrupt): drop queued work; the daemon threads exit with the process
+            stopping.set()
+        for pool in pools.values():
+            if pool:
+                pool.shutdown(wait=finished, cancel_futures=not finished)
+
+def in_order(results):
+    """Re-sequence (index, payload) pairs from run_pipeline into index order"""
+    pending = {}
+    following = 0
+    for index, payload in results:
+        pending[index] = payload
+        while following in pending:
+            yield following, pending.pop(following)
+            following += 1
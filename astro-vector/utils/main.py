@@ -10,20 +10,100 @@ import logging
 import argparse
 import traceback
 import multiprocessing
+from functools import partial
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 # Import custom modules
 from utils.common.logging_config import setup_logging, download_nltk_resources
-from utils.pdf_processing.extractor import extract_text_from_pdf
-from utils.pdf_processing.enhanced_extractor import extract_with_pdfplumber
-from utils.pdf_processing.scanner_detection import check_if_scanned_pdf
-from utils.pdf_processing.ocr import process_with_ocr
+from utils.common.pipeline import Stage, run_pipeline, in_order
+from utils.common.extraction_cache import ExtractionCache, file_hash
+from utils.pdf_processing.planner import plan_and_extract, join_pages
+from utils.pdf_processing.ocr import ocr_pages, init_ocr_worker
 from utils.text_processing.preprocessor import preprocess_text
-from utils.model.word2vec_trainer import train_word2vec_model
+from utils.model.word2vec_trainer import (train_word2vec_model, update_word2vec_model,
+                                          load_seen_documents, save_seen_documents)
+
+# Documents OCR'd at once; their pages share the OCR pool
+OCR_DOCUMENTS = 2
+
+def extract_stage(task):
+    """Extraction stage: text layer extraction and the decision whether to OCR."""
+    pdf_file, filename = task['path'], task['filename']
+    logger = logging.getLogger("PDFExtractor")
+    logger.info(f"Processing {pdf_file}...")
+    task['started'] = time.time()
+    
+    # Get file size
+    file_size_mb = os.path.getsize(pdf_file) / (1024 * 1024)
+    logger.debug(f"File size: {file_size_mb:.2f} MB")
+    if file_size_mb > 20:
+        logger.info(f"Large file detected ({file_size_mb:.1f}MB): {filename}")
+    
+    # One pass over the document: the planner samples pages for scan
+    # detection and picks the extraction method per page as it goes
+    plan = plan_and_extract(pdf_file)
+    text = plan['text']
+    task['text'] = text
+    task['pages'] = plan['pages']
+    task['page_methods'] = plan['page_methods']
+    task['parser'] = plan['parser']
+    task['fallback'] = plan['parser'] == 'pypdf2' or 'enhanced' in plan['page_methods']
+    logger.debug(f"{filename}: {plan['total_pages']} pages via {plan['parser']}, "
+                 f"methods {dict(Counter(plan['page_methods']))}")
+    
+    # Only the pages without a usable text layer go to OCR; without OCR they
+    # stay missing, and the result is not cached
+    task['ocr_pages'] = plan['ocr_pages']
+    task['ocr_missing'] = list(plan['ocr_pages'])
+    if task['has_ocr'] and plan['ocr_pages']:
+        return 'ocr', task
+    return ('preprocess' if text else None), task
+
+def ocr_stage(task, executor=None):
+    """OCR stage: OCRs the planned pages on the shared pool and merges them into the text."""
+    filename, pages = task['filename'], task['pages']
+    logger = logging.getLogger("PDFExtractor")
+    logger.info(f"OCR for {len(task['ocr_pages'])} of {len(pages)} pages without a usable text layer in {filename}")
+    ocr_texts = ocr_pages(task['path'], task['ocr_pages'], executor=executor)
+    task['ocr_missing'] = [page_num for page_num in task['ocr_pages'] if page_num not in ocr_texts]
+    
+    # Keep the OCR text where it is better than what the text layer gave
+    improved = 0
+    for page_num, ocr_text in ocr_texts.items():
+        if len(ocr_text.strip()) > len(pages[page_num].strip()):
+            pages[page_num] = ocr_text
+            improved += 1
+    if improved:
+        task['text'] = join_pages(pages)
+        task['ocr'] = True
+        # Mostly recognized documents get the OCR-tolerant preprocessing
+        if improved * 2 > len(pages):
+            task['text'] = "[OCR_PROCESSED] " + task['text']
+    logger.info(f"OCR improved {improved} pages of {filename}")
+    return ('preprocess' if task['text'] else None), task
+
+def preprocess_stage(task):
+    """Preprocessing stage: sentences for Word2Vec."""
+    logging.getLogger("PDFExtractor").debug(f"Preprocessing text from {task['filename']}")
+    task['sentences'] = preprocess_text(task['text'])
+    return None, task
 
 def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_output='data/cleaned_text.txt', 
-                     word2vec_file='models/astro_vec_model', vector_size=300, window=5, min_count=5, skip_model=False):
-    """Process all PDFs in a directory and train a Word2Vec model."""
+                     word2vec_file='models/astro_vec_model', vector_size=300, window=5, min_count=5, skip_model=False,
+                     workers=None, ocr_workers=None, queue_size=None, cache_dir='data/cache',
+                     incremental=False, replay_fraction=0.0):
+    """Process all PDFs in a directory and train a Word2Vec model.
+    
+    Files flow through concurrent stages (extraction, OCR, preprocessing), each
+    with its own process pool and a bounded queue in front of it; the raw and
+    cleaned outputs are written in file order as results arrive. Files whose
+    contents are already in the extraction cache (cache_dir, None to disable),
+    or repeat an earlier file of the run, skip the stages entirely. With
+    incremental=True an existing model only continues training on documents it
+    has not seen (plus a replay_fraction sample of the old ones).
+    """
     logger = logging.getLogger("PDFExtractor")
     start_time = time.time()
     logger.info(f"Starting processing of directory: {pdf_dir}")
@@ -44,19 +124,17 @@ def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_ou
         except:
             pdf_files_with_size.append((pdf_file, 0))
     
-    # Sort by size (smallest first)
-    pdf_files_with_size.sort(key=lambda x: x[1])
+    # Sort by size (smallest first), then name so the output order is stable
+    pdf_files_with_size.sort(key=lambda x: (x[1], x[0]))
     pdf_files = [file for file, _ in pdf_files_with_size]
     
     logger.info(f"Found {len(pdf_files)} PDF files. Processing (sorted by size)...")
     
     # Check for optional extraction libraries
-    has_pdfplumber = False
     has_ocr = False
     
     try:
         import pdfplumber
-        has_pdfplumber = True
         logger.info("pdfplumber available for enhanced text extraction")
     except ImportError:
         logger.warning("pdfplumber not available. Install with: pip install pdfplumber")
@@ -69,6 +147,45 @@ def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_ou
     except ImportError:
         logger.warning("OCR not available. Install with: pip install pytesseract pdf2image")
     
+    # Worker pools: extraction and preprocessing use every core by default.
+    # OCR runs page by page on one shared pool of single-threaded tesseract
+    # workers, fed by a few documents at a time
+    cores = multiprocessing.cpu_count()
+    workers = workers or cores
+    ocr_workers = ocr_workers or cores
+    queue_size = queue_size or 2 * workers
+    logger.info(f"Using {workers} extraction/preprocessing workers and {ocr_workers} OCR workers")
+    ocr_pool = ProcessPoolExecutor(max_workers=ocr_workers, initializer=init_ocr_worker) if has_ocr else None
+    stages = [
+        Stage('extract', extract_stage, workers, processes=True),
+        # Unbounded in front of OCR: a run of scanned books waits there (as page
+        # plans, not images) instead of blocking the extraction workers
+        Stage('ocr', partial(ocr_stage, executor=ocr_pool), OCR_DOCUMENTS, queue_size=0),
+        Stage('preprocess', preprocess_stage, workers, processes=True)
+    ]
+    tasks = [{'path': pdf_file, 'filename': os.path.basename(pdf_file), 'has_ocr': has_ocr,
+              'fallback': False, 'ocr': False} for pdf_file in pdf_files]
+    
+    # Content hashes: cached files and repeats of an earlier file skip extraction
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    for task in tqdm(tasks, desc="Hashing PDF files", leave=False):
+        task['digest'] = file_hash(task['path'])
+    copies = Counter(task['digest'] for task in tasks)
+    known = {}    # digest -> cached result, or None while it waits for the pipeline
+    pending = []
+    for task in tasks:
+        digest = task['digest']
+        if digest in known:
+            continue
+        cached = cache.get(digest) if cache else None
+        if cached is not None:
+            known[digest] = cached
+        else:
+            known[digest] = None
+            pending.append(task)
+    logger.info(f"{len(tasks) - len(pending)} files served from the extraction cache or duplicates, "
+                f"{len(pending)} to process")
+    
     # Create output directories if they don't exist
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     os.makedirs(os.path.dirname(cleaned_output), exist_ok=True)
@@ -79,96 +196,76 @@ def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_ou
     skipped_files = 0
     ocr_processed = 0
     fallback_processed = 0
+    cached_files = 0
+    documents = []
     
-    # Save both raw and cleaned text for inspection
-    with open(output_file, 'w', encoding='utf-8') as out_file, \
-         open(cleaned_output, 'w', encoding='utf-8') as clean_file:
+    try:
+        # Save both raw and cleaned text for inspection
+        with open(output_file, 'w', encoding='utf-8') as out_file, \
+             open(cleaned_output, 'w', encoding='utf-8') as clean_file:
         
-        for pdf_file in tqdm(pdf_files, desc="Processing PDF files"):
-            logger.info(f"Processing {pdf_file}...")
-            filename = os.path.basename(pdf_file)
-            file_start_time = time.time()
-            
-            try:
-                # Get file size
-                file_size_mb = os.path.getsize(pdf_file) / (1024 * 1024)
-                logger.debug(f"File size: {file_size_mb:.2f} MB")
+            completed = tqdm(run_pipeline(pending, stages, queue_size), total=len(pending), desc="Processing PDF files")
+            results = in_order(completed)
+            for task in tasks:
+                filename, digest = task['filename'], task['digest']
                 
-                # Extract text with different strategies based on file size and type
-                text = ""
-                
-                # For very large files, sample pages to check if OCR needed
-                if file_size_mb > 20:
-                    logger.info(f"Large file detected ({file_size_mb:.1f}MB): {filename}")
-                    
-                    # Try regular extraction first
-                    text = extract_text_from_pdf(pdf_file)
-                    
-                    # If minimal text extracted, check if OCR is needed
-                    if len(text.strip()) < 1000 and has_ocr:
-                        is_scanned = check_if_scanned_pdf(pdf_file)
-                        if is_scanned:
-                            logger.info(f"Large scanned document detected, using OCR for {filename}")
-                            text = process_with_ocr(pdf_file)
-                            ocr_processed += 1
+                if digest not in known:
+                    # A copy of a file that failed
+                    skipped_files += 1
+                    continue
+                # Pipeline results come out in the same order as the files that needed them
+                if known[digest] is None:
+                    _, result = next(results)
+                    if isinstance(result, Exception):
+                        logger.error(f"Error fully processing {filename}: {result}")
+                        skipped_files += 1
+                        del known[digest]
+                        continue
+                    # Pages still waiting for OCR would be served thin from the cache for good
+                    if cache and not result['ocr_missing']:
+                        cache.put(digest, result, filename)
+                    elif cache:
+                        logger.info(f"Not caching {filename}: {len(result['ocr_missing'])} pages were not OCR'd")
+                    # Keep it only for later copies of the same file
+                    known[digest] = result if copies[digest] > 1 else {}
+                    from_cache = False
                 else:
-                    # Standard extraction for normal files
-                    text = extract_text_from_pdf(pdf_file)
-                
-                # If primary extraction failed, try fallbacks
-                if not text and has_pdfplumber:
-                    logger.info(f"Primary extraction failed, trying pdfplumber for {filename}")
-                    text = extract_with_pdfplumber(pdf_file)
-                    fallback_processed += 1
-                
-                # If still no text and has OCR, try OCR as last resort
-                if (not text or len(text.strip()) < 500) and has_ocr:
-                    is_scanned = check_if_scanned_pdf(pdf_file)
-                    if is_scanned:
-                        logger.info(f"Potential scanned document detected, using OCR for {filename}")
-                        text = process_with_ocr(pdf_file)
-                        ocr_processed += 1
-                    # Even if not detected as scanned, try OCR if almost no text was extracted
-                    elif len(text.strip()) < 100:
-                        logger.info(f"Minimal text extracted, trying OCR as last resort for {filename}")
-                        ocr_text = process_with_ocr(pdf_file)
-                        # Only use OCR text if it's better than what we had
-                        if len(ocr_text.strip()) > len(text.strip()) * 2:  # At least twice as much text
-                            text = ocr_text
-                            ocr_processed += 1
-                            logger.info(f"OCR extraction successful, got {len(text.strip())} chars")
-                        else:
-                            logger.info(f"OCR didn't improve extraction quality, keeping original text")
+                    result = known[digest]
+                    from_cache = True
+                    cached_files += 1
+                task = result
                 
+                fallback_processed += task['fallback']
+                ocr_processed += task['ocr']
+                text = task['text']
                 if not text:
                     logger.warning(f"No text extracted from {filename}, skipping")
                     skipped_files += 1
                     continue
-                
+            
                 # Save raw text for inspection
                 out_file.write(f"\n\n=== {filename} ===\n\n")
                 out_file.write(text)
-                
-                # Preprocess for Word2Vec
-                logger.debug(f"Preprocessing text from {filename}")
-                sentences = preprocess_text(text)
+            
+                sentences = task['sentences']
                 num_sentences = len(sentences)
                 all_sentences.extend(sentences)
-                
+                documents.append((digest, filename, sentences))
+            
                 # Save cleaned text (what will actually be used for Word2Vec)
                 clean_file.write(f"\n\n=== {filename} ===\n\n")
                 for sentence in sentences:
                     clean_file.write(' '.join(sentence) + '\n')
-                
+            
                 processed_files += 1
-                file_time = time.time() - file_start_time
-                logger.info(f"Processed {filename}: {num_sentences} sentences in {file_time:.2f} seconds")
-                
-            except Exception as e:
-                logger.error(f"Error fully processing {filename}: {e}")
-                logger.debug(f"Exception details:", exc_info=True)
-                skipped_files += 1
-                continue
+                if from_cache:
+                    logger.info(f"Processed {filename}: {num_sentences} sentences from the extraction cache")
+                else:
+                    file_time = time.time() - task['started']
+                    logger.info(f"Processed {filename}: {num_sentences} sentences in {file_time:.2f} seconds")
+    finally:
+        if ocr_pool:
+            ocr_pool.shutdown(cancel_futures=True)
     
     logger.info(f"Raw extracted text saved to {output_file}")
     logger.info(f"Cleaned text for Word2Vec saved to {cleaned_output}")
@@ -177,10 +274,36 @@ def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_ou
     logger.info(f"Processing complete in {processing_time:.2f} seconds")
     logger.info(f"Successfully processed {processed_files} files ({ocr_processed} with OCR, {fallback_processed} with fallback)")
     logger.info(f"Skipped {skipped_files} files")
+    logger.info(f"{cached_files} files came from the extraction cache or were duplicates")
     logger.info(f"Found {len(all_sentences)} sentences for Word2Vec training")
     
     # Train Word2Vec model
-    if all_sentences and not skip_model:
+    seen = load_seen_documents(word2vec_file) if incremental and os.path.exists(word2vec_file) else {}
+    if all_sentences and not skip_model and seen:
+        # Incremental: continue training on the documents the model hasn't seen
+        new_documents = {}
+        for digest, filename, sentences in documents:
+            if digest not in seen:
+                new_documents.setdefault(digest, (filename, sentences))
+        if new_documents:
+            logger.info(f"Updating the Word2Vec model with {len(new_documents)} new documents")
+            replay = None
+            if replay_fraction > 0:
+                replay = [sentence for digest, _, sentences in documents if digest in seen for sentence in sentences]
+            model = update_word2vec_model(
+                sentences=[sentence for _, sentences in new_documents.values() for sentence in sentences],
+                model_path=word2vec_file,
+                replay_sentences=replay,
+                replay_fraction=replay_fraction
+            )
+            if model:
+                added = time.strftime('%Y-%m-%d %H:%M:%S')
+                for digest, (filename, sentences) in new_documents.items():
+                    seen[digest] = {'filename': filename, 'sentences': len(sentences), 'added': added}
+                save_seen_documents(word2vec_file, seen)
+        else:
+            logger.info("The Word2Vec model has already seen every document, nothing to update")
+    elif all_sentences and not skip_model:
         model = train_word2vec_model(
             sentences=all_sentences,
             model_path=word2vec_file,
@@ -188,6 +311,11 @@ def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_ou
             window=window,
             min_count=min_count
         )
+        if model:
+            # Record the corpus so later runs can update the model incrementally
+            added = time.strftime('%Y-%m-%d %H:%M:%S')
+            save_seen_documents(word2vec_file, {digest: {'filename': filename, 'sentences': len(sentences), 'added': added}
+                                                for digest, filename, sentences in documents})
     elif skip_model:
         logger.info("Skipping Word2Vec model training as requested")
     else:
@@ -201,6 +329,7 @@ def process_directory(pdf_dir, output_file='data/extracted_text.txt', cleaned_ou
         "skipped_files": skipped_files,
         "ocr_processed": ocr_processed,
         "fallback_processed": fallback_processed,
+        "cached_files": cached_files,
         "total_sentences": len(all_sentences),
         "processing_time": processing_time,
         "total_time": total_time
@@ -225,6 +354,13 @@ def main():
     parser.add_argument('--vector_size', type=int, default=300, help='Dimension of word vectors (default: 300)')
     parser.add_argument('--window', type=int, default=5, help='Context window size (default: 5)')
     parser.add_argument('--min_count', type=int, default=5, help='Minimum word frequency (default: 5)')
+    parser.add_argument('--workers', type=int, default=None, help='Extraction and preprocessing processes (default: all cores)')
+    parser.add_argument('--ocr_workers', type=int, default=None, help='OCR processes, one page each (default: all cores)')
+    parser.add_argument('--cache_dir', type=str, default='data/cache', help='Extraction cache directory (default: data/cache)')
+    parser.add_argument('--no_cache', action='store_true', help='Re-extract every PDF without reading or writing the cache')
+    parser.add_argument('--incremental', action='store_true', help='Update an existing model with unseen documents instead of retraining')
+    parser.add_argument('--replay_fraction', type=float, default=0.0, help='Old sentences mixed into an incremental update, per new sentence (default: 0)')
+    parser.add_argument('--queue_size', type=int, default=None, help='Files queued in front of the extraction and preprocessing stages (default: 2 x workers)')
     
     args = parser.parse_args()
     
@@ -248,6 +384,7 @@ def main():
         logger.info(f"  Vector Size: {args.vector_size}")
         logger.info(f"  Window Size: {args.window}")
         logger.info(f"  Min Word Count: {args.min_count}")
+        logger.info(f"  Incremental: {args.incremental} (replay fraction {args.replay_fraction})")
     
     # Process the directory
     try:
@@ -259,7 +396,13 @@ def main():
             vector_size=args.vector_size,
             window=args.window,
             min_count=args.min_count,
-            skip_model=args.skip_model
+            skip_model=args.skip_model,
+            workers=args.workers,
+            ocr_workers=args.ocr_workers,
+            queue_size=args.queue_size,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            incremental=args.incremental,
+            replay_fraction=args.replay_fraction
         )
         
         # Print completion time and duration
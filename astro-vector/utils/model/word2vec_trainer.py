@@ -3,6 +3,8 @@
 Word2Vec model training for astrological text
 """
 import os
+import json
+import random
 import logging
 import multiprocessing
 import time
@@ -10,6 +12,28 @@ from gensim.models import Word2Vec
 
 logger = logging.getLogger("PDFExtractor")
 
+def log_model_stats(w2v_model):
+    """Log vocabulary size and a few nearest neighbours as a quality check."""
+    # Print some statistics
+    vocab_size = len(w2v_model.wv.index_to_key)
+    logger.info(f"Vocabulary size: {vocab_size} words")
+    
+    # Example of finding similar words to check model quality
+    if vocab_size > 0:
+        try:
+            sample_word = w2v_model.wv.index_to_key[0]
+            similar_words = w2v_model.wv.most_similar(sample_word, topn=5)
+            logger.info(f"Words most similar to '{sample_word}': {similar_words}")
+            
+            # Also try for a common domain-specific word if it exists in vocabulary
+            for domain_word in ['astrology', 'planet', 'zodiac', 'magic', 'occult', 'leo']:
+                if domain_word in w2v_model.wv:
+                    similar = w2v_model.wv.most_similar(domain_word, topn=5)
+                    logger.info(f"Words most similar to '{domain_word}': {similar}")
+                    break
+        except Exception as e:
+            logger.error(f"Couldn't show similar words: {e}")
+
 def train_word2vec_model(sentences, model_path='models/astro_vec_model', 
                         vector_size=300, window=5, min_count=5):
     """Train a Word2Vec model on preprocessed sentences."""
@@ -42,28 +66,74 @@ def train_word2vec_model(sentences, model_path='models/astro_vec_model',
         model_time = time.time() - model_start_time
         logger.info(f"Word2Vec model saved to {model_path} (training took {model_time:.2f} seconds)")
         
-        # Print some statistics
-        vocab_size = len(w2v_model.wv.index_to_key)
-        logger.info(f"Vocabulary size: {vocab_size} words")
-        
-        # Example of finding similar words to check model quality
-        if vocab_size > 0:
-            try:
-                sample_word = w2v_model.wv.index_to_key[0]
-                similar_words = w2v_model.wv.most_similar(sample_word, topn=5)
-                logger.info(f"Words most similar to '{sample_word}': {similar_words}")
-                
-                # Also try for a common domain-specific word if it exists in vocabulary
-                for domain_word in ['astrology', 'planet', 'zodiac', 'magic', 'occult', 'leo']:
-                    if domain_word in w2v_model.wv:
-                        similar = w2v_model.wv.most_similar(domain_word, topn=5)
-                        logger.info(f"Words most similar to '{domain_word}': {similar}")
-                        break
-            except Exception as e:
-                logger.error(f"Couldn't show similar words: {e}")
+        log_model_stats(w2v_model)
         
         return w2v_model
         
     except Exception as e:
         logger.error(f"Error training Word2Vec model: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def documents_path(model_path):
+    """Manifest of the documents a model has been trained on, next to the model."""
+    return f"{model_path}.documents.json"
+
+def load_seen_documents(model_path):
+    """{content hash: {'filename', 'sentences', 'added'}} of the documents the model has seen."""
+    path = documents_path(model_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_seen_documents(model_path, documents):
+    """Write the manifest of seen documents (atomically)."""
+    path = documents_path(model_path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(documents, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+def update_word2vec_model(sentences, model_path='models/astro_vec_model', replay_sentences=None,
+                          replay_fraction=0.0, seed=0):
+    """Continue training a saved Word2Vec model on new sentences.
+    
+    The vocabulary is extended with the new words (counted over the new
+    sentences only, against the model's min_count) and training resumes on
+    the new sentences, optionally mixed with a random sample of
+    replay_sentences (replay_fraction times as many as the new ones) so the
+    old corpus is not forgotten. Cost is proportional to the new data.
+    """
+    if not sentences:
+        logger.warning("No new sentences provided for Word2Vec update.")
+        return None
+    
+    logger.info(f"Updating Word2Vec model {model_path} with {len(sentences)} new sentences...")
+    model_start_time = time.time()
+    
+    try:
+        w2v_model = Word2Vec.load(model_path)
+        old_vocab_size = len(w2v_model.wv.index_to_key)
+        
+        corpus = list(sentences)
+        if replay_sentences and replay_fraction > 0:
+            rng = random.Random(seed)
+            replay_count = min(len(replay_sentences), int(len(sentences) * replay_fraction))
+            corpus += rng.sample(replay_sentences, replay_count)
+            rng.shuffle(corpus)
+            logger.info(f"Replaying {replay_count} sentences of earlier documents")
+        
+        w2v_model.build_vocab(sentences, update=True)
+        w2v_model.train(corpus, total_examples=len(corpus), epochs=w2v_model.epochs)
+        
+        w2v_model.save(model_path)
+        model_time = time.time() - model_start_time
+        logger.info(f"Word2Vec model updated at {model_path} (training took {model_time:.2f} seconds)")
+        logger.info(f"Vocabulary grew from {old_vocab_size} to {len(w2v_model.wv.index_to_key)} words")
+        log_model_stats(w2v_model)
+        
+        return w2v_model
+        
+    except Exception as e:
+        logger.error(f"Error updating Word2Vec model: {e}")
+        return None
@@ -27,6 +27,60 @@ def is_valid_pdf(file_obj):
     except Exception:
         return False
                
+def clean_extracted_text(text):
+    """Normalize whitespace and strip page headers/footers from joined page texts."""
+    # Clean up extra spaces and normalize text
+    text = re.sub(r'\s+', ' ', text).strip()
+    
+    # Remove common header/footer patterns
+    text = re.sub(r'\[\w+\s+\d+\]', '', text)  # Remove [Page XX] patterns
+    text = re.sub(r'Page \d+ of \d+', '', text)  # Remove "Page X of Y" patterns
+    text = re.sub(r'^\d+$', '', text, flags=re.MULTILINE)  # Remove standalone page numbers
+    
+    # Fix common PDF extraction issues
+    text = re.sub(r'([a-z])- ([a-z])', r'\1\2', text)  # Fix hyphenated words
+    return text
+
+def pypdf2_page_text(page):
+    """Text of one PyPDF2 page, falling back to its raw content streams."""
+    # Try regular extract_text
+    page_text = page.extract_text() or ""
+    
+    # If extract_text doesn't work, try raw content streams
+    if not page_text.strip() and "/Contents" in page:
+        try:
+            content = page["/Contents"].get_data()
+            # Improved pattern for extracting text from content streams
+            text_pattern = re.compile(rb'(\(.*?\))')
+            matches = text_pattern.findall(content)
+            
+            # Better handling of content stream text
+            if matches:
+                try:
+                    content_text = b' '.join(matches).decode('utf-8', errors='replace')
+                except:
+                    content_text = b' '.join(matches).decode('latin-1', errors='replace')
+                
+                # Clean up escaped chars and common PDF markup
+                content_text = re.sub(r'\\(\d{3}|n|r|t|f|b|\\|\(|\))', ' ', content_text)
+                page_text = content_text
+        except Exception as e:
+            logger.debug(f"Error extracting content stream: {e}")
+    
+    # If still no text, try more aggressive content extraction
+    if not page_text.strip():
+        try:
+            # Try to extract all string objects from the page
+            if "/Resources" in page and "/Font" in page["/Resources"]:
+                raw_objects = str(page.get_object())
+                # Extract anything that looks like text
+                text_matches = re.findall(r'\((.*?)\)', raw_objects)
+                if text_matches:
+                    page_text = " ".join(text_matches)
+        except:
+            pass
+    return page_text
+
 def extract_text_from_pdf(pdf_path):
     """Extract text from a PDF file with improved extraction techniques."""
     text = ""
@@ -125,42 +179,7 @@ def extract_text_from_pdf(pdf_path):
                 try:
                     page = pdf_reader.pages[page_num]
                     
-                    # Try regular extract_text
-                    page_text = page.extract_text() or ""
-                    
-                    # If extract_text doesn't work, try raw content streams
-                    if not page_text.strip() and "/Contents" in page:
-                        try:
-                            content = page["/Contents"].get_data()
-                            # Improved pattern for extracting text from content streams
-                            text_pattern = re.compile(rb'(\(.*?\))')
-                            matches = text_pattern.findall(content)
-                            
-                            # Better handling of content stream text
-                            if matches:
-                                try:
-                                    content_text = b' '.join(matches).decode('utf-8', errors='replace')
-                                except:
-                                    content_text = b' '.join(matches).decode('latin-1', errors='replace')
-                                
-                                # Clean up escaped chars and common PDF markup
-                                content_text = re.sub(r'\\(\d{3}|n|r|t|f|b|\\|\(|\))', ' ', content_text)
-                                page_text = content_text
-                        except Exception as e:
-                            logger.debug(f"Error extracting content stream: {e}")
-                    
-                    # If still no text, try more aggressive content extraction
-                    if not page_text.strip():
-                        try:
-                            # Try to extract all string objects from the page
-                            if "/Resources" in page and "/Font" in page["/Resources"]:
-                                raw_objects = str(page.get_object())
-                                # Extract anything that looks like text
-                                text_matches = re.findall(r'\((.*?)\)', raw_objects)
-                                if text_matches:
-                                    page_text = " ".join(text_matches)
-                        except:
-                            pass
+                    page_text = pypdf2_page_text(page)
                             
                     if page_text:
                         # Add paragraph markers and clean up
@@ -171,16 +190,7 @@ def extract_text_from_pdf(pdf_path):
                     logger.error(f"Error processing page {page_num} in {pdf_path}: {e}")
                     continue
         
-        # Clean up extra spaces and normalize text
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Remove common header/footer patterns
-        text = re.sub(r'\[\w+\s+\d+\]', '', text)  # Remove [Page XX] patterns
-        text = re.sub(r'Page \d+ of \d+', '', text)  # Remove "Page X of Y" patterns
-        text = re.sub(r'^\d+$', '', text, flags=re.MULTILINE)  # Remove standalone page numbers
-        
-        # Fix common PDF extraction issues
-        text = re.sub(r'([a-z])- ([a-z])', r'\1\2', text)  # Fix hyphenated words
+        text = clean_extracted_text(text)
         
         logger.debug(f"Extracted {len(text)} characters from {pdf_path}")
         
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Single-pass extraction planner: opens each PDF once and picks the extraction
+method per document and per page
+"""
+import os
+import re
+import logging
+import contextlib
+import PyPDF2
+from tqdm import tqdm
+from utils.pdf_processing.extractor import is_valid_pdf, clean_extracted_text, pypdf2_page_text
+from utils.pdf_processing.scanner_detection import sample_page_numbers, page_has_images, looks_scanned
+
+logger = logging.getLogger("PDFExtractor")
+
+# Pages with less text than this get the extra extraction attempts, and are
+# left to OCR when they carry images
+MIN_PAGE_TEXT = 100
+
+def _plumber_page(page, text):
+    """Best text of a pdfplumber page given its standard extraction, and the method that produced it."""
+    if len(text.strip()) >= MIN_PAGE_TEXT:
+        return text, 'text'
+    # Little text: try looser character grouping, then tables
+    candidates = [text]
+    try:
+        candidates.append(page.extract_text(x_tolerance=3, y_tolerance=3) or "")
+    except Exception:
+        pass
+    try:
+        table_text = ""
+        for table in page.extract_tables() or []:
+            for row in table:
+                table_text += " ".join([str(cell or "") for cell in row]) + " "
+        candidates.append(table_text)
+    except Exception:
+        pass
+    best = max(candidates, key=lambda candidate: len(candidate.strip()))
+    return best, ('text' if best is text else 'enhanced')
+
+def _open_plumber(pdf_path):
+    try:
+        import pdfplumber
+    except ImportError:
+        return None
+    try:
+        return pdfplumber.open(pdf_path)
+    except Exception as e:
+        logger.error(f"pdfplumber failed: {e}")
+        return None
+
+def _pypdf2_pages(pdf_path, stack):
+    """Text of a page by number through PyPDF2, opening the file on first use.
+
+    pdfplumber's fallback for single pages: only documents with a thin or
+    failed page pay for the second parse.
+    """
+    reader = None
+
+    def text_of(page_num):
+        nonlocal reader
+        if reader is None:
+            reader = PyPDF2.PdfReader(stack.enter_context(open(pdf_path, 'rb')))
+        return pypdf2_page_text(reader.pages[page_num])
+    return text_of
+
+def plan_and_extract(pdf_path):
+    """Extract a PDF in a single pass, choosing the method as it goes.
+
+    The document is opened once (pdfplumber, or PyPDF2 when pdfplumber is
+    missing or cannot parse it). A sample of pages decides whether the
+    document is scanned; their parsed text is reused rather than extracted
+    again. Every page then gets its standard text, the extra tolerance/table
+    attempts only when that text is thin, PyPDF2's text of the same page when
+    pdfplumber still has little or fails on it, and is marked for OCR when it
+    is still thin and carries images (or the whole document looks scanned).
+
+    Returns a dict with the cleaned 'text', per page 'pages' texts and
+    'page_methods' ('text', 'enhanced', 'pypdf2' or 'ocr'), the 'ocr_pages'
+    (0-based), 'scanned', 'total_pages' and the 'parser' used.
+    """
+    plan = {'text': "", 'pages': [], 'page_methods': [], 'ocr_pages': [], 'scanned': False,
+            'total_pages': 0, 'parser': None}
+    try:
+        with open(pdf_path, 'rb') as file:
+            if not is_valid_pdf(file):
+                logger.warning(f"Warning: {pdf_path} does not appear to be a valid PDF file")
+                return plan
+
+        file_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+        pdf = _open_plumber(pdf_path)
+        if pdf is not None:
+            with pdf, contextlib.ExitStack() as stack:
+                _plan_pages(plan, pdf.pages, 'pdfplumber', file_size_mb,
+                            text_of=lambda page: page.extract_text() or "",
+                            images_of=lambda page: bool(page.images),
+                            best_of=_plumber_page,
+                            fallback_of=_pypdf2_pages(pdf_path, stack))
+        else:
+            with open(pdf_path, 'rb') as file:
+                reader = PyPDF2.PdfReader(file)
+                _plan_pages(plan, reader.pages, 'pypdf2', file_size_mb,
+                            text_of=pypdf2_page_text,
+                            images_of=page_has_images,
+                            best_of=lambda page, text: (text, 'pypdf2'))
+    except Exception as e:
+        logger.error(f"Error processing {pdf_path}: {e}")
+
+    if plan['total_pages'] == 0:
+        logger.warning(f"Warning: {pdf_path} contains no pages")
+
+    plan['text'] = join_pages(plan['pages'])
+    logger.debug(f"Extracted {len(plan['text'])} characters from {pdf_path} with {plan['parser']} "
+                 f"({len(plan['ocr_pages'])} of {plan['total_pages']} pages left for OCR)")
+    return plan
+
+def join_pages(pages):
+    """One cleaned text from page texts, with paragraph markers."""
+    joined = ""
+    for page_text in pages:
+        if page_text:
+            page_text = re.sub(r'\n\s*\n', ' [PARA] ', page_text)
+            page_text = re.sub(r'\n', ' ', page_text)
+            joined += page_text + " "
+    return clean_extracted_text(joined)
+
+def _plan_pages(plan, pages, parser, file_size_mb, text_of, images_of, best_of, fallback_of=None):
+    """Sample, decide and extract every page of one open document into plan.
+
+    fallback_of(page_num), when given, is tried on pages that are still thin
+    or failed before they are left to OCR.
+    """
+    total_pages = len(pages)
+    plan['parser'] = parser
+    plan['total_pages'] = total_pages
+    if total_pages == 0:
+        return
+
+    # Scan detection on a sample of pages, keeping what was parsed
+    texts, images = {}, {}
+    for page_num in sample_page_numbers(total_pages):
+        try:
+            page = pages[page_num]
+            text, has_images = text_of(page), images_of(page)
+        except Exception as e:
+            # Left to the page loop, which records the failure or falls back
+            logger.debug(f"Could not sample page {page_num} with {parser}: {e}")
+            continue
+        texts[page_num], images[page_num] = text, has_images
+    plan['scanned'] = looks_scanned([len(texts[n].strip()) for n in texts], any(images.values()),
+                                    total_pages, file_size_mb)
+    if plan['scanned']:
+        logger.debug(f"Sampled pages look scanned; thin pages will be routed to OCR")
+
+    for page_num in tqdm(range(total_pages), desc=f"Extracting with {parser}", leave=False):
+        page = None
+        try:
+            page = pages[page_num]
+            text = texts.pop(page_num) if page_num in texts else text_of(page)
+            text, method = best_of(page, text)
+        except Exception as e:
+            logger.error(f"Error processing page {page_num} with {parser}: {e}")
+            text, method = "", 'failed'
+        if len(text.strip()) < MIN_PAGE_TEXT and fallback_of is not None:
+            try:
+                fallback = fallback_of(page_num)
+                if len(fallback.strip()) > len(text.strip()):
+                    text, method = fallback, 'pypdf2'
+            except Exception as e:
+                logger.debug(f"PyPDF2 fallback failed on page {page_num}: {e}")
+        if len(text.strip()) < MIN_PAGE_TEXT and page is not None:
+            try:
+                has_images = images.pop(page_num) if page_num in images else images_of(page)
+            except Exception as e:
+                logger.error(f"Error checking page {page_num} for images with {parser}: {e}")
+                has_images = False
+            if has_images or plan['scanned']:
+                method = 'ocr'
+                plan['ocr_pages'].append(page_num)
+        if parser == 'pdfplumber' and page is not None:
+            # Drop the page's parsed layout objects once it is done
+            with contextlib.suppress(Exception):
+                page.flush_cache()
+        plan['pages'].append(text)
+        plan['page_methods'].append(method)
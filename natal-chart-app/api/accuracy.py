@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Differential accuracy harness for the fast chart paths.
+
+Every fast path (the batch ChartFrame, the analytic Alcabitus houses used by
+tiles and validity windows, the interpolated and analytic precision tiers)
+is run on a seeded sample of moments and places (ordinary latitudes plus the equator,
+the polar circles and beyond) and compared with the reference AstroChart: body and Ascendant longitudes, house cusps, signs, house
+assignments and the aspect list. Results are split into temperate and polar
+latitude bands, the report gives each path's speed next to its error
+distributions and mismatch rates, and the exit status is 1 when any path is
+outside its tolerances. The precision tiers are also timed through the API's
+chart computation, and a fast tier that is not cheaper than exact fails too.
+
+    python accuracy.py --samples 500 --seed 0
+    python accuracy.py --tolerance interpolated.polar.position_max=2 --json accuracy.json
+    python loadtest.py replay traffic.jsonl --spawn --accuracy 500
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+import numpy as np
+from typing import Callable, Dict, List
+
+import ephemeris
+import precision
+from chartframe import ASCENDANT, ASPECT_NAMES, ChartFrame
+
+# Latitudes that break naive house formulas: the equator, either side of the
+# polar circles (beyond them the Ascendant degree can be circumpolar) and
+# close to the poles
+EDGE_LATITUDES = [0.0, 66.0, -66.0, 66.56, -66.56, 67.0, -67.0, 80.0, -80.0, 89.9, -89.9]
+POLAR_CIRCLE = 66.56
+
+START_YEAR, END_YEAR = 1900, 2050   # range of the analytic tier's fit
+
+POINTS = ephemeris.BODIES + [ASCENDANT]
+
+METRICS = ['position_max', 'cusp_max', 'sign_rate', 'house_rate', 'aspect_rate']
+
+# Per path and latitude band: worst position and cusp error (arc-seconds)
+# and the share of charts with a differing sign, house or aspect list.
+# Polar charts are held to the same limits: the fast paths use the Swiss
+# Ephemeris Ascendant and Alcabitus rules there too.
+DEFAULT_TOLERANCES = {
+    'chartframe': {
+        'temperate': {'position_max': 1.0, 'cusp_max': 1.0, 'sign_rate': 0.0, 'house_rate': 0.0, 'aspect_rate': 0.0},
+        'polar': {'position_max': 1.0, 'cusp_max': 1.0, 'sign_rate': 0.0, 'house_rate': 0.0, 'aspect_rate': 0.0}
+    },
+    'analytic_houses': {
+        'temperate': {'position_max': 1.0, 'cusp_max': 5.0, 'sign_rate': 0.0, 'house_rate': 0.01, 'aspect_rate': 0.01},
+        'polar': {'position_max': 1.0, 'cusp_max': 5.0, 'sign_rate': 0.0, 'house_rate': 0.01, 'aspect_rate': 0.01}
+    },
+    'interpolated': {
+        'temperate': {'position_max': 10.0, 'cusp_max': 5.0, 'sign_rate': 0.01, 'house_rate': 0.02, 'aspect_rate': 0.02},
+        'polar': {'position_max': 10.0, 'cusp_max': 5.0, 'sign_rate': 0.01, 'house_rate': 0.02, 'aspect_rate': 0.02}
+    },
+    'analytic': {
+        'temperate': {'position_max': 900.0, 'cusp_max': 5.0, 'sign_rate': 0.05, 'house_rate': 0.1, 'aspect_rate': 0.3},
+        'polar': {'position_max': 900.0, 'cusp_max': 5.0, 'sign_rate': 0.05, 'house_rate': 0.1, 'aspect_rate': 0.3}
+    }
+}
+
+
+def sample_inputs(count: int, seed: int) -> List[dict]:
+    """Seeded chart inputs: mostly random moments and places, a tenth at edge latitudes"""
+    rng = np.random.default_rng(seed)
+    start, end = ephemeris.julian_day(f"{START_YEAR}-01-01", '00:00'), ephemeris.julian_day(f"{END_YEAR}-12-31", '23:59')
+    samples = []
+    for n in range(count):
+        date, time_of_day = ephemeris.jd_to_date_time(rng.uniform(start, end))
+        if n % 10 == 9:
+            lat = float(EDGE_LATITUDES[(n // 10) % len(EDGE_LATITUDES)])
+        else:
+            lat = round(float(np.degrees(np.arcsin(rng.uniform(-1, 1)))), 4)   # uniform over the sphere
+        lon = round(float(rng.uniform(-180, 180)), 4)
+        samples.append({'date': date, 'time': time_of_day, 'lat': lat, 'lon': lon,
+                        'jd': ephemeris.julian_day(date, time_of_day)})
+    return samples
+
+
+def _band(sample: dict) -> str:
+    return 'polar' if abs(sample['lat']) > POLAR_CIRCLE else 'temperate'
+
+
+def _aspect_set(aspects) -> set:
+    """Aspects as order-free (pair, type) entries"""
+    return {(frozenset((first, second)), kind) for first, second, kind in aspects}
+
+
+# === Reference === #
+
+def _house_of(lon: float, cusps: List[float]) -> int:
+    """House (1-12) whose cusp-to-cusp span contains lon"""
+    for h in range(12):
+        if (lon - cusps[h]) % 360.0 < (cusps[(h + 1) % 12] - cusps[h]) % 360.0:
+            return h + 1
+    return 12
+
+
+def reference_chart(sample: dict) -> dict:
+    """Points, cusps, houses and aspects of one sample from AstroChart.
+
+    Houses are looked up in the reference cusps directly, since AstroChart's
+    own house numbers misplace points in the house spanning 0 Aries, and the
+    Ascendant's conjunction with itself (it is listed twice) is dropped.
+    Both quirks are counted so the report can show them.
+    """
+    from natal import AstroChart
+    chart = AstroChart(sample['date'].replace('-', '/'), sample['time'], sample['lat'], sample['lon'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        points = chart.get_all_points()
+        cusps = chart.get_house_cusps()
+        aspects = chart.calculate_aspects()
+    longitude = np.array([points[name].longitude for name in POINTS])
+    cusps = [cusps[f"House{h + 1}"] for h in range(12)]
+    house = np.array([_house_of(lon, cusps) for lon in longitude[:-1]] + [1])
+    return {
+        'longitude': longitude,
+        'sign': [points[name].sign for name in POINTS],
+        'house': house,
+        'cusps': np.array(cusps),
+        'aspects': _aspect_set((a.planet1, a.planet2, a.aspect_type) for a in aspects if a.planet1 != a.planet2),
+        'house_numbering': bool((np.array([points[name].house for name in POINTS]) != house).any()),
+        'self_aspect': any(a.planet1 == a.planet2 for a in aspects)
+    }
+
+
+# === Fast paths === #
+
+def _analytic_house_frame(jds, lats, lons) -> ChartFrame:
+    """Exact positions with the vectorized Alcabitus cusps (as in tiles and validity)"""
+    frame = ChartFrame.compute(jds, lats, lons)
+    eps = np.array([ephemeris.obliquity(jd) for jd in frame.jd])
+    armc = np.array([ephemeris.sidereal_time(jd) for jd in frame.jd]) + frame.lon
+    frame.asc, frame.mc = ephemeris.ascendant_mc(armc, frame.lat, eps)
+    frame.cusps = ephemeris.alcabitus_cusps(armc, frame.lat, eps)
+    with np.errstate(invalid='ignore'):
+        frame.house = ephemeris.assign_houses(frame.longitude, frame.cusps)
+    for key, value in ChartFrame._aspect_columns(np.vstack([frame.longitude, frame.asc])).items():
+        setattr(frame, key, value)
+    return frame
+
+
+def _tier_charts(tier: str) -> Callable:
+    def compute(jds, lats, lons) -> List[precision.FastChart]:
+        return [precision.fast_chart(jd, lat, lon, tier) for jd, lat, lon in zip(jds, lats, lons)]
+    return compute
+
+
+FAST_PATHS = {
+    'chartframe': lambda jds, lats, lons: ChartFrame.compute(jds, lats, lons),
+    'analytic_houses': _analytic_house_frame,
+    'interpolated': _tier_charts('interpolated'),
+    'analytic': _tier_charts('analytic')
+}
+
+
+def _fast_chart_row(chart: precision.FastChart) -> dict:
+    longitude = np.append(chart.longitude, chart.asc)
+    return {
+        'longitude': longitude,
+        'sign': [ephemeris.SIGNS[s] for s in ephemeris.sign_index(longitude)],
+        'house': np.append(chart.house, 1),
+        'cusps': np.array(chart.cusps),
+        'aspects': _aspect_set((first, second, kind) for first, second, kind, _, _ in chart.aspects)
+    }
+
+
+def _frame_row(frames, i: int) -> dict:
+    """Sample i of a path's output (one batch frame, or a chart per sample)"""
+    if isinstance(frames, list) and isinstance(frames[i], precision.FastChart):
+        return _fast_chart_row(frames[i])
+    frame, row = (frames[i], 0) if isinstance(frames, list) else (frames, i)
+    names = frame.aspect_points
+    lo, hi = frame.aspect_offsets[row], frame.aspect_offsets[row + 1]
+    longitude = np.append(frame.longitude[:, row], frame.asc[row])
+    return {
+        'longitude': longitude,
+        'sign': [ephemeris.SIGNS[s] for s in ephemeris.sign_index(longitude)],
+        'house': np.append(frame.house[:, row], 1),
+        'cusps': frame.cusps[:, row],
+        'aspects': _aspect_set((names[frame.aspect_point1[a]], names[frame.aspect_point2[a]],
+                                ASPECT_NAMES[frame.aspect_type[a]]) for a in range(lo, hi))
+    }
+
+
+# === Comparison === #
+
+def _distribution(errors: List[np.ndarray]) -> Dict[str, float]:
+    if not errors:
+        return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+    errors = np.concatenate(errors)
+    p50, p99 = np.percentile(errors, [50, 99])
+    return {'p50': round(float(p50), 3), 'p99': round(float(p99), 3), 'max': round(float(errors.max()), 3)}
+
+
+def _band_metrics(rows: List[tuple]) -> dict:
+    """Error distributions and mismatch rates over (sample, path row, reference) triples"""
+    position_errors, cusp_errors = [], []
+    counts = {'sign': 0, 'house': 0, 'aspect': 0, 'no_cusps': 0}
+    examples = {}
+    for sample, row, reference in rows:
+        position_errors.append(np.abs(ephemeris.signed_difference(row['longitude'], reference['longitude'])) * 3600)
+        mismatches = {'sign': row['sign'] != reference['sign'],
+                      'aspect': row['aspects'] != reference['aspects']}
+        if np.isfinite(row['cusps']).all():
+            cusp_errors.append(np.abs(ephemeris.signed_difference(row['cusps'], reference['cusps'])) * 3600)
+            mismatches['house'] = bool((row['house'] != reference['house']).any())
+        else:
+            # No cusps where the reference has some: every house is unknown
+            counts['no_cusps'] += 1
+            mismatches['house'] = True
+        for kind, mismatch in mismatches.items():
+            if mismatch:
+                counts[kind] += 1
+                examples.setdefault(kind, {key: sample[key] for key in ('date', 'time', 'lat', 'lon')})
+
+    charts = max(len(rows), 1)
+    position, cusp = _distribution(position_errors), _distribution(cusp_errors)
+    return {
+        'charts': len(rows),
+        'position_arcsec': position,
+        'cusp_arcsec': cusp,
+        'position_max': position['max'],
+        'cusp_max': cusp['max'],
+        'sign_rate': counts['sign'] / charts,
+        'house_rate': counts['house'] / charts,
+        'aspect_rate': counts['aspect'] / charts,
+        'no_cusps': counts['no_cusps'],
+        'examples': examples
+    }
+
+
+def compare(samples: List[dict], references: List[dict], frames) -> Dict[str, dict]:
+    """Metrics of one path's output against the references, per latitude band"""
+    bands = {'temperate': [], 'polar': []}
+    for i, (sample, reference) in enumerate(zip(samples, references)):
+        if reference is not None:
+            bands[_band(sample)].append((sample, _frame_row(frames, i), reference))
+    return {band: _band_metrics(rows) for band, rows in bands.items()}
+
+
+def check(bands: Dict[str, dict], tolerances: Dict[str, Dict[str, float]]) -> List[str]:
+    """Tolerance violations of one path"""
+    return [f"{band}.{metric} {bands[band][metric]:g} > {limit:g}"
+            for band, limits in tolerances.items() if bands[band]['charts']
+            for metric, limit in limits.items() if bands[band][metric] > limit]
+
+
+# === Tier benchmark === #
+
+# The fields of a /quick-chart and of a full /chart (validity is timed by the load test)
+BENCHMARK_FIELDS = {'quick': ['houses', 'points'],
+                    'full': ['points', 'houses', 'aspects', 'essential_dignities']}
+
+
+def benchmark(samples: List[dict]) -> Dict[str, dict]:
+    """Time the API's chart computation per precision tier on the samples.
+
+    Each tier runs natal.chart_result over the samples twice per field set:
+    the first pass pays for cold caches (the interpolated tier's daily
+    samples), the second is what a scrubbing client sees. Returns
+    {tier: {fields: {'cold': us, 'warm': us}}}.
+    """
+    from natal import chart_result
+    requests = [{'date': s['date'], 'time': s['time'], 'lat': s['lat'], 'lon': s['lon']} for s in samples]
+    timings = {}
+    for tier in precision.TIERS:
+        precision.day_samples.clear()
+        timings[tier] = {}
+        for name, fields in BENCHMARK_FIELDS.items():
+            passes = []
+            for _ in range(2):
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for data in requests:
+                        chart_result(data, fields, tier)
+                passes.append(round((time.perf_counter() - started) / max(len(requests), 1) * 1e6, 1))
+            timings[tier][name] = {'cold': passes[0], 'warm': passes[1]}
+    return timings
+
+
+def check_speed(timings: Dict[str, dict]) -> List[str]:
+    """Fast tiers that are not cheaper than the exact one (warm caches)"""
+    exact = timings['exact']
+    return [f"{tier} {name} {values['warm']:g}us >= exact {exact[name]['warm']:g}us"
+            for tier, by_fields in timings.items() if tier != 'exact'
+            for name, values in by_fields.items() if values['warm'] >= exact[name]['warm']]
+
+
+def run(count: int = 500, seed: int = 0, paths: List[str] = None,
+        tolerances: Dict[str, Dict[str, Dict[str, float]]] = None, timing: bool = True) -> dict:
+    """Compare the fast paths with AstroChart on count seeded samples; returns the full report.
+
+    With timing, the precision tiers are also benchmarked on the same
+    samples and a fast tier slower than exact fails the run.
+    """
+    paths = paths or list(FAST_PATHS)
+    tolerances = tolerances or DEFAULT_TOLERANCES
+    samples = sample_inputs(count, seed)
+
+    started = time.perf_counter()
+    references = []
+    for sample in samples:
+        try:
+            references.append(reference_chart(sample))
+        except Exception:
+            references.append(None)
+    valid = [reference for reference in references if reference is not None]
+    report = {
+        'samples': count,
+        'seed': seed,
+        'reference': {
+            'us_per_chart': round((time.perf_counter() - started) / count * 1e6, 1),
+            'failed': count - len(valid),
+            'house_numbering': sum(reference['house_numbering'] for reference in valid),
+            'self_aspect': sum(reference['self_aspect'] for reference in valid)
+        },
+        'paths': {}
+    }
+
+    jds = np.array([s['jd'] for s in samples])
+    lats = np.array([s['lat'] for s in samples])
+    lons = np.array([s['lon'] for s in samples])
+    for name in paths:
+        started = time.perf_counter()
+        frames = FAST_PATHS[name](jds, lats, lons)
+        seconds = time.perf_counter() - started
+        bands = compare(samples, references, frames)
+        report['paths'][name] = {
+            'us_per_chart': round(seconds / count * 1e6, 1),
+            'bands': bands,
+            'failures': check(bands, tolerances.get(name, {}))
+        }
+    if timing:
+        report['tiers'] = benchmark(samples)
+        report['tier_failures'] = check_speed(report['tiers'])
+    # A run that compared nothing has not passed
+    report['passed'] = (bool(valid) and not any(result['failures'] for result in report['paths'].values())
+                        and not report.get('tier_failures'))
+    return report
+
+
+def format_report(report: dict) -> str:
+    reference = report['reference']
+    lines = [f"{report['samples']} samples (seed {report['seed']}); reference AstroChart "
+             f"{reference['us_per_chart']:.0f}us/chart, failed on {reference['failed']}, "
+             f"own house numbers wrong on {reference['house_numbering']}, "
+             f"Ascendant self-aspect on {reference['self_aspect']}"]
+    for name, result in report['paths'].items():
+        speedup = reference['us_per_chart'] / max(result['us_per_chart'], 1e-9)
+        lines.append(f"{name}: {result['us_per_chart']:.0f}us/chart ({speedup:.1f}x) "
+                     f"{'FAIL: ' + '; '.join(result['failures']) if result['failures'] else 'ok'}")
+        for band, metrics in result['bands'].items():
+            if not metrics['charts']:
+                continue
+            position, cusp = metrics['position_arcsec'], metrics['cusp_arcsec']
+            lines.append(
+                f"  {band:9s} {metrics['charts']:5d} charts | "
+                f"position p50 {position['p50']:g}\" p99 {position['p99']:g}\" max {position['max']:g}\" | "
+                f"cusps p50 {cusp['p50']:g}\" p99 {cusp['p99']:g}\" max {cusp['max']:g}\" | "
+                f"sign {metrics['sign_rate']:.2%} house {metrics['house_rate']:.2%} "
+                f"aspects {metrics['aspect_rate']:.2%}"
+                + (f" | no cusps on {metrics['no_cusps']}" if metrics['no_cusps'] else ''))
+            for kind, sample in metrics['examples'].items():
+                lines.append(f"  {'':9s} first {kind} mismatch: {json.dumps(sample)}")
+    if 'tiers' in report:
+        lines.append('tiers (us/chart through natal.chart_result, cold/warm): '
+                     + ('FAIL: ' + '; '.join(report['tier_failures']) if report['tier_failures'] else 'ok'))
+        for tier, by_fields in report['tiers'].items():
+            lines.append(f"  {tier:12s} " + ' | '.join(
+                f"{name} {values['cold']:g}/{values['warm']:g}" for name, values in by_fields.items()))
+    return '\n'.join(lines)
+
+
+def parse_tolerances(items: List[str]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """DEFAULT_TOLERANCES overridden by 'path.band.metric=value' items"""
+    tolerances = {path: {band: dict(limits) for band, limits in bands.items()}
+                  for path, bands in DEFAULT_TOLERANCES.items()}
+    for item in items:
+        key, _, value = item.partition('=')
+        parts = key.split('.')
+        if len(parts) != 3 or parts[0] not in FAST_PATHS or parts[1] not in ('temperate', 'polar') \
+                or parts[2] not in METRICS:
+            raise ValueError(f"Bad tolerance {item!r}; use path.band.metric=value with a path in "
+                             f"{list(FAST_PATHS)}, band temperate or polar and a metric in {METRICS}")
+        tolerances.setdefault(parts[0], {}).setdefault(parts[1], {})[parts[2]] = float(value)
+    return tolerances
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = ''):
+    """Harness options, shared with the load generator's --accuracy run"""
+    parser.add_argument(f'--{prefix}seed', type=int, default=0, help='Seed of the accuracy samples')
+    parser.add_argument(f'--{prefix}paths', nargs='+', choices=list(FAST_PATHS), help='Paths to check (default all)')
+    parser.add_argument(f'--{prefix}tolerance', action='append', default=[],
+                        help='path.band.metric=value, e.g. interpolated.polar.position_max=2 (repeatable)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the fast chart paths with AstroChart')
+    parser.add_argument('--samples', type=int, default=500)
+    add_arguments(parser)
+    parser.add_argument('--json', help='Also write the full report to this file')
+    parser.add_argument('--no-benchmark', action='store_true', help='Skip timing the precision tiers')
+    args = parser.parse_args()
+
+    try:
+        tolerances = parse_tolerances(args.tolerance)
+    except ValueError as e:
+        parser.error(str(e))
+    report = run(args.samples, args.seed, args.paths, tolerances, timing=not args.no_benchmark)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
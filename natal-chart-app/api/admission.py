@@ -0,0 +1,195 @@
+import math
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import jsonify, request
+
+# Admission control for the compute endpoints. Chart work runs on a fixed
+# number of slots (the GIL makes more concurrent computations slower, not
+# faster); requests that find every slot busy wait in a bounded queue per
+# endpoint, and freed slots go to the highest priority waiter first (/chart
+# before /quick-chart before speculative prefetch). A request is shed with
+# 429 when its endpoint's queue is full and with 503 when its deadline
+# passes while queued, both with a Retry-After estimate, so latency stays
+# bounded instead of growing with the backlog.
+
+
+@dataclass
+class Policy:
+    priority: int           # lower is served first
+    max_queue: int          # waiting requests allowed; 0 = run only if a slot is free
+    deadline: float         # seconds a request may wait before it is dropped
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('event', 'granted', 'cancelled')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    def __init__(self, slots: int, policies: Dict[str, Policy], default: Policy):
+        self.slots = slots
+        self.policies = policies
+        self.default = default
+        self.busy = 0
+        self.lock = threading.Lock()
+        self.waiters = []                 # heap of (priority, sequence, endpoint, waiter)
+        self.sequence = itertools.count()
+        self.queued = {}
+        self.stats = {}
+        self.service_time = 0.01          # running average, seconds
+
+    def policy(self, endpoint: str) -> Policy:
+        return self.policies.get(endpoint, self.default)
+
+    def _endpoint_stats(self, endpoint: str) -> dict:
+        if endpoint not in self.stats:
+            self.stats[endpoint] = {'admitted': 0, 'shed_queue_full': 0, 'shed_deadline': 0,
+                                    'wait_seconds': 0.0}
+        return self.stats[endpoint]
+
+    def _waiting(self) -> bool:
+        """Whether anyone is still waiting (drops waiters that gave up)"""
+        while self.waiters and self.waiters[0][3].cancelled:
+            heapq.heappop(self.waiters)
+        return bool(self.waiters)
+
+    def _retry_after(self) -> int:
+        backlog = sum(self.queued.values()) + 1
+        return max(1, math.ceil(backlog * self.service_time / self.slots))
+
+    def acquire(self, endpoint: str, deadline: Optional[float] = None):
+        """Take a slot, waiting in the endpoint's queue up to the deadline (seconds)"""
+        policy = self.policy(endpoint)
+        deadline = policy.deadline if deadline is None else min(deadline, policy.deadline)
+        started = time.monotonic()
+        with self.lock:
+            stats = self._endpoint_stats(endpoint)
+            if self.busy < self.slots and not self._waiting():
+                self.busy += 1
+                stats['admitted'] += 1
+                return
+            if self.queued.get(endpoint, 0) >= policy.max_queue:
+                stats['shed_queue_full'] += 1
+                raise Rejected(429, f"{endpoint} queue is full", self._retry_after())
+            waiter = _Waiter()
+            heapq.heappush(self.waiters, (policy.priority, next(self.sequence), endpoint, waiter))
+            self.queued[endpoint] = self.queued.get(endpoint, 0) + 1
+
+        waiter.event.wait(max(deadline - (time.monotonic() - started), 0.0))
+        with self.lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                self.queued[endpoint] -= 1
+                stats['shed_deadline'] += 1
+                raise Rejected(503, f"{endpoint} request waited longer than {deadline:g}s", self._retry_after())
+            stats['admitted'] += 1
+            stats['wait_seconds'] += time.monotonic() - started
+
+    def try_acquire(self, endpoint: str) -> bool:
+        """Take a slot only if one is free and nobody is waiting"""
+        with self.lock:
+            stats = self._endpoint_stats(endpoint)
+            if self.busy < self.slots and not self._waiting():
+                self.busy += 1
+                stats['admitted'] += 1
+                return True
+            stats['shed_queue_full'] += 1
+            return False
+
+    def release(self, seconds: Optional[float] = None):
+        with self.lock:
+            if seconds is not None:
+                self.service_time += 0.1 * (seconds - self.service_time)
+            while self.waiters:
+                _, _, endpoint, waiter = heapq.heappop(self.waiters)
+                if waiter.cancelled:
+                    continue
+                # The slot passes straight to the waiter
+                waiter.granted = True
+                self.queued[endpoint] -= 1
+                waiter.event.set()
+                return
+            self.busy -= 1
+
+    def load(self) -> int:
+        """Computations running plus requests waiting for a slot"""
+        with self.lock:
+            return self.busy + sum(self.queued.values())
+
+    def slot(self, endpoint: str, deadline: Optional[float] = None):
+        """Context manager holding a slot for the duration of the block"""
+        controller = self
+
+        class _Slot:
+            def __enter__(self):
+                controller.acquire(endpoint, deadline)
+                self.started = time.monotonic()
+
+            def __exit__(self, *exc):
+                controller.release(time.monotonic() - self.started)
+                return False
+
+        return _Slot()
+
+    def metrics(self) -> dict:
+        with self.lock:
+            endpoints = {}
+            for endpoint, stats in self.stats.items():
+                admitted = stats['admitted']
+                endpoints[endpoint] = {
+                    'queued': self.queued.get(endpoint, 0),
+                    'admitted': admitted,
+                    'shed_queue_full': stats['shed_queue_full'],
+                    'shed_deadline': stats['shed_deadline'],
+                    'avg_wait_ms': round(1000 * stats['wait_seconds'] / admitted, 3) if admitted else 0.0
+                }
+            return {'slots': self.slots, 'busy': self.busy,
+                    'service_time_ms': round(self.service_time * 1000, 3), 'endpoints': endpoints}
+
+
+def request_deadline() -> Optional[float]:
+    """Client deadline in seconds from the X-Deadline-Ms header, if any"""
+    value = request.headers.get('X-Deadline-Ms')
+    try:
+        return float(value) / 1000.0 if value else None
+    except ValueError:
+        return None
+
+
+def shed_response(rejected: Rejected):
+    response = jsonify({"error": rejected.reason, "retry_after": rejected.retry_after})
+    response.status_code = rejected.status
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response
+
+
+def admitted(controller: AdmissionController, endpoint: str):
+    """Decorator running a whole Flask view inside an admission slot"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            try:
+                with controller.slot(endpoint, request_deadline()):
+                    return handler(*args, **kwargs)
+            except Rejected as rejected:
+                return shed_response(rejected)
+        return wrapper
+    return decorator
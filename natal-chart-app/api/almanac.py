@@ -0,0 +1,241 @@
+import threading
+import swisseph
+import numpy as np
+from cachetools import LRUCache, cached
+from flatlib import const
+from flatlib.ephem import swe
+from typing import Dict, List, Optional
+
+import ephemeris
+
+# Almanac tables: rise, set and upper culmination of every body and the
+# planetary hours for one location over a year.
+#
+# Right ascension and declination are sampled once a day (with their
+# speeds) for the whole year and interpolated with cubic Hermite splines,
+# so a body's altitude and hour angle over the year are plain array
+# arithmetic. Events are bracketed on a SAMPLE_STEP grid and refined for
+# all days at once by vectorized false position. Tables are cached per
+# location and year; the daily samples are shared by every location.
+
+SAMPLE_STEP = 10.0 / 1440.0
+
+# Altitude of the body's centre at rise and set: refraction and the solar
+# semi-diameter for the Sun, plus the horizontal parallax for the Moon
+RISE_ALTITUDE = {const.SUN: -0.8333, const.MOON: 0.125}
+PLANET_RISE_ALTITUDE = -0.5667
+
+# Chaldean order; planetary hours follow it from the day's ruler at sunrise
+CHALDEAN = [const.SATURN, const.JUPITER, const.MARS, const.SUN, const.VENUS, const.MERCURY, const.MOON]
+
+# Ruler of the first hour of each weekday, Monday first (Julian day 0 was a Monday)
+WEEKDAY_RULERS = [const.MOON, const.MARS, const.MERCURY, const.JUPITER, const.VENUS, const.SATURN, const.SUN]
+
+SIDEREAL_RATE = 360.98564736629  # degrees of sidereal time per day
+
+REFINE_ITERATIONS = 8
+
+# Margin (days) around the year so the first and last nights are complete
+MARGIN_DAYS = 2
+
+
+def _year_bounds(year: int):
+    return swisseph.julday(year, 1, 1, 0.0), swisseph.julday(year + 1, 1, 1, 0.0)
+
+
+@cached(LRUCache(maxsize=8), lock=threading.Lock())
+def _daily_samples(year: int) -> Dict[str, np.ndarray]:
+    """RA, declination and their speeds of every body at 0h UT of each day around a year"""
+    start, end = _year_bounds(year)
+    days = np.arange(start - MARGIN_DAYS, end + MARGIN_DAYS + 1)
+    flags = swisseph.FLG_SWIEPH | swisseph.FLG_EQUATORIAL | swisseph.FLG_SPEED
+    samples = np.empty((len(ephemeris.BODIES), 4, days.size), dtype=np.float64)
+    for k, body in enumerate(ephemeris.BODIES):
+        for i, jd in enumerate(days):
+            values, _ = swisseph.calc_ut(jd, swe.SWE_OBJECTS[body], flags)
+            samples[k, :, i] = values[0], values[1], values[3], values[4]
+    sidereal = np.array([ephemeris.sidereal_time(jd) for jd in days])
+    return {'days': days, 'samples': samples, 'sidereal': sidereal}
+
+
+class _Sky:
+    """Interpolated RA/declination and local sidereal time over a year"""
+
+    def __init__(self, year: int, lon: float):
+        data = _daily_samples(year)
+        self.days, self.samples, self.sidereal = data['days'], data['samples'], data['sidereal']
+        self.lon = lon
+
+    def equatorial(self, k: int, t: np.ndarray):
+        """RA and declination of body k at times t (any shape)"""
+        i = np.clip(np.floor(t - self.days[0]).astype(np.int64), 0, self.days.size - 2)
+        s = t - self.days[i]
+        ra0, dec0, vra0, vdec0 = (self.samples[k, c, i] for c in range(4))
+        ra1, dec1, vra1, vdec1 = (self.samples[k, c, i + 1] for c in range(4))
+        ra1 = ra0 + ephemeris.signed_difference(ra1, ra0)
+        # Cubic Hermite basis on [0, 1] with a one-day step
+        h00, h10, h01, h11 = 2 * s ** 3 - 3 * s ** 2 + 1, s ** 3 - 2 * s ** 2 + s, -2 * s ** 3 + 3 * s ** 2, s ** 3 - s ** 2
+        ra = (h00 * ra0 + h10 * vra0 + h01 * ra1 + h11 * vra1) % 360.0
+        dec = h00 * dec0 + h10 * vdec0 + h01 * dec1 + h11 * vdec1
+        return ra, dec
+
+    def local_sidereal(self, t: np.ndarray) -> np.ndarray:
+        i = np.clip(np.floor(t - self.days[0]).astype(np.int64), 0, self.days.size - 2)
+        return (self.sidereal[i] + SIDEREAL_RATE * (t - self.days[i]) + self.lon) % 360.0
+
+    def hour_angle(self, k: int, t: np.ndarray) -> np.ndarray:
+        ra, _ = self.equatorial(k, t)
+        return ephemeris.signed_difference(self.local_sidereal(t), ra)
+
+    def altitude(self, k: int, t: np.ndarray, lat: float) -> np.ndarray:
+        ra, dec = self.equatorial(k, t)
+        hour = np.radians(self.local_sidereal(t) - ra)
+        phi, delta = np.radians(lat), np.radians(dec)
+        return np.degrees(np.arcsin(np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.cos(hour)))
+
+
+def _refine(func, t0: np.ndarray, t1: np.ndarray) -> np.ndarray:
+    """Roots of func inside every bracket [t0, t1] at once (Illinois false position)"""
+    f0, f1 = func(t0), func(t1)
+    side = np.zeros(t0.shape, dtype=np.int8)
+    for _ in range(REFINE_ITERATIONS):
+        t = np.where(f1 != f0, (t0 * f1 - t1 * f0) / np.where(f1 != f0, f1 - f0, 1.0), t0)
+        ft = func(t)
+        right = (ft < 0) == (f1 < 0)
+        # Halve the retained end when the same end moves twice in a row
+        f0 = np.where(right, np.where(side == -1, f0 * 0.5, f0), ft)
+        f1 = np.where(right, ft, np.where(side == 1, f1 * 0.5, f1))
+        t0, t1 = np.where(right, t0, t), np.where(right, t, t1)
+        side = np.where(right, -1, 1).astype(np.int8)
+    return np.where(f1 != f0, (t0 * f1 - t1 * f0) / np.where(f1 != f0, f1 - f0, 1.0), t0)
+
+
+def _crossings(grid: np.ndarray, values: np.ndarray, func, rising: bool) -> np.ndarray:
+    """Refined times where sampled values cross zero upwards (or downwards)"""
+    negative = values < 0
+    idx = np.nonzero(negative[:-1] & ~negative[1:] if rising else ~negative[:-1] & negative[1:])[0]
+    # A hour angle wrapping through +/-180 is not a culmination
+    idx = idx[np.abs(values[idx]) + np.abs(values[idx + 1]) < 180.0]
+    return _refine(func, grid[idx], grid[idx + 1]) if idx.size else np.empty(0)
+
+
+def _planetary_hours(rises: np.ndarray, sets: np.ndarray, lon: float) -> Dict[str, np.ndarray]:
+    """Start, end, ruler index (into CHALDEAN) and day flag of every planetary hour.
+
+    A day runs from a sunrise to the next sunset and its night to the next
+    sunrise; days without both (polar day or night) have no hours.
+    """
+    starts, ends, rulers, daytime = [], [], [], []
+    next_set = np.searchsorted(sets, rises)
+    for n, rise in enumerate(rises[:-1]):
+        if next_set[n] >= sets.size:
+            break
+        sunset = sets[next_set[n]]
+        following = rises[n + 1]
+        # Across a polar day or night the next set or rise is weeks away
+        if not sunset < following < rise + 1.5:
+            continue
+        day = np.linspace(rise, sunset, 13)
+        night = np.linspace(sunset, following, 13)
+        weekday = int(np.floor(rise + 0.5 + lon / 360.0)) % 7   # local mean date of the sunrise
+        first = CHALDEAN.index(WEEKDAY_RULERS[weekday])
+        starts.append(np.concatenate([day[:-1], night[:-1]]))
+        ends.append(np.concatenate([day[1:], night[1:]]))
+        rulers.append((first + np.arange(24)) % 7)
+        daytime.append(np.arange(24) < 12)
+    if not starts:
+        return {'start': np.empty(0), 'end': np.empty(0), 'ruler': np.empty(0, dtype=int),
+                'day': np.empty(0, dtype=bool)}
+    return {'start': np.concatenate(starts), 'end': np.concatenate(ends),
+            'ruler': np.concatenate(rulers), 'day': np.concatenate(daytime)}
+
+
+@cached(LRUCache(maxsize=64), lock=threading.Lock())
+def almanac_year(lat: float, lon: float, year: int) -> Dict:
+    """Rise/set/culmination times (Julian days) of every body and the planetary
+    hours at (lat, lon) for one UTC year; cached per location and year"""
+    start, end = _year_bounds(year)
+    sky = _Sky(year, lon)
+    grid = np.arange(start - MARGIN_DAYS + 1, end + MARGIN_DAYS, SAMPLE_STEP)
+
+    events = {}
+    for k, body in enumerate(ephemeris.BODIES):
+        h0 = RISE_ALTITUDE.get(body, PLANET_RISE_ALTITUDE)
+
+        def above(t, k=k, h0=h0):
+            return sky.altitude(k, t, lat) - h0
+
+        def hour_angle(t, k=k):
+            return sky.hour_angle(k, t)
+
+        altitude = above(grid)
+        events[body] = {
+            'rise': _crossings(grid, altitude, above, rising=True),
+            'set': _crossings(grid, altitude, above, rising=False),
+            'culmination': _crossings(grid, hour_angle(grid), hour_angle, rising=True)
+        }
+
+    sun = events[const.SUN]
+    hours = _planetary_hours(sun['rise'], sun['set'], lon)
+    # Keep the hours of the days that begin within the year
+    keep = np.zeros(hours['start'].size, dtype=bool)
+    day_starts = hours['start'][::24]
+    in_year = (day_starts >= start) & (day_starts < end)
+    keep[np.repeat(in_year, 24)] = True
+    hours = {key: value[keep] for key, value in hours.items()}
+
+    for body, kinds in events.items():
+        events[body] = {kind: times[(times >= start) & (times < end)] for kind, times in kinds.items()}
+    return {'events': events, 'hours': hours}
+
+
+def _location(lat: float, lon: float):
+    # Cache keys at ~10 m so nearby requests share tables
+    return round(float(lat), 4), round(float(lon), 4)
+
+
+def planetary_hour(jd: float, lat: float, lon: float) -> Optional[Dict]:
+    """The planetary hour containing jd, by binary search over the cached year table"""
+    lat, lon = _location(lat, lon)
+    year = ephemeris.jd_to_datetime(jd).year
+    # The night before the first sunrise of a year belongs to the previous year's table
+    for table_year in (year, year - 1):
+        hours = almanac_year(lat, lon, table_year)['hours']
+        i = int(np.searchsorted(hours['start'], jd, side='right')) - 1
+        if i >= 0 and jd < hours['end'][i]:
+            return {
+                'start': ephemeris.jd_to_iso(hours['start'][i]),
+                'end': ephemeris.jd_to_iso(hours['end'][i]),
+                'ruler': CHALDEAN[hours['ruler'][i]],
+                'day': bool(hours['day'][i]),
+                'hour': int(i % 12) + 1
+            }
+    return None
+
+
+def almanac(start_jd: float, end_jd: float, lat: float, lon: float,
+            bodies: Optional[List[str]] = None) -> Dict:
+    """Almanac tables (ISO times) between two Julian days, assembled from cached years"""
+    lat, lon = _location(lat, lon)
+    bodies = bodies or ephemeris.BODIES
+    first, last = ephemeris.jd_to_datetime(start_jd).year, ephemeris.jd_to_datetime(end_jd - 1e-9).year
+    tables = [almanac_year(lat, lon, year) for year in range(first, last + 1)]
+
+    def iso(times):
+        times = times[(times >= start_jd) & (times < end_jd)]
+        return [ephemeris.jd_to_iso(t) for t in times]
+
+    events = {body: {kind: iso(np.concatenate([table['events'][body][kind] for table in tables]))
+                     for kind in ('rise', 'set', 'culmination')}
+              for body in bodies}
+    hours = []
+    for table in tables:
+        h = table['hours']
+        for i in np.nonzero((h['start'] >= start_jd) & (h['start'] < end_jd))[0]:
+            hours.append({
+                'start': ephemeris.jd_to_iso(h['start'][i]),
+                'end': ephemeris.jd_to_iso(h['end'][i]),
+                'ruler': CHALDEAN[h['ruler'][i]],
+                'day': bool(h['day'][i])
+            })
+    return {'events': events, 'planetary_hours': hours}
@@ -0,0 +1,133 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+import ephemeris
+
+# Astrocartography lines for one moment, computed analytically instead of
+# probing the globe one location at a time:
+#
+#   MC/IC   the meridian where local sidereal time equals the body's right
+#           ascension (or RA + 180): a line of constant longitude
+#   ASC/DSC where the body's hour angle is -H0/+H0 with
+#           cos H0 = -tan(lat) tan(dec), evaluated for every latitude at once
+#
+# Aspect-to-angle lines treat the ecliptic points at the aspect angle from
+# the body as virtual bodies: the point culminates where the MC makes that
+# aspect and rises where the Ascendant does.
+
+ANGLES = ['MC', 'IC', 'ASC', 'DSC']
+
+ASPECT_NAMES = {angle['angle']: name for name, angle in ephemeris.ASPECTS.items()}
+
+MAX_LATITUDE = 85.0
+
+
+def aspect_angles(aspects: Sequence) -> List[float]:
+    """Aspect angles from names ('trine', case-insensitive) or degrees (0-180).
+
+    A string is a comma-separated list. Raises ValueError naming the
+    accepted values for anything else.
+    """
+    if isinstance(aspects, str):
+        aspects = aspects.split(',')
+    by_name = {name.lower(): float(aspect['angle']) for name, aspect in ephemeris.ASPECTS.items()}
+    angles = []
+    for aspect in aspects:
+        if isinstance(aspect, str) and aspect.strip().lower() in by_name:
+            angles.append(by_name[aspect.strip().lower()])
+            continue
+        try:
+            angle = float(aspect)
+        except (TypeError, ValueError):
+            angle = None
+        if angle is None or isinstance(aspect, bool) or not 0.0 <= angle <= 180.0:
+            raise ValueError(f"Unknown aspect {aspect!r}; use degrees from 0 to 180 or one of "
+                             f"{list(ephemeris.ASPECTS)}")
+        angles.append(angle)
+    return angles
+
+
+def _wrap(lon):
+    return (np.asarray(lon) + 180.0) % 360.0 - 180.0
+
+
+def _segments(lats: np.ndarray, lons: np.ndarray) -> List[List[List[float]]]:
+    """Split a polyline at undefined points and antimeridian jumps; [lon, lat] pairs"""
+    segments, current = [], []
+    previous = None
+    for lat, lon in zip(lats, lons):
+        if np.isnan(lon):
+            previous = None
+            if len(current) > 1:
+                segments.append(current)
+            current = []
+            continue
+        if previous is not None and abs(lon - previous) > 180.0:
+            if len(current) > 1:
+                segments.append(current)
+            current = []
+        current.append([round(float(lon), 4), round(float(lat), 4)])
+        previous = lon
+    if len(current) > 1:
+        segments.append(current)
+    return segments
+
+
+def angle_lines(ra: np.ndarray, dec: np.ndarray, gast: float, lats: np.ndarray) -> Dict[str, np.ndarray]:
+    """Longitudes of the MC/IC/ASC/DSC lines of several points.
+
+    MC and IC are (points,) arrays; ASC and DSC are (points, latitudes) with
+    NaN where the point never rises or sets (circumpolar).
+    """
+    mc = _wrap(ra - gast)
+    cos_h0 = -np.tan(np.radians(lats))[None, :] * np.tan(np.radians(dec))[:, None]
+    with np.errstate(invalid='ignore'):
+        h0 = np.degrees(np.arccos(np.where(np.abs(cos_h0) <= 1.0, cos_h0, np.nan)))
+    return {
+        'MC': mc,
+        'IC': _wrap(mc + 180.0),
+        'ASC': _wrap(mc[:, None] - h0),
+        'DSC': _wrap(mc[:, None] + h0)
+    }
+
+
+def astrocartography(jd: float, bodies: Sequence[str] = ephemeris.BODIES,
+                     aspects: Optional[Sequence] = None, lat_step: float = 1.0) -> List[dict]:
+    """Every angle line (plus optional aspect-to-angle lines) for one moment as polylines.
+
+    aspects are names or degrees, see aspect_angles.
+    """
+    bodies = list(bodies)
+    aspects = aspect_angles(aspects or [])
+    lats = np.arange(-MAX_LATITUDE, MAX_LATITUDE + lat_step / 2, lat_step)
+    gast = ephemeris.sidereal_time(jd)
+    ra, dec = ephemeris.equatorial_positions(bodies, jd)
+
+    lines = []
+    longitudes = angle_lines(ra, dec, gast, lats)
+    for k, body in enumerate(bodies):
+        for angle in ANGLES:
+            lons = longitudes[angle][k]
+            if angle in ('MC', 'IC'):
+                segments = [[[round(float(lons), 4), float(lats[0])], [round(float(lons), 4), float(lats[-1])]]]
+            else:
+                segments = _segments(lats, lons)
+            lines.append({'body': body, 'angle': angle, 'aspect': None, 'segments': segments})
+
+    if aspects:
+        # Ecliptic points at +/- each aspect angle from every body
+        body_lons = ephemeris.longitudes(bodies, [jd])[0]
+        offsets = sorted(set(aspects) | {-a for a in aspects if a not in (0, 180)})
+        point_lons = (body_lons[:, None] + np.array(offsets)[None, :]).ravel()
+        point_ra, point_dec = ephemeris.ecliptic_to_equatorial(point_lons, ephemeris.obliquity(jd))
+        point_lines = angle_lines(point_ra, point_dec, gast, lats)
+        for p in range(point_lons.size):
+            body = bodies[p // len(offsets)]
+            offset = offsets[p % len(offsets)]
+            aspect = ASPECT_NAMES.get(abs(int(offset)), f"{abs(offset):g}")
+            mc_lon = round(float(point_lines['MC'][p]), 4)
+            lines.append({'body': body, 'angle': 'MC', 'aspect': aspect, 'offset': offset,
+                          'segments': [[[mc_lon, float(lats[0])], [mc_lon, float(lats[-1])]]]})
+            lines.append({'body': body, 'angle': 'ASC', 'aspect': aspect, 'offset': offset,
+                          'segments': _segments(lats, point_lines['ASC'][p])})
+    return lines
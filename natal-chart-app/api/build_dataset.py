@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Build a chart dataset over a time range and a list of locations.
+
+The time x location space is split into time chunks; each chunk (every
+moment in it, at every location) is computed as one ChartFrame in a worker
+process and written as its own Parquet or .npz file. A manifest records the
+parameters and finished chunks, so an interrupted run picks up where it
+stopped when started again with the same arguments.
+
+    python build_dataset.py --start 1975-01-01 --end 2025-01-01 \\
+        --cities cities.csv --out data/dataset --format parquet
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ephemeris
+from chartframe import ChartFrame, ASPECT_NAMES
+
+MANIFEST = 'manifest.json'
+
+
+def read_locations(args):
+    """(name, lat, lon) tuples from --cities CSV (name,lat,lon) and --location flags"""
+    locations = []
+    if args.cities:
+        with open(args.cities, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if not row or row[0].startswith('#') or row[0].strip().lower() == 'name':
+                    continue
+                locations.append((row[0].strip(), float(row[1]), float(row[2])))
+    for value in args.location or []:
+        lat, lon = (float(v) for v in value.split(','))
+        locations.append((value, lat, lon))
+    return locations
+
+
+def chunk_path(out_dir, index, fmt):
+    return os.path.join(out_dir, f'chunk_{index:06d}.{fmt}')
+
+
+def build_chunk(index, jds, locations, out_dir, fmt):
+    """Compute one chunk and write it; returns (index, rows, seconds)"""
+    started = time.time()
+    lats = np.array([lat for _, lat, _ in locations])
+    lons = np.array([lon for _, _, lon in locations])
+    # Moment-major rows: every location for jds[0], then jds[1], ...
+    frame = ChartFrame.compute(np.repeat(jds, len(locations)),
+                               np.tile(lats, len(jds)), np.tile(lons, len(jds)))
+    location_ids = np.tile(np.arange(len(locations), dtype=np.int32), len(jds))
+
+    path = chunk_path(out_dir, index, fmt)
+    tmp_path = path + '.tmp'
+    if fmt == 'npz':
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, location=location_ids, bodies=np.array(frame.bodies),
+                     aspect_names=np.array(ASPECT_NAMES), **frame.to_numpy())
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        charts, aspects = frame.to_arrow()
+        charts = charts.append_column('location', pa.array(location_ids))
+        pq.write_table(charts, tmp_path)
+        pq.write_table(aspects, tmp_path + '.aspects')
+        os.replace(tmp_path + '.aspects', path.replace('.parquet', '_aspects.parquet'))
+    # Rename last so a chunk file only exists once it is complete
+    os.replace(tmp_path, path)
+    return index, len(frame), time.time() - started
+
+
+def load_manifest(out_dir, params):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'params': params, 'chunks': {}}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest['params'] != params:
+        raise SystemExit(f"{path} was written with different parameters; use a new --out directory")
+    return manifest
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a chunked chart dataset over time and locations')
+    parser.add_argument('--start', required=True, help='Start date, YYYY-MM-DD (UTC)')
+    parser.add_argument('--end', required=True, help='End date, YYYY-MM-DD (UTC, exclusive)')
+    parser.add_argument('--step_minutes', type=float, default=60, help='Time step (default: 60)')
+    parser.add_argument('--cities', help='CSV file with name,lat,lon rows')
+    parser.add_argument('--location', action='append', help='Extra location as lat,lon (repeatable)')
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--format', choices=['parquet', 'npz'], default='npz', help='Chunk file format (default: npz)')
+    parser.add_argument('--chunk_days', type=float, default=30, help='Days of time per chunk (default: 30)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    locations = read_locations(args)
+    if not locations:
+        parser.error('give at least one location with --cities or --location')
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error('parquet output needs pyarrow. Install with: pip install pyarrow')
+
+    step_days = args.step_minutes / 1440.0
+    jds = ephemeris.time_grid(ephemeris.julian_day(args.start, '00:00'),
+                              ephemeris.julian_day(args.end, '00:00') - step_days / 2, step_days)
+    per_chunk = max(1, int(round(args.chunk_days / step_days)))
+    chunks = [jds[i:i + per_chunk] for i in range(0, len(jds), per_chunk)]
+
+    os.makedirs(args.out, exist_ok=True)
+    params = {
+        'start': args.start, 'end': args.end, 'step_minutes': args.step_minutes,
+        'chunk_days': args.chunk_days, 'format': args.format,
+        'locations': [list(location) for location in locations],
+        'bodies': ephemeris.BODIES, 'house_system': ephemeris.HOUSE_SYSTEM
+    }
+    manifest = load_manifest(args.out, params)
+    pending = [i for i in range(len(chunks))
+               if str(i) not in manifest['chunks']
+               or not os.path.exists(chunk_path(args.out, i, args.format))]
+
+    total_rows = len(jds) * len(locations)
+    print(f"{total_rows} charts in {len(chunks)} chunks; {len(chunks) - len(pending)} already done, "
+          f"{len(pending)} to build with {args.workers} workers")
+
+    started = time.time()
+    built_rows = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(build_chunk, i, chunks[i], locations, args.out, args.format)
+                       for i in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                index, rows, seconds = future.result()
+                manifest['chunks'][str(index)] = {
+                    'file': os.path.basename(chunk_path(args.out, index, args.format)),
+                    'rows': rows,
+                    'start_jd': float(chunks[index][0]),
+                    'end_jd': float(chunks[index][-1])
+                }
+                save_manifest(args.out, manifest)
+                built_rows += rows
+                elapsed = time.time() - started
+                rate = built_rows / elapsed if elapsed else 0.0
+                remaining = (len(pending) - done) * rows / rate if rate else 0.0
+                print(f"[{done}/{len(pending)}] chunk {index}: {rows} charts in {seconds:.1f}s | "
+                      f"{rate:,.0f} charts/s overall | ~{remaining / 60:.1f} min left")
+    except KeyboardInterrupt:
+        print("Interrupted; finished chunks are recorded in the manifest, rerun to resume")
+        return 130
+
+    elapsed = time.time() - started
+    print(f"Built {built_rows} charts in {elapsed:.1f}s into {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import swisseph
+import numpy as np
+from dataclasses import dataclass, field
+from flatlib.ephem import swe
+from typing import Dict, List, Optional, Sequence
+
+import ephemeris
+
+# Columnar (struct-of-arrays) chart results for batch workloads. Where
+# AstroChart yields one ChartPoint/Aspect object per value, a ChartFrame keeps
+# every chart of a batch in a handful of contiguous typed arrays:
+#
+#   longitude/latitude/speed/sign/house   (bodies, charts), one row per body
+#   cusps                                 (12, charts), one row per house
+#   aspect_*                              one entry per aspect, grouped by
+#                                         chart; aspect_offsets[i]:aspect_offsets[i+1]
+#                                         are the aspects of chart i
+#
+# so a chart costs a few hundred bytes instead of a tree of dicts.
+
+# The Ascendant takes part in aspects like AstroChart's 'Ascendent' point
+ASCENDANT = 'Ascendent'
+
+ASPECT_NAMES = list(ephemeris.ASPECTS)
+
+# flatlib's threshold for a stationary body (deg/day)
+STATIONARY_SPEED = 0.0003
+
+
+def cross_aspect_columns(moving: np.ndarray, fixed: np.ndarray, orb: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Aspects from (moving points, charts) longitudes to a fixed set of (points,) longitudes.
+
+    The cross-chart counterpart of ChartFrame._aspect_columns (transits or
+    progressions to a natal chart): every moving point is compared with every
+    fixed point in every chart at once. orb overrides the per-aspect orbs.
+    Entries are ordered by chart, moving point, fixed point and aspect type.
+    """
+    diff = np.abs(ephemeris.signed_difference(moving[:, None, :], fixed[None, :, None]))  # (m, p, charts)
+
+    charts, movers, targets, types, angles, orbs = [], [], [], [], [], []
+    for type_index, aspect in enumerate(ephemeris.ASPECTS.values()):
+        distance = np.abs(diff - aspect['angle'])
+        mover, target, chart = np.nonzero(distance <= (aspect['orb'] if orb is None else orb))
+        charts.append(chart)
+        movers.append(mover)
+        targets.append(target)
+        types.append(np.full(chart.size, type_index))
+        angles.append(diff[mover, target, chart])
+        orbs.append(distance[mover, target, chart])
+
+    charts, movers, targets, types = (np.concatenate(charts), np.concatenate(movers),
+                                      np.concatenate(targets), np.concatenate(types))
+    order = np.lexsort((types, targets, movers, charts))
+    charts = charts[order]
+    return {
+        'aspect_chart': charts.astype(np.int32),
+        'aspect_moving': movers[order].astype(np.int8),
+        'aspect_fixed': targets[order].astype(np.int8),
+        'aspect_type': types[order].astype(np.int8),
+        'aspect_angle': np.concatenate(angles)[order].astype(np.float32),
+        'aspect_orb': np.concatenate(orbs)[order].astype(np.float32),
+        'aspect_offsets': np.searchsorted(charts, np.arange(moving.shape[1] + 1)).astype(np.int64)
+    }
+
+
+@dataclass
+class ChartFrame:
+    jd: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    bodies: List[str]
+    longitude: np.ndarray
+    latitude: np.ndarray
+    speed: np.ndarray
+    sign: np.ndarray
+    house: np.ndarray
+    cusps: np.ndarray
+    asc: np.ndarray
+    mc: np.ndarray
+    aspect_chart: np.ndarray
+    aspect_point1: np.ndarray
+    aspect_point2: np.ndarray
+    aspect_type: np.ndarray
+    aspect_angle: np.ndarray
+    aspect_orb: np.ndarray
+    aspect_offsets: np.ndarray = field(repr=False)
+
+    def __len__(self):
+        return len(self.jd)
+
+    @property
+    def aspect_points(self) -> List[str]:
+        """Names indexed by aspect_point1/aspect_point2"""
+        return self.bodies + [ASCENDANT]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    @classmethod
+    def compute(cls, jds: Sequence[float], lats: Sequence[float], lons: Sequence[float],
+                bodies: Sequence[str] = ephemeris.BODIES,
+                hsys: str = ephemeris.HOUSE_SYSTEM) -> 'ChartFrame':
+        """Compute a batch of charts; row i is the moment jds[i] at (lats[i], lons[i])"""
+        jd = np.asarray(jds, dtype=np.float64)
+        lat = np.broadcast_to(np.asarray(lats, dtype=np.float64), jd.shape).copy()
+        lon = np.broadcast_to(np.asarray(lons, dtype=np.float64), jd.shape).copy()
+        bodies = list(bodies)
+
+        # Positions are geocentric: evaluate each distinct moment once, so a
+        # time x location grid costs one ephemeris sweep
+        moments, inverse = np.unique(jd, return_inverse=True)
+        longitude = np.empty((len(bodies), jd.size), dtype=np.float64)
+        latitude = np.empty((len(bodies), jd.size), dtype=np.float32)
+        speed = np.empty((len(bodies), jd.size), dtype=np.float32)
+        for k, body in enumerate(bodies):
+            body_lon, body_lat, body_speed = ephemeris.body_positions(body, moments)
+            longitude[k] = body_lon[inverse]
+            latitude[k] = body_lat[inverse]
+            speed[k] = body_speed[inverse]
+
+        hsys_code = swe.SWE_HOUSESYS[hsys]
+        cusps = np.empty((12, jd.size), dtype=np.float64)
+        asc = np.empty(jd.size, dtype=np.float64)
+        mc = np.empty(jd.size, dtype=np.float64)
+        for i in range(jd.size):
+            house_cusps, ascmc = swisseph.houses(jd[i], lat[i], lon[i], hsys_code)
+            cusps[:, i] = house_cusps[:12]
+            asc[i], mc[i] = ascmc[0], ascmc[1]
+
+        return cls(
+            jd=jd, lat=lat, lon=lon, bodies=bodies,
+            longitude=longitude, latitude=latitude, speed=speed,
+            sign=ephemeris.sign_index(longitude).astype(np.int8),
+            house=ephemeris.assign_houses(longitude, cusps),
+            cusps=cusps, asc=asc, mc=mc,
+            **cls._aspect_columns(np.vstack([longitude, asc]))
+        )
+
+    @staticmethod
+    def _aspect_columns(points: np.ndarray) -> Dict[str, np.ndarray]:
+        """Aspects between every pair of (points, charts) longitudes, grouped by chart"""
+        first, second = np.triu_indices(points.shape[0], 1)
+        diff = np.abs(points[first] - points[second])     # (pairs, charts)
+        diff = np.where(diff > 180, 360 - diff, diff)
+
+        charts, pairs, types, angles, orbs = [], [], [], [], []
+        for type_index, aspect in enumerate(ephemeris.ASPECTS.values()):
+            orb = np.abs(diff - aspect['angle'])
+            pair_idx, chart_idx = np.nonzero(orb <= aspect['orb'])
+            charts.append(chart_idx)
+            pairs.append(pair_idx)
+            types.append(np.full(pair_idx.size, type_index))
+            angles.append(diff[pair_idx, chart_idx])
+            orbs.append(orb[pair_idx, chart_idx])
+
+        charts, pairs, types = np.concatenate(charts), np.concatenate(pairs), np.concatenate(types)
+        # Same order as AstroChart.calculate_aspects: by chart, pair, aspect type
+        order = np.lexsort((types, pairs, charts))
+        charts = charts[order]
+        return {
+            'aspect_chart': charts.astype(np.int32),
+            'aspect_point1': first[pairs[order]].astype(np.int8),
+            'aspect_point2': second[pairs[order]].astype(np.int8),
+            'aspect_type': types[order].astype(np.int8),
+            'aspect_angle': np.concatenate(angles)[order].astype(np.float32),
+            'aspect_orb': np.concatenate(orbs)[order].astype(np.float32),
+            'aspect_offsets': np.searchsorted(charts, np.arange(points.shape[1] + 1)).astype(np.int64)
+        }
+
+    def movement(self, i: int) -> List[str]:
+        """flatlib-style motion label of every body in chart i"""
+        labels = []
+        for speed in self.speed[:, i]:
+            if abs(speed) < STATIONARY_SPEED:
+                labels.append('Stationary')
+            else:
+                labels.append('Direct' if speed > 0 else 'Retrograde')
+        return labels
+
+    # === Export === #
+
+    def to_numpy(self) -> Dict[str, np.ndarray]:
+        """Every column as a NumPy array (views, nothing is copied)"""
+        columns = {'jd': self.jd, 'lat': self.lat, 'lon': self.lon,
+                   'cusps': self.cusps, 'asc': self.asc, 'mc': self.mc}
+        for name in ('longitude', 'latitude', 'speed', 'sign', 'house'):
+            columns[name] = getattr(self, name)
+        for name in ('chart', 'point1', 'point2', 'type', 'angle', 'orb', 'offsets'):
+            columns[f'aspect_{name}'] = getattr(self, f'aspect_{name}')
+        return columns
+
+    def _chart_columns(self) -> Dict[str, np.ndarray]:
+        # One contiguous 1-D column per (body, field) and per cusp
+        columns = {'jd': self.jd, 'lat': self.lat, 'lon': self.lon,
+                   'asc': self.asc, 'mc': self.mc}
+        for k, body in enumerate(self.bodies):
+            for name in ('longitude', 'latitude', 'speed', 'sign', 'house'):
+                columns[f'{body}_{name}'] = getattr(self, name)[k]
+        for h in range(12):
+            columns[f'House{h + 1}'] = self.cusps[h]
+        return columns
+
+    def _aspect_table_columns(self) -> Dict[str, np.ndarray]:
+        return {'chart': self.aspect_chart, 'point1': self.aspect_point1,
+                'point2': self.aspect_point2, 'type': self.aspect_type,
+                'angle': self.aspect_angle, 'orb': self.aspect_orb}
+
+    def to_arrow(self):
+        """(charts, aspects) pyarrow Tables; numeric columns wrap the NumPy buffers"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for Arrow export. Install with: pip install pyarrow")
+        charts = pa.table({name: pa.array(values) for name, values in self._chart_columns().items()})
+        aspects = pa.table({name: pa.array(values) for name, values in self._aspect_table_columns().items()})
+        names = pa.array(self.aspect_points)
+        aspects = aspects.append_column('name1', pa.DictionaryArray.from_arrays(
+            pa.array(self.aspect_point1), names))
+        aspects = aspects.append_column('name2', pa.DictionaryArray.from_arrays(
+            pa.array(self.aspect_point2), names))
+        aspects = aspects.append_column('aspect_type', pa.DictionaryArray.from_arrays(
+            pa.array(self.aspect_type), pa.array(ASPECT_NAMES)))
+        return charts, aspects
+
+    def to_pandas(self):
+        """(charts, aspects) pandas DataFrames"""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("pandas is required for DataFrame export. Install with: pip install pandas")
+        charts = pd.DataFrame(self._chart_columns(), copy=False)
+        aspects = pd.DataFrame(self._aspect_table_columns(), copy=False)
+        aspects['name1'] = pd.Categorical.from_codes(self.aspect_point1, self.aspect_points)
+        aspects['name2'] = pd.Categorical.from_codes(self.aspect_point2, self.aspect_points)
+        aspects['aspect_type'] = pd.Categorical.from_codes(self.aspect_type, ASPECT_NAMES)
+        return charts, aspects
+
+    # === Row access === #
+
+    def points(self, i: int) -> Dict[str, dict]:
+        """The /chart 'points' mapping for chart i"""
+        movement = self.movement(i)
+        points = {}
+        for k, body in enumerate(self.bodies):
+            points[body] = {
+                'longitude': float(self.longitude[k, i]),
+                'latitude': float(self.latitude[k, i]),
+                'movement': movement[k],
+                'sign': ephemeris.SIGNS[self.sign[k, i]],
+                'house': int(self.house[k, i]),
+                'next_event': None
+            }
+        points[ASCENDANT] = {
+            'longitude': float(self.asc[i]),
+            'latitude': 0,
+            'movement': 'Direct',
+            'sign': ephemeris.SIGNS[int(self.asc[i] // 30) % 12],
+            'house': 1,
+            'next_event': None
+        }
+        return points
+
+    def houses(self, i: int) -> Dict[str, float]:
+        """The /chart 'houses' mapping for chart i"""
+        return {f"House{h + 1}": float(self.cusps[h, i]) for h in range(12)}
+
+    def aspects(self, i: int) -> List[dict]:
+        """The /chart 'aspects' list for chart i"""
+        names = self.aspect_points
+        lo, hi = self.aspect_offsets[i], self.aspect_offsets[i + 1]
+        return [{
+            'planet1': names[self.aspect_point1[a]],
+            'planet2': names[self.aspect_point2[a]],
+            'aspect_type': ASPECT_NAMES[self.aspect_type[a]],
+            'angle': float(self.aspect_angle[a]),
+            'orb': float(self.aspect_orb[a]),
+            'applying': False
+        } for a in range(lo, hi)]
@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import ephemeris
+from chartframe import ASCENDANT, ASPECT_NAMES, ChartFrame
+
+# Server-side store of saved charts (SQLite). Every chart is computed once on
+# save (in bulk through ChartFrame) and its derived values are kept in
+# indexed columns, so questions like "Venus in Libra in the 7th house" or
+# "Mars square Saturn within 2 degrees" are index lookups instead of
+# recomputing every stored chart:
+#
+#   charts     id, name, date, time, lat, lon, jd, created, meta (JSON)
+#   positions  one row per chart and point: longitude, speed, sign, house
+#   cusps      one row per chart and house: longitude, sign
+#   aspects    one row per aspect, point1/point2 in POINTS order: type, angle, orb
+
+CHART_STORE = os.environ.get('CHART_STORE', os.path.join(os.path.dirname(__file__), 'data', 'charts.sqlite3'))
+
+POINTS = ephemeris.BODIES + [ASCENDANT]
+_POINT_ORDER = {name: i for i, name in enumerate(POINTS)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charts (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    jd REAL NOT NULL,
+    created TEXT NOT NULL,
+    meta TEXT
+);
+CREATE TABLE IF NOT EXISTS positions (
+    chart_id INTEGER NOT NULL REFERENCES charts(id) ON DELETE CASCADE,
+    point TEXT NOT NULL,
+    longitude REAL NOT NULL,
+    speed REAL,
+    sign TEXT NOT NULL,
+    house INTEGER NOT NULL,
+    PRIMARY KEY (chart_id, point)
+);
+CREATE TABLE IF NOT EXISTS cusps (
+    chart_id INTEGER NOT NULL REFERENCES charts(id) ON DELETE CASCADE,
+    house INTEGER NOT NULL,
+    longitude REAL NOT NULL,
+    sign TEXT NOT NULL,
+    PRIMARY KEY (chart_id, house)
+);
+CREATE TABLE IF NOT EXISTS aspects (
+    chart_id INTEGER NOT NULL REFERENCES charts(id) ON DELETE CASCADE,
+    point1 TEXT NOT NULL,
+    point2 TEXT NOT NULL,
+    type TEXT NOT NULL,
+    angle REAL NOT NULL,
+    orb REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_sign_house ON positions (point, sign, house);
+CREATE INDEX IF NOT EXISTS positions_house ON positions (point, house);
+CREATE INDEX IF NOT EXISTS positions_longitude ON positions (point, longitude);
+CREATE INDEX IF NOT EXISTS cusps_sign ON cusps (house, sign);
+CREATE INDEX IF NOT EXISTS aspects_pair ON aspects (point1, point2, type, orb);
+CREATE INDEX IF NOT EXISTS aspects_chart ON aspects (chart_id);
+CREATE INDEX IF NOT EXISTS charts_jd ON charts (jd);
+"""
+
+class ChartStore:
+    def __init__(self, path: str = CHART_STORE):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections can't be shared)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA foreign_keys = ON')
+            if self.path != ':memory:':
+                conn.execute('PRAGMA journal_mode = WAL')
+            self._local.conn = conn
+        return conn
+
+    # === Saving === #
+
+    def save(self, date: str, time: str, lat: float, lon: float,
+             name: Optional[str] = None, meta: Optional[dict] = None) -> int:
+        """Compute and store one chart; returns its id"""
+        return self.save_many([{'date': date, 'time': time, 'lat': lat, 'lon': lon,
+                                'name': name, 'meta': meta}])[0]
+
+    def save_many(self, records: Sequence[dict]) -> List[int]:
+        """Compute a batch of charts in one ChartFrame and store them in one transaction"""
+        records = list(records)
+        if not records:
+            return []
+        jds = [ephemeris.julian_day(r['date'], r['time']) for r in records]
+        frame = ChartFrame.compute(jds, [float(r['lat']) for r in records], [float(r['lon']) for r in records])
+        created = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        conn = self._connect()
+        ids = []
+        with conn:
+            for i, record in enumerate(records):
+                meta = record.get('meta')
+                cursor = conn.execute(
+                    'INSERT INTO charts (name, date, time, lat, lon, jd, created, meta) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (record.get('name'), record['date'], record['time'], float(record['lat']), float(record['lon']),
+                     jds[i], record.get('created', created), json.dumps(meta) if meta is not None else None))
+                ids.append(cursor.lastrowid)
+            conn.executemany('INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?)', self._position_rows(frame, ids))
+            conn.executemany('INSERT INTO cusps VALUES (?, ?, ?, ?)', (
+                (chart_id, h + 1, float(frame.cusps[h, i]), ephemeris.SIGNS[ephemeris.sign_index(frame.cusps[h, i])])
+                for i, chart_id in enumerate(ids) for h in range(12)))
+            conn.executemany('INSERT INTO aspects VALUES (?, ?, ?, ?, ?, ?)', (
+                (ids[frame.aspect_chart[a]], POINTS[frame.aspect_point1[a]], POINTS[frame.aspect_point2[a]],
+                 ASPECT_NAMES[frame.aspect_type[a]], float(frame.aspect_angle[a]), float(frame.aspect_orb[a]))
+                for a in range(frame.aspect_chart.size)))
+        return ids
+
+    @staticmethod
+    def _position_rows(frame: ChartFrame, ids: List[int]) -> Iterable[tuple]:
+        for i, chart_id in enumerate(ids):
+            for k, body in enumerate(frame.bodies):
+                yield (chart_id, body, float(frame.longitude[k, i]), float(frame.speed[k, i]),
+                       ephemeris.SIGNS[frame.sign[k, i]], int(frame.house[k, i]))
+            yield (chart_id, ASCENDANT, float(frame.asc[i]), None,
+                   ephemeris.SIGNS[ephemeris.sign_index(frame.asc[i])], 1)
+
+    def delete(self, chart_id: int) -> bool:
+        conn = self._connect()
+        with conn:
+            return conn.execute('DELETE FROM charts WHERE id = ?', (chart_id,)).rowcount > 0
+
+    # === Reading === #
+
+    @staticmethod
+    def _chart_row(row: sqlite3.Row) -> dict:
+        chart = dict(row)
+        chart['meta'] = json.loads(chart['meta']) if chart['meta'] else None
+        return chart
+
+    def get(self, chart_id: int) -> Optional[dict]:
+        """A stored chart with its positions, cusps and aspects"""
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM charts WHERE id = ?', (chart_id,)).fetchone()
+        if row is None:
+            return None
+        chart = self._chart_row(row)
+        chart['points'] = {r['point']: {'longitude': r['longitude'], 'speed': r['speed'],
+                                        'sign': r['sign'], 'house': r['house']}
+                           for r in conn.execute('SELECT * FROM positions WHERE chart_id = ?', (chart_id,))}
+        chart['houses'] = {f"House{r['house']}": r['longitude']
+                           for r in conn.execute('SELECT * FROM cusps WHERE chart_id = ? ORDER BY house', (chart_id,))}
+        chart['aspects'] = [{'planet1': r['point1'], 'planet2': r['point2'], 'aspect_type': r['type'],
+                             'angle': r['angle'], 'orb': r['orb']}
+                            for r in conn.execute('SELECT * FROM aspects WHERE chart_id = ?', (chart_id,))]
+        return chart
+
+    def count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM charts').fetchone()[0]
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits to the store"""
+        return self._connect().execute('PRAGMA data_version').fetchone()[0]
+
+    def fingerprints(self) -> Dict[int, tuple]:
+        """(jd, lat, lon) of every stored chart by id; a chart changes when these do"""
+        return {row[0]: (row[1], row[2], row[3])
+                for row in self._connect().execute('SELECT id, jd, lat, lon FROM charts')}
+
+    def natal_longitudes(self, ids: Sequence[int]) -> Dict[int, Dict[str, float]]:
+        """Stored point longitudes of the given charts"""
+        conn = self._connect()
+        longitudes = {}
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            rows = conn.execute(f"SELECT chart_id, point, longitude FROM positions "
+                                f"WHERE chart_id IN ({','.join('?' * len(chunk))})", chunk)
+            for chart_id, point, longitude in rows:
+                longitudes.setdefault(chart_id, {})[point] = longitude
+        return longitudes
+
+    def query(self, placements: Sequence[dict] = (), aspects: Sequence[dict] = (),
+              limit: int = 100, offset: int = 0) -> List[dict]:
+        """Charts matching every condition, newest first.
+
+        placements: {'point': 'Venus', 'sign': 'Libra', 'house': 7} (sign and
+                    house optional; 'min_longitude'/'max_longitude' for ranges)
+        aspects:    {'point1': 'Mars', 'point2': 'Saturn', 'type': 'Square', 'max_orb': 2}
+                    (type and max_orb optional; the pair may be in either order)
+        """
+        conditions, params = [], []
+        for placement in placements:
+            clause, values = ['point = ?'], [self._point(placement['point'])]
+            if placement.get('sign') is not None:
+                clause.append('sign = ?')
+                values.append(self._sign(placement['sign']))
+            if placement.get('house') is not None:
+                clause.append('house = ?')
+                values.append(int(placement['house']))
+            if placement.get('min_longitude') is not None:
+                clause.append('longitude >= ?')
+                values.append(float(placement['min_longitude']))
+            if placement.get('max_longitude') is not None:
+                clause.append('longitude <= ?')
+                values.append(float(placement['max_longitude']))
+            conditions.append(f"id IN (SELECT chart_id FROM positions WHERE {' AND '.join(clause)})")
+            params.extend(values)
+        for aspect in aspects:
+            first, second = sorted((self._point(aspect['point1']), self._point(aspect['point2'])),
+                                   key=_POINT_ORDER.get)
+            clause, values = ['point1 = ?', 'point2 = ?'], [first, second]
+            if aspect.get('type') is not None:
+                if aspect['type'] not in ASPECT_NAMES:
+                    raise ValueError(f"Unknown aspect {aspect['type']!r}; aspects are {ASPECT_NAMES}")
+                clause.append('type = ?')
+                values.append(aspect['type'])
+            if aspect.get('max_orb') is not None:
+                clause.append('orb <= ?')
+                values.append(float(aspect['max_orb']))
+            conditions.append(f"id IN (SELECT chart_id FROM aspects WHERE {' AND '.join(clause)})")
+            params.extend(values)
+
+        sql = 'SELECT * FROM charts'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY id DESC LIMIT ? OFFSET ?'
+        rows = self._connect().execute(sql, params + [int(limit), int(offset)])
+        return [self._chart_row(row) for row in rows]
+
+    @staticmethod
+    def _point(name: str) -> str:
+        for point in POINTS:
+            if point.lower() == str(name).lower():
+                return point
+        raise ValueError(f"Unknown point {name!r}; points are {POINTS}")
+
+    @staticmethod
+    def _sign(name: str) -> str:
+        for sign in ephemeris.SIGNS:
+            if sign.lower() == str(name).lower():
+                return sign
+        raise ValueError(f"Unknown sign {name!r}; signs are {ephemeris.SIGNS}")
+
+    # === Import / export === #
+
+    def export_records(self) -> Iterable[dict]:
+        """Every stored chart as an importable record (inputs plus derived values)"""
+        ids = [row[0] for row in self._connect().execute('SELECT id FROM charts ORDER BY id')]
+        for chart_id in ids:
+            chart = self.get(chart_id)
+            if chart is not None:
+                yield chart
+
+    def import_records(self, records: Iterable[dict], batch_size: int = 1000) -> List[int]:
+        """Store charts from exported (or hand-written) records, recomputing derived values"""
+        ids, batch = [], []
+        for record in records:
+            batch.append({key: record.get(key) for key in ('date', 'time', 'lat', 'lon', 'name', 'meta', 'created')
+                          if record.get(key) is not None})
+            if len(batch) >= batch_size:
+                ids.extend(self.save_many(batch))
+                batch = []
+        ids.extend(self.save_many(batch))
+        return ids
+
+
+if __name__ == '__main__':
+    # Bulk transfer: python chartstore.py export charts.jsonl / python chartstore.py import charts.jsonl
+    command, path = sys.argv[1:3]
+    store = ChartStore()
+    if command == 'export':
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in store.export_records():
+                f.write(json.dumps(record) + '\n')
+        print(f"Exported {store.count()} charts to {path}")
+    else:
+        with open(path, encoding='utf-8') as f:
+            ids = store.import_records(json.loads(line) for line in f if line.strip())
+        print(f"Imported {len(ids)} charts into {store.path}")
@@ -0,0 +1,257 @@
+import numpy as np
+import swisseph
+from dataclasses import dataclass
+from flatlib import const
+from flatlib.dignities import essential
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import ephemeris
+import precision
+from chartframe import ASPECT_NAMES
+from lunar import lunar_calendar
+
+# Electional search: score every candidate moment of a date range at one
+# location against a declarative rule set and return the best windows.
+#
+# The sky over the whole grid is evaluated at once (positions interpolated
+# from cached daily exact samples, cusps from the analytic Alcabitus
+# formulas, void-of-course intervals from the cached lunar calendar), then
+# each rule turns it into a score per slot. A rule is a dict with a 'type',
+# an optional 'weight' (points added where it holds) and optionally
+# 'required' (slots where it fails are excluded) or 'forbidden' (slots
+# where it holds are excluded):
+#
+#   dignity         essential dignity score of 'bodies' (ruler +5, exaltation +4,
+#                   detriment -5, fall -4), times weight
+#   aspect          'body1' and 'body2' in 'aspect' (name or list, default any)
+#                   within 'orb'; scaled by how exact it is
+#   void_of_course  the Moon is void of course
+#   angular         'bodies' (default the benefics) in 'houses' (default 1, 4, 7, 10)
+#   retrograde      any of 'bodies' is retrograde
+#   sign            'body' is in one of 'signs'
+
+TRADITIONAL = ephemeris.BODIES[:7]
+BENEFICS = [const.VENUS, const.JUPITER]
+ANGULAR_HOUSES = [1, 4, 7, 10]
+
+DEFAULT_WEIGHTS = {
+    'dignity': 1.0,
+    'aspect': 3.0,
+    'void_of_course': -5.0,
+    'angular': 2.0,
+    'retrograde': -2.0,
+    'sign': 2.0
+}
+
+DEFAULT_RULES = [
+    {'type': 'void_of_course', 'forbidden': True},
+    {'type': 'angular'},
+    {'type': 'dignity', 'bodies': [const.MOON, const.VENUS, const.JUPITER]},
+    {'type': 'retrograde', 'bodies': [const.MERCURY]}
+]
+
+MAX_SLOTS = 100000
+
+# Essential dignity score per (body, sign)
+DIGNITY = np.zeros((len(ephemeris.BODIES), 12), dtype=np.float64)
+for _k, _body in enumerate(TRADITIONAL):
+    for _s, _sign in enumerate(ephemeris.SIGNS):
+        DIGNITY[_k, _s] = (essential.SCORES['ruler'] * (essential.ruler(_sign) == _body)
+                           + essential.SCORES['exalt'] * (essential.exalt(_sign) == _body)
+                           + essential.SCORES['exile'] * (essential.exile(_sign) == _body)
+                           + essential.SCORES['fall'] * (essential.fall(_sign) == _body))
+
+
+@dataclass
+class Sky:
+    jd: np.ndarray
+    longitude: np.ndarray     # (bodies, slots)
+    speed: np.ndarray
+    sign: np.ndarray
+    house: np.ndarray
+    void: np.ndarray          # (slots,) Moon void of course
+
+    @classmethod
+    def compute(cls, jds: np.ndarray, lat: float, lon: float) -> 'Sky':
+        longitude, _, speed = precision.interpolated_grid(jds)
+        eps = ephemeris.obliquity(float(jds[len(jds) // 2]))
+        armc = np.array([swisseph.sidtime(jd) * 15.0 for jd in jds]) + lon
+        cusps = ephemeris.alcabitus_cusps(armc, lat, eps)
+        house = ephemeris.assign_houses(longitude, cusps)
+
+        void = np.zeros(jds.size, dtype=bool)
+        for interval in lunar_calendar(float(jds[0]), float(jds[-1]) + 1e-9)['void_of_course']:
+            void[np.searchsorted(jds, interval['start']):np.searchsorted(jds, interval['end'])] = True
+        return cls(jd=jds, longitude=longitude, speed=speed, sign=ephemeris.sign_index(longitude),
+                   house=house, void=void)
+
+
+# Each evaluator returns (score per slot at weight 1, whether the rule holds
+# per slot, describe(slot) -> text)
+Evaluation = Tuple[np.ndarray, np.ndarray, Callable[[int], str]]
+
+
+def _body(name: str) -> int:
+    if name not in ephemeris.BODIES:
+        raise ValueError(f"Unknown body {name}; use one of {ephemeris.BODIES}")
+    return ephemeris.BODIES.index(name)
+
+
+def _bodies(rule: dict, default: Sequence[str]) -> List[int]:
+    names = rule.get('bodies', default)
+    return [_body(name) for name in ([names] if isinstance(names, str) else names)]
+
+
+def _dignity(rule: dict, sky: Sky) -> Evaluation:
+    bodies = _bodies(rule, TRADITIONAL)
+    scores = DIGNITY[bodies][np.arange(len(bodies))[:, None], sky.sign[bodies]]   # (bodies, slots)
+    total = scores.sum(axis=0)
+
+    def describe(i):
+        parts = [f"{ephemeris.BODIES[b]} in {ephemeris.SIGNS[sky.sign[b, i]]} ({scores[n, i]:+g})"
+                 for n, b in enumerate(bodies) if scores[n, i]]
+        return ', '.join(parts) or 'no essential dignity'
+    return total, total > 0, describe
+
+
+def _aspect(rule: dict, sky: Sky) -> Evaluation:
+    first, second = _body(rule['body1']), _body(rule['body2'])
+    names = rule.get('aspect', ASPECT_NAMES)
+    names = [names] if isinstance(names, str) else names
+    unknown = [name for name in names if name not in ephemeris.ASPECTS]
+    if unknown:
+        raise ValueError(f"Unknown aspects {unknown}; use {ASPECT_NAMES}")
+    separation = np.abs(ephemeris.signed_difference(sky.longitude[first], sky.longitude[second]))
+    strength = np.zeros(sky.jd.size)
+    which = np.full(sky.jd.size, -1)
+    for name in names:
+        allowed = float(rule.get('orb', ephemeris.ASPECTS[name]['orb']))
+        closeness = 1.0 - np.abs(separation - ephemeris.ASPECTS[name]['angle']) / allowed
+        better = closeness > strength
+        strength = np.where(better, closeness, strength)
+        which = np.where(better, ASPECT_NAMES.index(name), which)
+
+    def describe(i):
+        if which[i] < 0:
+            return f"{rule['body1']} and {rule['body2']} not in {'/'.join(names)}"
+        name = ASPECT_NAMES[which[i]]
+        orb = abs(separation[i] - ephemeris.ASPECTS[name]['angle'])
+        return f"{rule['body1']} {name} {rule['body2']}, orb {orb:.2f}°"
+    return strength, strength > 0, describe
+
+
+def _void_of_course(rule: dict, sky: Sky) -> Evaluation:
+    def describe(i):
+        return 'Moon void of course' if sky.void[i] else 'Moon not void of course'
+    return sky.void.astype(np.float64), sky.void, describe
+
+
+def _angular(rule: dict, sky: Sky) -> Evaluation:
+    bodies = _bodies(rule, BENEFICS)
+    houses = np.array(rule.get('houses', ANGULAR_HOUSES))
+    angular = np.isin(sky.house[bodies], houses)          # (bodies, slots)
+    count = angular.sum(axis=0).astype(np.float64)
+
+    def describe(i):
+        parts = [f"{ephemeris.BODIES[b]} in house {sky.house[b, i]}" for n, b in enumerate(bodies) if angular[n, i]]
+        return ', '.join(parts) or f"none of {[ephemeris.BODIES[b] for b in bodies]} in houses {houses.tolist()}"
+    return count, count > 0, describe
+
+
+def _retrograde(rule: dict, sky: Sky) -> Evaluation:
+    bodies = _bodies(rule, TRADITIONAL[2:])
+    retrograde = sky.speed[bodies] < 0
+    count = retrograde.sum(axis=0).astype(np.float64)
+
+    def describe(i):
+        parts = [ephemeris.BODIES[b] for n, b in enumerate(bodies) if retrograde[n, i]]
+        return f"{', '.join(parts)} retrograde" if parts else 'no retrograde bodies'
+    return count, count > 0, describe
+
+
+def _sign(rule: dict, sky: Sky) -> Evaluation:
+    body = _body(rule['body'])
+    signs = rule['signs'] if isinstance(rule['signs'], list) else [rule['signs']]
+    unknown = [sign for sign in signs if sign not in ephemeris.SIGNS]
+    if unknown:
+        raise ValueError(f"Unknown signs {unknown}")
+    holds = np.isin(sky.sign[body], [ephemeris.SIGNS.index(sign) for sign in signs])
+
+    def describe(i):
+        return f"{rule['body']} in {ephemeris.SIGNS[sky.sign[body, i]]}"
+    return holds.astype(np.float64), holds, describe
+
+
+EVALUATORS = {
+    'dignity': _dignity,
+    'aspect': _aspect,
+    'void_of_course': _void_of_course,
+    'angular': _angular,
+    'retrograde': _retrograde,
+    'sign': _sign
+}
+
+
+def _windows(score: np.ndarray, k: int, tolerance: float, gap: int) -> List[Tuple[int, int, int]]:
+    """(first, best, last) slot of the k best windows: runs of slots scoring
+    within tolerance of their best slot, at least gap slots apart"""
+    score = score.copy()
+    windows = []
+    while len(windows) < k:
+        best = int(np.argmax(score))
+        if not np.isfinite(score[best]):
+            break
+        inside = score >= score[best] - tolerance
+        first, last = best, best
+        while first > 0 and inside[first - 1]:
+            first -= 1
+        while last < score.size - 1 and inside[last + 1]:
+            last += 1
+        windows.append((first, best, last))
+        score[max(first - gap, 0):last + gap + 1] = -np.inf
+    return windows
+
+
+def electional_search(start_jd: float, end_jd: float, lat: float, lon: float,
+                      rules: Sequence[dict] = DEFAULT_RULES, step_days: float = 5.0 / 1440.0,
+                      k: int = 10, tolerance: float = 0.5, gap_days: float = 1.0 / 24.0) -> Dict:
+    """The k best windows of [start_jd, end_jd] at (lat, lon) under a rule set"""
+    jds = ephemeris.time_grid(start_jd, end_jd, step_days)
+    if jds.size > MAX_SLOTS:
+        raise ValueError(f"{jds.size} slots; at most {MAX_SLOTS} per search (use a larger step)")
+    for rule in rules:
+        if rule.get('type') not in EVALUATORS:
+            raise ValueError(f"Unknown rule type {rule.get('type')}; use one of {list(EVALUATORS)}")
+    sky = Sky.compute(jds, lat, lon)
+
+    score = np.zeros(jds.size)
+    allowed = np.ones(jds.size, dtype=bool)
+    evaluated = []
+    for rule in rules:
+        try:
+            value, holds, describe = EVALUATORS[rule['type']](rule, sky)
+        except KeyError as e:
+            raise ValueError(f"{rule['type']} rule needs {e}")
+        weight = float(rule.get('weight', DEFAULT_WEIGHTS[rule['type']]))
+        if rule.get('required'):
+            allowed &= holds
+        if rule.get('forbidden'):
+            allowed &= ~holds
+        score += weight * value
+        evaluated.append((rule, weight * value, describe))
+
+    windows = []
+    for first, best, last in _windows(np.where(allowed, score, -np.inf), k, tolerance,
+                                      int(round(gap_days / step_days))):
+        windows.append({
+            'start': ephemeris.jd_to_iso(jds[first]),
+            'end': ephemeris.jd_to_iso(jds[last]),
+            'best': ephemeris.jd_to_iso(jds[best]),
+            'score': round(float(score[best]), 3),
+            'explanation': [{
+                'rule': rule['type'],
+                'score': round(float(contribution[best]), 3) + 0.0,
+                'detail': describe(best)
+            } for rule, contribution, describe in evaluated]
+        })
+    return {'slots': int(jds.size), 'eligible': int(allowed.sum()), 'windows': windows}
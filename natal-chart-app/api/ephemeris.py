@@ -0,0 +1,278 @@
+import math
+from flatlib import const
+from flatlib.datetime import Datetime
+from flatlib.ephem import swe
+import swisseph
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Callable, List, Sequence, Tuple
+
+# Bulk ephemeris helpers shared by the sweep-style features (predict, lunar
+# calendar, events, ...). AstroChart builds one flatlib Chart per moment; these
+# helpers call the Swiss Ephemeris directly and return NumPy arrays so a whole
+# time grid can be evaluated at once.
+
+SIGNS = list(const.LIST_SIGNS)
+
+# Every body we can compute, traditional planets first (same order as AstroChart)
+BODIES = [const.SUN, const.MOON, const.MERCURY, const.VENUS, const.MARS,
+          const.JUPITER, const.SATURN, const.URANUS, const.NEPTUNE, const.PLUTO]
+
+HOUSE_SYSTEM = const.HOUSES_DEFAULT
+
+# Aspect angles and orbs used by AstroChart and the bulk chart types
+ASPECTS = {
+    'Conjunction': {'angle': 0, 'orb': 8},
+    'Sextile': {'angle': 60, 'orb': 6},
+    'Square': {'angle': 90, 'orb': 8},
+    'Trine': {'angle': 120, 'orb': 8},
+    'Opposition': {'angle': 180, 'orb': 8}
+}
+
+
+def julian_day(date_str: str, time_str: str) -> float:
+    """Julian day (UT) for the API's 'YYYY-MM-DD' / 'HH:MM' strings"""
+    return Datetime(date_str.replace('-', '/'), time_str).jd
+
+
+def jd_to_datetime(jd: float) -> datetime:
+    """Convert a Julian day (UT) to a naive UTC datetime"""
+    year, month, day, hours = swisseph.revjul(float(jd))
+    return datetime(year, month, day) + timedelta(hours=hours)
+
+
+def jd_to_date_time(jd: float) -> Tuple[str, str]:
+    """Split a Julian day into the API's ('YYYY-MM-DD', 'HH:MM') pair"""
+    moment = jd_to_datetime(jd) + timedelta(seconds=30)  # round to the minute
+    return moment.strftime('%Y-%m-%d'), moment.strftime('%H:%M')
+
+
+def jd_to_iso(jd: float) -> str:
+    """ISO-8601 UTC timestamp (second precision) for a Julian day"""
+    moment = jd_to_datetime(jd) + timedelta(microseconds=500000)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def time_grid(start_jd: float, end_jd: float, step_days: float) -> np.ndarray:
+    """Evenly spaced Julian days covering [start_jd, end_jd]"""
+    count = int(np.floor((end_jd - start_jd) / step_days)) + 1
+    return start_jd + np.arange(max(count, 1)) * step_days
+
+
+def body_positions(body: str, jds: Sequence[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Longitude, latitude and longitude speed of one body over a grid"""
+    swe_id = swe.SWE_OBJECTS[body]
+    jds = np.asarray(jds, dtype=np.float64)
+    out = np.empty((jds.size, 3), dtype=np.float64)
+    for i, jd in enumerate(jds):
+        values, _ = swisseph.calc_ut(jd, swe_id)
+        out[i] = values[0], values[1], values[3]
+    return out[:, 0], out[:, 1], out[:, 2]
+
+
+def longitudes(bodies: Sequence[str], jds: Sequence[float]) -> np.ndarray:
+    """Longitude matrix shaped (len(jds), len(bodies))"""
+    return np.column_stack([body_positions(body, jds)[0] for body in bodies])
+
+
+def angles(jds: Sequence[float], lat: float, lon: float,
+           hsys: str = HOUSE_SYSTEM) -> Tuple[np.ndarray, np.ndarray]:
+    """Ascendant and Midheaven longitudes over a grid for one location"""
+    hsys_code = swe.SWE_HOUSESYS[hsys]
+    jds = np.asarray(jds, dtype=np.float64)
+    out = np.empty((jds.size, 2), dtype=np.float64)
+    for i, jd in enumerate(jds):
+        _, ascmc = swisseph.houses(jd, lat, lon, hsys_code)
+        out[i] = ascmc[0], ascmc[1]
+    return out[:, 0], out[:, 1]
+
+
+def equatorial_positions(bodies: Sequence[str], jd: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Right ascension and declination (degrees) of several bodies at one moment"""
+    flags = swisseph.FLG_SWIEPH | swisseph.FLG_EQUATORIAL
+    values = [swisseph.calc_ut(jd, swe.SWE_OBJECTS[body], flags)[0] for body in bodies]
+    return (np.array([v[0] for v in values], dtype=np.float64),
+            np.array([v[1] for v in values], dtype=np.float64))
+
+
+def sidereal_time(jd: float) -> float:
+    """Greenwich apparent sidereal time in degrees"""
+    return swisseph.sidtime(jd) * 15.0
+
+
+def obliquity(jd: float) -> float:
+    """True obliquity of the ecliptic in degrees"""
+    return swisseph.calc_ut(jd, swisseph.ECL_NUT)[0][0]
+
+
+def ecliptic_to_equatorial(lon, eps: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Right ascension and declination of points on the ecliptic (latitude 0)"""
+    lam, e = np.radians(np.asarray(lon, dtype=np.float64)), np.radians(eps)
+    ra = np.degrees(np.arctan2(np.sin(lam) * np.cos(e), np.cos(lam))) % 360.0
+    dec = np.degrees(np.arcsin(np.sin(e) * np.sin(lam)))
+    return ra, dec
+
+
+def ascendant_mc(armc, lat, eps: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Ascendant and MC longitudes from sidereal angle (RAMC) and latitude, vectorized.
+
+    Within the polar circles the Ascendant is kept in the eastern half of the
+    chart (the Swiss Ephemeris rule): where it would fall behind the MC it is
+    replaced by its opposite point.
+    """
+    ramc, phi, e = np.radians(armc), np.radians(lat), np.radians(eps)
+    asc = np.degrees(np.arctan2(np.cos(ramc), -(np.sin(ramc) * np.cos(e) + np.tan(phi) * np.sin(e))))
+    mc = np.degrees(np.arctan2(np.sin(ramc), np.cos(ramc) * np.cos(e)))
+    polar = (np.abs(lat) >= 90.0 - np.asarray(eps)) & (signed_difference(asc, mc) < 0)
+    asc = np.where(polar, asc + 180.0, asc)
+    return asc % 360.0, mc % 360.0
+
+
+def alcabitus_cusps(armc, lat, eps: float) -> np.ndarray:
+    """Alcabitus house cusps shaped (12, ...) from RAMC and latitude, vectorized.
+
+    The Ascendant degree's diurnal and nocturnal semi-arcs are trisected in
+    right ascension from the MC and projected back onto the ecliptic; the
+    angles are the Ascendant and MC themselves. Beyond the polar circles,
+    where the Ascendant degree can be circumpolar, its semi-arc is clamped to
+    0 or 180 degrees as in the Swiss Ephemeris.
+    """
+    armc, lat = np.broadcast_arrays(np.asarray(armc, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    asc, mc = ascendant_mc(armc, lat, eps)
+    _, asc_dec = ecliptic_to_equatorial(asc, eps)
+    ratio = np.clip(-np.tan(np.radians(lat)) * np.tan(np.radians(asc_dec)), -1.0, 1.0)
+    diurnal = np.degrees(np.arccos(ratio))
+    nocturnal = 180.0 - diurnal
+    ras = np.radians(np.stack([armc + 180.0 - 2 * nocturnal / 3, armc + 180.0 - nocturnal / 3,
+                               armc + diurnal / 3, armc + 2 * diurnal / 3]))
+    e = np.radians(eps)
+    cusp_2, cusp_3, cusp_11, cusp_12 = np.degrees(np.arctan2(np.sin(ras), np.cos(ras) * np.cos(e)))
+    first_half = [asc, cusp_2, cusp_3, mc + 180.0, cusp_11 + 180.0, cusp_12 + 180.0]
+    return np.stack(first_half + [cusp + 180.0 for cusp in first_half[:4]] + [cusp_11, cusp_12]) % 360.0
+
+
+def chart_angles(armc: float, lat: float, eps: float) -> Tuple[float, float, List[float]]:
+    """Ascendant, MC and the 12 Alcabitus cusps of one chart.
+
+    Scalar counterpart of ascendant_mc and alcabitus_cusps (same rules, same
+    results) for single charts, where NumPy's per-call overhead dominates.
+    """
+    ramc, phi, e = math.radians(armc), math.radians(lat), math.radians(eps)
+    sin_e, cos_e = math.sin(e), math.cos(e)
+    asc = math.degrees(math.atan2(math.cos(ramc), -(math.sin(ramc) * cos_e + math.tan(phi) * sin_e)))
+    mc = math.degrees(math.atan2(math.sin(ramc), math.cos(ramc) * cos_e))
+    if abs(lat) >= 90.0 - eps and 180.0 - (180.0 - (asc - mc)) % 360.0 < 0:
+        asc += 180.0
+    asc, mc = asc % 360.0, mc % 360.0
+    asc_dec = math.asin(sin_e * math.sin(math.radians(asc)))
+    ratio = min(max(-math.tan(phi) * math.tan(asc_dec), -1.0), 1.0)
+    diurnal = math.degrees(math.acos(ratio))
+    nocturnal = 180.0 - diurnal
+    cusp_2, cusp_3, cusp_11, cusp_12 = [
+        math.degrees(math.atan2(math.sin(ra), math.cos(ra) * cos_e))
+        for ra in map(math.radians, (armc + 180.0 - 2 * nocturnal / 3, armc + 180.0 - nocturnal / 3,
+                                     armc + diurnal / 3, armc + 2 * diurnal / 3))]
+    first_half = [asc, cusp_2, cusp_3, mc + 180.0, cusp_11 + 180.0, cusp_12 + 180.0]
+    cusps = first_half + [cusp + 180.0 for cusp in first_half[:4]] + [cusp_11, cusp_12]
+    return asc, mc, [cusp % 360.0 for cusp in cusps]
+
+
+def assign_houses(lons: np.ndarray, cusps: np.ndarray) -> np.ndarray:
+    """House numbers (1-12) for (points, n) longitudes against (12, n) cusps; 0 where cusps are NaN"""
+    start = cusps[0]
+    cusp_offsets = (cusps - start) % 360.0        # (12, n), ascending from 0
+    point_offsets = (lons - start) % 360.0        # (points, n)
+    houses = (point_offsets[:, None, :] >= cusp_offsets[None, :, :]).sum(axis=1)
+    return houses.astype(np.int8)
+
+
+def house_cusps(jd: float, lat: float, lon: float, hsys: str = HOUSE_SYSTEM) -> np.ndarray:
+    """The 12 house cusp longitudes for one moment and location"""
+    cusps, _ = swisseph.houses(jd, lat, lon, swe.SWE_HOUSESYS[hsys])
+    return np.asarray(cusps[:12], dtype=np.float64)
+
+
+def sign_index(lon):
+    """Zodiac sign index (0 = Aries) for scalar or array longitudes"""
+    return (np.floor(np.asarray(lon) / 30.0).astype(int)) % 12
+
+
+def signed_difference(a, b):
+    """Smallest signed angle a - b, in (-180, 180]"""
+    return 180.0 - (180.0 - (np.asarray(a) - np.asarray(b))) % 360.0
+
+
+def refine_root(func: Callable[[float], float], t0: float, t1: float,
+                tol: float = 1e-6, max_iter: int = 60) -> float:
+    """Locate a sign change of func between t0 and t1 to within tol days.
+
+    Uses the Illinois variant of false position: as robust as bisection on a
+    bracket but needs only a handful of ephemeris calls for smooth motion.
+    """
+    f0, f1 = func(t0), func(t1)
+    if (f0 < 0) == (f1 < 0):
+        return 0.5 * (t0 + t1)
+    side = 0
+    for _ in range(max_iter):
+        if t1 - t0 <= tol:
+            break
+        t = (t0 * f1 - t1 * f0) / (f1 - f0)
+        ft = func(t)
+        if ft == 0:
+            return t
+        if (ft < 0) == (f1 < 0):
+            t1, f1 = t, ft
+            if side == -1:
+                f0 *= 0.5
+            side = -1
+        else:
+            t0, f0 = t, ft
+            if side == 1:
+                f1 *= 0.5
+            side = 1
+    return (t0 * f1 - t1 * f0) / (f1 - f0)
+
+
+def sign_changes(values: np.ndarray) -> np.ndarray:
+    """Indices i where values[i] and values[i + 1] have opposite signs"""
+    negative = np.asarray(values) < 0
+    return np.nonzero(negative[:-1] != negative[1:])[0]
+
+
+def body_longitude(body: str, jd: float) -> float:
+    """Longitude of one body at one moment"""
+    return swisseph.calc_ut(jd, swe.SWE_OBJECTS[body])[0][0]
+
+
+def body_speed(body: str, jd: float) -> float:
+    """Longitude speed (deg/day) of one body at one moment"""
+    return swisseph.calc_ut(jd, swe.SWE_OBJECTS[body])[0][3]
+
+
+def find_crossings(jds: np.ndarray, offsets: np.ndarray,
+                   offset_at: Callable[[float], float], tol: float = 1e-6) -> List[float]:
+    """Refined times where a sampled signed angular offset passes through zero.
+
+    offsets should come from signed_difference; jumps through +/-180 degrees
+    (the far side of the circle) are not crossings and are skipped.
+    """
+    idx = sign_changes(offsets)
+    idx = idx[np.abs(offsets[idx]) + np.abs(offsets[idx + 1]) < 180.0]
+    return [refine_root(offset_at, jds[i], jds[i + 1], tol) for i in idx]
+
+
+def sign_ingresses(body: str, jds: np.ndarray, lons: np.ndarray,
+                   tol: float = 1e-6) -> List[Tuple[float, int]]:
+    """(jd, new sign index) for every sign change of a body on a sampled grid"""
+    signs = sign_index(lons)
+    ingresses = []
+    for i in np.nonzero(signs[:-1] != signs[1:])[0]:
+        before, after = int(signs[i]), int(signs[i + 1])
+        # Moving forward the boundary is the start of the new sign,
+        # moving retrograde it is the start of the old one
+        forward = (after - before) % 12 == 1
+        boundary = 30.0 * (after if forward else before)
+        jd = refine_root(lambda t: signed_difference(body_longitude(body, t), boundary),
+                         jds[i], jds[i + 1], tol)
+        ingresses.append((jd, after))
+    return ingresses
@@ -0,0 +1,211 @@
+import os
+import sys
+import swisseph
+import numpy as np
+from flatlib import const
+from typing import Dict, List, Optional
+
+import ephemeris
+
+# Precomputed index of planetary events (sign ingresses, retrograde/direct
+# stations, eclipses) for a span of years. It is built once from a daily
+# sweep of every body, refined to the exact moment, stored as a .npz file and
+# queried with binary searches, so per-chart motion and "next event" lookups
+# cost microseconds.
+
+EVENTS_DIR = os.environ.get('EVENTS_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+
+# Daily samples: the Moon moves < 16 deg/day so it cannot skip a sign, and
+# the shortest retrograde (Mercury, ~3 weeks) spans many samples
+SAMPLE_STEP = 1.0
+
+# Sun and Moon never station
+STATION_BODIES = [body for body in ephemeris.BODIES if body not in (const.SUN, const.MOON)]
+
+# A body counts as stationary within this many days of an exact station
+STATIONARY_WINDOW = 1.0
+
+ECLIPSE_TYPES = [
+    (swisseph.ECL_TOTAL, 'Total'),
+    (swisseph.ECL_ANNULAR_TOTAL, 'Hybrid'),
+    (swisseph.ECL_ANNULAR, 'Annular'),
+    (swisseph.ECL_PARTIAL, 'Partial'),
+    (swisseph.ECL_PENUMBRAL, 'Penumbral')
+]
+
+
+def _eclipse_type(flags: int) -> str:
+    for flag, name in ECLIPSE_TYPES:
+        if flags & flag:
+            return name
+    return 'Unknown'
+
+
+def _eclipses(start_jd: float, end_jd: float):
+    """Maximum times of every solar and lunar eclipse in the span"""
+    found = []
+    for kind, search in (('Solar', swisseph.sol_eclipse_when_glob),
+                         ('Lunar', swisseph.lun_eclipse_when)):
+        jd = start_jd
+        while True:
+            flags, times = search(jd)
+            if times[0] >= end_jd:
+                break
+            found.append((times[0], f"{_eclipse_type(flags[0])} {kind}"))
+            jd = times[0] + 1
+    found.sort()
+    return found
+
+
+class EventIndex:
+    """Sorted event arrays for a span of years, queried by binary search"""
+
+    def __init__(self, start_year: int, end_year: int, arrays: Dict[str, np.ndarray]):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.start_jd = swisseph.julday(start_year, 1, 1, 0.0)
+        self.end_jd = swisseph.julday(end_year + 1, 1, 1, 0.0)
+        self.arrays = arrays
+
+    @classmethod
+    def build(cls, start_year: int, end_year: int) -> 'EventIndex':
+        """Sweep every body over [start_year, end_year] and collect its events"""
+        start_jd = swisseph.julday(start_year, 1, 1, 0.0)
+        end_jd = swisseph.julday(end_year + 1, 1, 1, 0.0)
+        jds = ephemeris.time_grid(start_jd, end_jd, SAMPLE_STEP)
+
+        arrays = {}
+        for body in ephemeris.BODIES:
+            lons, _, speeds = ephemeris.body_positions(body, jds)
+
+            ingresses = ephemeris.sign_ingresses(body, jds, lons)
+            arrays[f'{body}_ingress_jd'] = np.array([jd for jd, _ in ingresses], dtype=np.float64)
+            arrays[f'{body}_ingress_sign'] = np.array([sign for _, sign in ingresses], dtype=np.int8)
+
+            station_jds, station_retro = [], []
+            if body in STATION_BODIES:
+                for i in ephemeris.sign_changes(speeds):
+                    station_jds.append(ephemeris.refine_root(
+                        lambda t: ephemeris.body_speed(body, t), jds[i], jds[i + 1]))
+                    # Speed going from positive to negative starts a retrograde
+                    station_retro.append(speeds[i] > 0)
+            arrays[f'{body}_station_jd'] = np.array(station_jds, dtype=np.float64)
+            arrays[f'{body}_station_retrograde'] = np.array(station_retro, dtype=bool)
+
+            # Motion at the start of the span, for lookups before the first station
+            arrays[f'{body}_initial_retrograde'] = np.array(speeds[0] < 0)
+
+        eclipses = _eclipses(start_jd, end_jd)
+        arrays['eclipse_jd'] = np.array([jd for jd, _ in eclipses], dtype=np.float64)
+        arrays['eclipse_type'] = np.array([name for _, name in eclipses], dtype=str)
+        return cls(start_year, end_year, arrays)
+
+    @staticmethod
+    def path_for(start_year: int, end_year: int, directory: str = EVENTS_DIR) -> str:
+        return os.path.join(directory, f'events_{start_year}_{end_year}.npz')
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, start_year=self.start_year, end_year=self.end_year, **self.arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'EventIndex':
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files if key not in ('start_year', 'end_year')}
+            return cls(int(data['start_year']), int(data['end_year']), arrays)
+
+    def covers(self, jd: float) -> bool:
+        return self.start_jd <= jd < self.end_jd
+
+    def movement(self, body: str, jd: float) -> str:
+        """Direct, Retrograde or Stationary from the surrounding stations"""
+        if body not in STATION_BODIES:
+            return const.DIRECT
+        stations = self.arrays[f'{body}_station_jd']
+        pos = int(np.searchsorted(stations, jd))
+        for near in (pos - 1, pos):
+            if 0 <= near < stations.size and abs(stations[near] - jd) < STATIONARY_WINDOW:
+                return const.STATIONARY
+        if pos == 0:
+            retrograde = bool(self.arrays[f'{body}_initial_retrograde'])
+        else:
+            retrograde = bool(self.arrays[f'{body}_station_retrograde'][pos - 1])
+        return const.RETROGRADE if retrograde else const.DIRECT
+
+    def next_ingress(self, body: str, jd: float) -> Optional[dict]:
+        ingress_jds = self.arrays[f'{body}_ingress_jd']
+        pos = int(np.searchsorted(ingress_jds, jd, side='right'))
+        if pos >= ingress_jds.size:
+            return None
+        sign = ephemeris.SIGNS[int(self.arrays[f'{body}_ingress_sign'][pos])]
+        return {'jd': float(ingress_jds[pos]), 'type': 'Ingress', 'sign': sign}
+
+    def next_station(self, body: str, jd: float) -> Optional[dict]:
+        if body not in STATION_BODIES:
+            return None
+        stations = self.arrays[f'{body}_station_jd']
+        pos = int(np.searchsorted(stations, jd, side='right'))
+        if pos >= stations.size:
+            return None
+        retrograde = bool(self.arrays[f'{body}_station_retrograde'][pos])
+        return {'jd': float(stations[pos]),
+                'type': 'Station Retrograde' if retrograde else 'Station Direct'}
+
+    def next_event(self, body: str, jd: float) -> Optional[dict]:
+        """The earliest upcoming ingress or station of a body"""
+        candidates = [e for e in (self.next_ingress(body, jd), self.next_station(body, jd)) if e]
+        return min(candidates, key=lambda e: e['jd']) if candidates else None
+
+    def next_eclipse(self, jd: float) -> Optional[dict]:
+        eclipse_jds = self.arrays['eclipse_jd']
+        pos = int(np.searchsorted(eclipse_jds, jd, side='right'))
+        if pos >= eclipse_jds.size:
+            return None
+        return {'jd': float(eclipse_jds[pos]), 'type': str(self.arrays['eclipse_type'][pos])}
+
+    def events_between(self, start_jd: float, end_jd: float,
+                       bodies: Optional[List[str]] = None) -> List[dict]:
+        """Every event in [start_jd, end_jd), time ordered; eclipses count as Sun and Moon events"""
+        events = []
+        for body in bodies or ephemeris.BODIES:
+            ingress_jds = self.arrays[f'{body}_ingress_jd']
+            lo, hi = np.searchsorted(ingress_jds, [start_jd, end_jd])
+            for i in range(lo, hi):
+                sign = ephemeris.SIGNS[int(self.arrays[f'{body}_ingress_sign'][i])]
+                events.append({'jd': float(ingress_jds[i]), 'body': body,
+                               'type': 'Ingress', 'sign': sign})
+            stations = self.arrays[f'{body}_station_jd']
+            lo, hi = np.searchsorted(stations, [start_jd, end_jd])
+            for i in range(lo, hi):
+                retrograde = bool(self.arrays[f'{body}_station_retrograde'][i])
+                events.append({'jd': float(stations[i]), 'body': body,
+                               'type': 'Station Retrograde' if retrograde else 'Station Direct'})
+        eclipse_jds = self.arrays['eclipse_jd']
+        if bodies and not {'Sun', 'Moon'} & set(bodies):
+            eclipse_jds = eclipse_jds[:0]
+        lo, hi = np.searchsorted(eclipse_jds, [start_jd, end_jd])
+        for i in range(lo, hi):
+            events.append({'jd': float(eclipse_jds[i]), 'body': None,
+                           'type': str(self.arrays['eclipse_type'][i])})
+        events.sort(key=lambda e: e['jd'])
+        return events
+
+
+def load_or_build(start_year: int, end_year: int, directory: str = EVENTS_DIR) -> EventIndex:
+    """Load the stored index for a span of years, building and saving it if missing"""
+    path = EventIndex.path_for(start_year, end_year, directory)
+    if os.path.exists(path):
+        try:
+            return EventIndex.load(path)
+        except Exception as e:
+            print(f"Could not load event index {path}, rebuilding: {e}")
+    index = EventIndex.build(start_year, end_year)
+    index.save(path)
+    return index
+
+
+if __name__ == '__main__':
+    # Prebuild an index: python events.py 1900 2100
+    start, end = (int(arg) for arg in sys.argv[1:3])
+    load_or_build(start, end)
+    print(f"Event index {start}-{end} saved to {EventIndex.path_for(start, end)}")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Replayable HTTP load test for the chart API.
+
+Traffic comes from a recorded JSONL file (start the API with TRAFFIC_LOG=path
+to record real sessions) or is synthesized to look like the frontend:
+globe drags (bursts of /quick-chart along a path) and date scrubbing (bursts
+of /chart stepping through days or minutes). Requests are replayed at a fixed
+concurrency, optionally against an API process started by this script, and
+the report covers throughput, latency percentiles, errors and /chart cache
+hits (from the X-Cache response header). With --accuracy N the replay is
+followed by the differential accuracy harness (accuracy.py) on N seeded
+samples, so speed and accuracy are reported together and the exit status is
+1 when a fast path is outside its tolerances.
+
+    python loadtest.py synth --sessions 50 --out traffic.jsonl
+    python loadtest.py replay traffic.jsonl --concurrency 16 --spawn
+    python loadtest.py replay traffic.jsonl --spawn --accuracy 500
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import accuracy
+
+
+def synth_drag(rng, start_offset):
+    """A globe drag: /quick-chart requests ~30ms apart moving along a heading"""
+    lat, lon = rng.uniform(-60, 60), rng.uniform(-180, 180)
+    heading = rng.uniform(0, 2 * np.pi)
+    speed = rng.uniform(0.2, 2.0)  # degrees per frame
+    day = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 365))
+    date, hour = day.strftime('%Y-%m-%d'), f"{rng.randint(0, 23):02d}:00"
+    requests, offset = [], start_offset
+    for _ in range(rng.randint(20, 120)):
+        lat = max(-89.0, min(89.0, lat + speed * np.sin(heading)))
+        lon = (lon + speed * np.cos(heading) + 180) % 360 - 180
+        requests.append({'offset': offset, 'endpoint': '/quick-chart',
+                         'body': {'date': date, 'time': hour, 'lat': round(lat, 4), 'lon': round(lon, 4)}})
+        offset += rng.uniform(0.016, 0.05)
+    return requests, offset
+
+
+def synth_scrub(rng, start_offset):
+    """Date scrubbing: /chart requests stepping through time at one location"""
+    lat, lon = round(rng.uniform(-60, 60), 4), round(rng.uniform(-180, 180), 4)
+    moment = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 365), hours=rng.randint(0, 23))
+    step = timedelta(days=1) if rng.random() < 0.5 else timedelta(minutes=rng.choice([1, 5, 15]))
+    direction = 1 if rng.random() < 0.7 else -1
+    requests, offset = [], start_offset
+    for _ in range(rng.randint(10, 60)):
+        moment += direction * step
+        requests.append({'offset': offset, 'endpoint': '/chart',
+                         'body': {'date': moment.strftime('%Y-%m-%d'), 'time': moment.strftime('%H:%M'),
+                                  'lat': lat, 'lon': lon}})
+        offset += rng.uniform(0.03, 0.12)
+        # Users scrub back and forth over the same range
+        if rng.random() < 0.1:
+            direction = -direction
+    return requests, offset
+
+
+def synthesize(sessions, seed, drag_share):
+    rng = random.Random(seed)
+    requests, offset = [], 0.0
+    for n in range(sessions):
+        session = synth_drag if rng.random() < drag_share else synth_scrub
+        batch, offset = session(rng, offset)
+        for req in batch:
+            req['session'] = f"{seed}-{n}"
+        requests.extend(batch)
+        offset += rng.uniform(0.2, 2.0)  # pause between interactions
+    return requests
+
+
+def load_traffic(path):
+    with open(path, encoding='utf-8') as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+    if requests:
+        first = requests[0]['offset']
+        for r in requests:
+            r['offset'] -= first
+    return requests
+
+
+def send(base_url, req, timeout):
+    data = json.dumps(req['body']).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if req.get('session'):
+        # Lets the API tell interleaved scrub/drag sessions apart for prefetching
+        headers['X-Session-Id'] = req['session']
+    http_req = urllib.request.Request(base_url + req['endpoint'], data=data, headers=headers)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(http_req, timeout=timeout) as response:
+            response.read()
+            status, cache = response.status, response.headers.get('X-Cache')
+    except urllib.error.HTTPError as e:
+        status, cache = e.code, None
+    except Exception as e:
+        status, cache = type(e).__name__, None
+    return req['endpoint'], status, cache, time.perf_counter() - started
+
+
+def replay(base_url, requests, concurrency, speed, timeout):
+    """Send every request (paced by offset / speed, or flat out if speed is 0)"""
+    results = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for req in requests:
+            if speed > 0:
+                delay = req['offset'] / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(send, base_url, req, timeout))
+        for future in futures:
+            results.append(future.result())
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed):
+    lines = [f"{len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)"]
+    for endpoint in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == endpoint]
+        latencies = np.array([r[3] for r in rows]) * 1000
+        statuses = Counter(str(r[1]) for r in rows)
+        errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        lines.append(f"{endpoint}: {len(rows)} requests | p50 {p50:.1f}ms p95 {p95:.1f}ms "
+                     f"p99 {p99:.1f}ms max {latencies.max():.1f}ms | errors {errors} "
+                     f"({100.0 * errors / len(rows):.1f}%) {dict(statuses)}")
+        cached = [r[2] for r in rows if r[2]]
+        if cached:
+            hits = sum(1 for c in cached if c.upper().startswith('HIT'))
+            lines.append(f"{endpoint}: cache hit ratio {hits / len(cached):.1%} ({hits}/{len(cached)})")
+    return '\n'.join(lines)
+
+
+def spawn_api(port, env_overrides):
+    """Start the API in a child process and wait until it accepts connections"""
+    env = dict(os.environ, **env_overrides)
+    api_dir = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, '-c', f"import natal; natal.app.run(port={port}, threaded=True)"],
+        cwd=api_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"API did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthesize or replay chart API traffic')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    synth = sub.add_parser('synth', help='Synthesize globe-drag and date-scrub traffic')
+    synth.add_argument('--sessions', type=int, default=50, help='Number of drag/scrub interactions')
+    synth.add_argument('--drag_share', type=float, default=0.5, help='Fraction of sessions that are globe drags')
+    synth.add_argument('--seed', type=int, default=0)
+    synth.add_argument('--out', required=True, help='JSONL file to write')
+
+    run = sub.add_parser('replay', help='Replay a traffic file against the API')
+    run.add_argument('traffic', help='JSONL traffic (recorded or synthesized)')
+    run.add_argument('--url', default='http://127.0.0.1:5000', help='API base URL')
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--speed', type=float, default=0, help='Time scale for offsets (1 = real time, 0 = flat out)')
+    run.add_argument('--timeout', type=float, default=30)
+    run.add_argument('--spawn', action='store_true', help='Start a local API for the run')
+    run.add_argument('--port', type=int, default=5055, help='Port for --spawn')
+    run.add_argument('--env', action='append', default=[], help='KEY=VALUE for the spawned API (repeatable)')
+    run.add_argument('--accuracy', type=int, default=0, metavar='N',
+                     help='Also compare the fast chart paths with AstroChart on N samples')
+    accuracy.add_arguments(run, prefix='accuracy_')
+
+    args = parser.parse_args()
+
+    if args.command == 'synth':
+        requests = synthesize(args.sessions, args.seed, args.drag_share)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            for req in requests:
+                f.write(json.dumps(req) + '\n')
+        print(f"Wrote {len(requests)} requests to {args.out}")
+        return 0
+
+    requests = load_traffic(args.traffic)
+    try:
+        tolerances = accuracy.parse_tolerances(args.accuracy_tolerance)
+    except ValueError as e:
+        parser.error(str(e))
+    process = None
+    base_url = args.url
+    if args.spawn:
+        process = spawn_api(args.port, dict(item.split('=', 1) for item in args.env))
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        results, elapsed = replay(base_url, requests, args.concurrency, args.speed, args.timeout)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    print(report(results, elapsed))
+    if not args.accuracy:
+        return 0
+    checked = accuracy.run(args.accuracy, args.accuracy_seed, args.accuracy_paths, tolerances)
+    print(accuracy.format_report(checked))
+    return 0 if checked['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import threading
+import swisseph
+import numpy as np
+from cachetools import LRUCache, cached
+from flatlib import const
+from typing import Dict, List
+
+import ephemeris
+
+# Lunar calendar: exact phases, Moon sign ingresses and void-of-course
+# intervals. Each month is sampled on a coarse grid in one pass, crossings
+# are refined by root finding, and the result is cached per calendar month.
+
+PHASES = {
+    0: 'New Moon',
+    90: 'First Quarter',
+    180: 'Full Moon',
+    270: 'Last Quarter'
+}
+
+# Longest range per calendar: about 65 ms per month not yet cached, so two
+# years (plus the month before) stay under two seconds in an admission slot
+MAX_CALENDAR_DAYS = 732
+
+# Major (Ptolemaic) aspects used for the void-of-course rule
+MAJOR_ASPECTS = {
+    'Conjunction': 0,
+    'Sextile': 60,
+    'Square': 90,
+    'Trine': 120,
+    'Opposition': 180
+}
+
+# The Moon gains at most ~15.4 deg/day on any body, so two-hour samples can
+# never skip over a crossing
+SAMPLE_STEP = 1.0 / 12.0
+
+ASPECT_BODIES = [body for body in ephemeris.BODIES if body != const.MOON]
+
+
+def _elongation(jd: float) -> float:
+    return ephemeris.body_longitude(const.MOON, jd) - ephemeris.body_longitude(const.SUN, jd)
+
+
+def _month_bounds(year: int, month: int):
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return swisseph.julday(year, month, 1, 0.0), swisseph.julday(next_year, next_month, 1, 0.0)
+
+
+@cached(LRUCache(maxsize=600), lock=threading.Lock())
+def lunar_month(year: int, month: int) -> Dict[str, List[dict]]:
+    """Phases, sign ingresses and Moon aspect perfections for one calendar month"""
+    start_jd, end_jd = _month_bounds(year, month)
+    jds = ephemeris.time_grid(start_jd, end_jd, SAMPLE_STEP)
+    if jds[-1] < end_jd:
+        jds = np.append(jds, end_jd)
+
+    lons = ephemeris.longitudes(ephemeris.BODIES, jds)
+    moon = lons[:, ephemeris.BODIES.index(const.MOON)]
+    sun = lons[:, ephemeris.BODIES.index(const.SUN)]
+
+    phases = []
+    for angle, name in PHASES.items():
+        offsets = ephemeris.signed_difference(moon - sun, angle)
+        for jd in ephemeris.find_crossings(
+                jds, offsets, lambda t, a=angle: ephemeris.signed_difference(_elongation(t), a)):
+            phases.append({'jd': jd, 'phase': name})
+
+    ingresses = [{'jd': jd, 'sign': ephemeris.SIGNS[sign]}
+                 for jd, sign in ephemeris.sign_ingresses(const.MOON, jds, moon)]
+
+    aspects = []
+    for body in ASPECT_BODIES:
+        body_lons = lons[:, ephemeris.BODIES.index(body)]
+
+        def separation(t, body=body):
+            return ephemeris.body_longitude(const.MOON, t) - ephemeris.body_longitude(body, t)
+
+        for aspect_name, angle in MAJOR_ASPECTS.items():
+            targets = {angle, -angle} if angle not in (0, 180) else {angle}
+            for target in targets:
+                offsets = ephemeris.signed_difference(moon - body_lons, target)
+                for jd in ephemeris.find_crossings(
+                        jds, offsets, lambda t, a=target: ephemeris.signed_difference(separation(t), a)):
+                    aspects.append({'jd': jd, 'planet': body, 'aspect': aspect_name})
+
+    # Keep the month half-open so neighbouring months never duplicate an event
+    def in_month(event):
+        return start_jd <= event['jd'] < end_jd
+
+    return {
+        'phases': sorted(filter(in_month, phases), key=lambda e: e['jd']),
+        'ingresses': sorted(filter(in_month, ingresses), key=lambda e: e['jd']),
+        'aspects': sorted(filter(in_month, aspects), key=lambda e: e['jd'])
+    }
+
+
+def _months_between(start_jd: float, end_jd: float):
+    first = ephemeris.jd_to_datetime(start_jd)
+    last = ephemeris.jd_to_datetime(end_jd)
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def lunar_calendar(start_jd: float, end_jd: float) -> Dict[str, List[dict]]:
+    """Lunar calendar for a date range, assembled from cached months.
+
+    The Moon is void of course from its last major aspect to any planet
+    until it enters the next sign.
+    """
+    if end_jd - start_jd > MAX_CALENDAR_DAYS:
+        raise ValueError(f"Range of {end_jd - start_jd:.0f} days; at most {MAX_CALENDAR_DAYS} per calendar")
+    # Start one month early so a void-of-course period running into the
+    # range still finds its last aspect and the ingress that preceded it
+    phases, ingresses, aspects = [], [], []
+    for year, month in _months_between(start_jd - 31, end_jd + 3):
+        data = lunar_month(year, month)
+        phases.extend(data['phases'])
+        ingresses.extend(data['ingresses'])
+        aspects.extend(data['aspects'])
+
+    aspect_jds = np.array([aspect['jd'] for aspect in aspects])
+    void_of_course = []
+    for previous, ingress in zip(ingresses, ingresses[1:]):
+        if ingress['jd'] < start_jd:
+            continue
+        # Binary search for the last aspect perfected in the sign being left
+        pos = int(np.searchsorted(aspect_jds, ingress['jd'])) - 1
+        if pos >= 0 and aspect_jds[pos] > previous['jd']:
+            begin, last_aspect = aspect_jds[pos], aspects[pos]
+        else:
+            begin, last_aspect = previous['jd'], None
+        if begin >= end_jd:
+            break
+        void_of_course.append({
+            'start': float(begin),
+            'end': ingress['jd'],
+            'last_aspect': last_aspect,
+            'next_sign': ingress['sign']
+        })
+
+    def in_range(event):
+        return start_jd <= event['jd'] < end_jd
+
+    return {
+        'phases': list(filter(in_range, phases)),
+        'ingresses': list(filter(in_range, ingresses)),
+        'void_of_course': void_of_course
+    }
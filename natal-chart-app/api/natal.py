@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flatlib.datetime import Datetime
 from flatlib.geopos import GeoPos
@@ -6,12 +6,36 @@ from flatlib.chart import Chart
 from flatlib.const import *
 from flatlib.ephem import ephem
 # from flatlib.tools import getSign
+import json
 import math
+import os
+import time
+from datetime import datetime
 from cachetools import TTLCache
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Dict, List, Optional
 import threading
 
+import ephemeris
+from similarity import MomentIndex, chart_vector
+from lunar import lunar_calendar
+from events import EventIndex
+import profiling
+from astrocartography import astrocartography
+import tiles
+from prefetch import Prefetcher
+from validity import chart_validity
+from chartstore import ChartStore
+import precision
+from chartframe import ASCENDANT, STATIONARY_SPEED
+from progressions import age_range, progressions
+from electional import DEFAULT_RULES, electional_search
+from almanac import almanac, planetary_hour
+from transits import TransitScheduler, make_sink
+import admission
+from admission import AdmissionController, Policy, Rejected
+
 # Define dataclasses first
 @dataclass
 class ChartPoint:
@@ -20,6 +44,7 @@ class ChartPoint:
     movement: str  # Direct, Retrograde, or Stationary
     sign: str
     house: Optional[int] = None
+    next_event: Optional[dict] = None  # Next ingress or station, from the event index
 
 @dataclass
 class Aspect:
@@ -30,6 +55,37 @@ class Aspect:
     orb: float
     applying: bool
 
+# Planetary event index (ingresses, stations, eclipses). Building it takes
+# about 20 s of CPU, too much for every worker, so it is built ahead of time
+# (python events.py 1900 2100) and only loaded here. Until the file exists,
+# points fall back to flatlib's movement and /events answers 503; a missing
+# file is looked for again every EVENT_INDEX_RETRY seconds.
+EVENT_INDEX_YEARS = tuple(int(y) for y in os.environ.get('EVENT_INDEX_YEARS', '1900-2100').split('-'))
+EVENT_INDEX_RETRY = 60.0
+event_index = None
+event_index_lock = threading.Lock()
+event_index_checked = None
+
+def get_event_index():
+    """Return the prebuilt event index, or None when there is none to load"""
+    global event_index, event_index_checked
+    if event_index is not None:
+        return event_index
+    with event_index_lock:
+        if event_index is None and (event_index_checked is None
+                                    or time.monotonic() - event_index_checked >= EVENT_INDEX_RETRY):
+            event_index_checked = time.monotonic()
+            path = EventIndex.path_for(*EVENT_INDEX_YEARS)
+            if not os.path.exists(path):
+                print(f"No event index at {path}; build it with python events.py {EVENT_INDEX_YEARS[0]} "
+                      f"{EVENT_INDEX_YEARS[1]}")
+            else:
+                try:
+                    event_index = EventIndex.load(path)
+                except Exception as e:
+                    print(f"Could not load event index {path}: {e}")
+    return event_index
+
 # Main chart class
 class AstroChart:
     # Traditional planets that are directly supported by flatlib
@@ -40,24 +96,41 @@ class AstroChart:
     HOUSES = [HOUSE1, HOUSE2, HOUSE3, HOUSE4, HOUSE5, HOUSE6, 
               HOUSE7, HOUSE8, HOUSE9, HOUSE10, HOUSE11, HOUSE12]
     
-    ASPECTS = {
-        'Conjunction': {'angle': 0, 'orb': 8},
-        'Sextile': {'angle': 60, 'orb': 6},
-        'Square': {'angle': 90, 'orb': 8},
-        'Trine': {'angle': 120, 'orb': 8},
-        'Opposition': {'angle': 180, 'orb': 8}
-    }
+    ASPECTS = ephemeris.ASPECTS
 
     # Rest of your constants remain the same...
 
     def __init__(self, date_str: str, time_str: str, lat: float, lon: float):
         self.datetime = Datetime(date_str, time_str)
         self.geopos = GeoPos(lat, lon)
-        self.chart = Chart(self.datetime, self.geopos)
-        
-        # Determine which planets are actually available
-        self.available_planets = self._get_available_planets()
-        self.essential_dignities = self._calculate_essential_dignities()
+        # Everything else is computed on first use, so a request only pays for
+        # the fields it asks for (houses alone never touch the planet ephemeris)
+        self._objects = {}
+
+    @cached_property
+    def chart(self) -> Chart:
+        """The full flatlib chart (all traditional objects and houses)"""
+        return Chart(self.datetime, self.geopos)
+
+    @cached_property
+    def houses(self):
+        """flatlib HouseList for this moment and place, without planet positions"""
+        houses, _ = ephem.getHouses(self.datetime, self.geopos, HOUSES_DEFAULT)
+        return houses
+
+    def get_object(self, planet: str):
+        """Memoized flatlib object for a planet"""
+        if planet not in self._objects:
+            self._objects[planet] = ephem.getObject(planet, self.datetime, self.geopos)
+        return self._objects[planet]
+
+    @cached_property
+    def available_planets(self) -> List[str]:
+        return self._get_available_planets()
+
+    @cached_property
+    def essential_dignities(self) -> Dict:
+        return self._calculate_essential_dignities()
 
     def _get_available_planets(self):
         """Determine which planets are available in this flatlib installation"""
@@ -71,7 +144,7 @@ class AstroChart:
         for planet in self.MODERN_PLANETS:
             try:
                 # Just test if we can get the position
-                pos = ephem.getPosition(self.datetime, self.geopos, planet)
+                pos = self.get_object(planet)
                 if pos:
                     available.append(planet)
             except Exception as e:
@@ -83,7 +156,7 @@ class AstroChart:
         dignities = {}
         for planet in self.TRADITIONAL_PLANETS:
             try:
-                obj = self.chart.get(planet)
+                obj = self.get_object(planet)
                 planet_name = planet.capitalize()
                 dignities[planet_name] = {
                     'ruler': self._get_sign_ruler(obj.sign),
@@ -95,7 +168,8 @@ class AstroChart:
                 print(f"Cannot calculate dignities for {planet}: {e}")
         return dignities
 
-    def _get_sign_ruler(self, sign: str) -> str:
+    @staticmethod
+    def _get_sign_ruler(sign: str) -> str:
         """Get the planetary ruler of a sign"""
         RULERSHIPS = {
             'Aries': 'Mars',
@@ -113,7 +187,8 @@ class AstroChart:
         }
         return RULERSHIPS.get(sign, '')
 
-    def _get_exaltation(self, planet: str, sign: str) -> bool:
+    @staticmethod
+    def _get_exaltation(planet: str, sign: str) -> bool:
         """Check if a planet is exalted in a sign"""
         EXALTATIONS = {
             'Sun': 'Aries',
@@ -126,7 +201,8 @@ class AstroChart:
         }
         return EXALTATIONS.get(planet) == sign
 
-    def _is_in_detriment(self, planet: str, sign: str) -> bool:
+    @staticmethod
+    def _is_in_detriment(planet: str, sign: str) -> bool:
         """Check if a planet is in detriment in a sign"""
         DETRIMENTS = {
             'Sun': 'Aquarius',
@@ -142,7 +218,8 @@ class AstroChart:
             return sign in detriment_signs
         return sign == detriment_signs
 
-    def _is_in_fall(self, planet: str, sign: str) -> bool:
+    @staticmethod
+    def _is_in_fall(planet: str, sign: str) -> bool:
         """Check if a planet is in fall in a sign"""
         FALLS = {
             'Sun': 'Libra',
@@ -159,7 +236,7 @@ class AstroChart:
         if point_name in self.MODERN_PLANETS:
             # For modern planets, get directly from ephem
             try:
-                pos = ephem.getPosition(self.datetime, self.geopos, point_name)
+                pos = self.get_object(point_name)
                 lon = pos.lon
                 lat = pos.lat
                 
@@ -170,7 +247,7 @@ class AstroChart:
                             'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces']
                 sign = sign_names[sign_index]
                 
-                movement = "Direct"  # Default for modern planets
+                movement = pos.movement()
             except Exception as e:
                 print(f"Error processing modern planet {point_name}: {e}")
                 # Return placeholder data if can't get the actual position
@@ -179,18 +256,26 @@ class AstroChart:
                 sign = "Unknown"
                 movement = "Unknown"
         else:
-            obj = self.chart.get(point_name)
+            obj = self.get_object(point_name)
             lon = obj.lon
             lat = obj.lat
             sign = obj.sign
-            movement = obj.motion if hasattr(obj, 'motion') else "Direct"
+            movement = obj.movement()
+        next_event = None
+        index = get_event_index()
+        if index is not None and index.covers(self.datetime.jd) and movement != "Unknown":
+            movement = index.movement(point_name, self.datetime.jd)
+            next_event = index.next_event(point_name, self.datetime.jd)
+            if next_event:
+                next_event['time'] = ephemeris.jd_to_iso(next_event.pop('jd'))
         house_num = self._find_house_number(lon)
         return ChartPoint(
             longitude=lon,
             latitude=lat,
             movement=movement,
             sign=sign,
-            house=house_num
+            house=house_num,
+            next_event=next_event
         )
 
 
@@ -223,10 +308,10 @@ class AstroChart:
         for planet in self.available_planets:
             try:
                 if planet in self.TRADITIONAL_PLANETS:
-                    obj = self.chart.get(planet)
+                    obj = self.get_object(planet)
                     planet_positions.append((planet.capitalize(), obj.lon))
                 else:
-                    pos = ephem.getPosition(self.datetime, self.geopos, planet)
+                    pos = self.get_object(planet)
                     if isinstance(planet, str):
                         planet_positions.append((planet, pos.lon))
                     else:
@@ -240,7 +325,7 @@ class AstroChart:
             planet_positions.append((name, point.longitude))
 
         # Add Ascendant
-        house1_lon = self.chart.get(HOUSE1).lon
+        house1_lon = self.houses.get(HOUSE1).lon
         planet_positions.append(('Ascendent', house1_lon))
         
         # Calculate aspects between all planets
@@ -279,7 +364,7 @@ class AstroChart:
                     lon = (30 * 9 + 15) % 360  # Middle of Scorpio
                 elif name == 'Ascendent':
                     try:
-                        house1_obj = self.chart.get(HOUSE1)
+                        house1_obj = self.houses.get(HOUSE1)
                         lon = house1_obj.lon
                     except Exception as e:
                         print(f"Error getting Ascendant position: {e}")
@@ -305,7 +390,7 @@ class AstroChart:
         cusps = {}
         for i, house in enumerate(self.HOUSES):
             try:
-                house_obj = self.chart.get(house)
+                house_obj = self.houses.get(house)
                 cusps[f"House{i+1}"] = house_obj.lon
             except Exception as e:
                 print(f"Error getting house {house}: {e}")
@@ -316,7 +401,7 @@ class AstroChart:
         """Find which house a longitude falls in"""
         houses = []
         for i, house in enumerate(self.HOUSES):
-            house_obj = self.chart.get(house)
+            house_obj = self.houses.get(house)
             houses.append((i+1, house_obj.lon))
         houses.append((1, houses[0][1] + 360))
         houses.sort(key=lambda x: x[1])
@@ -330,6 +415,31 @@ class AstroChart:
 
 
 
+def essential_dignities(points: Dict[str, dict]) -> Dict[str, dict]:
+    """The 'essential_dignities' mapping for a /chart 'points' mapping"""
+    dignities = {}
+    for planet in AstroChart.TRADITIONAL_PLANETS:
+        if planet in points:
+            sign = points[planet]['sign']
+            dignities[planet] = {
+                'ruler': AstroChart._get_sign_ruler(sign),
+                'exaltation': AstroChart._get_exaltation(planet, sign),
+                'detriment': AstroChart._is_in_detriment(planet, sign),
+                'fall': AstroChart._is_in_fall(planet, sign)
+            }
+    return dignities
+
+def chart_frame_result(frame, i: int) -> Dict:
+    """Row i of a ChartFrame in the /chart response shape"""
+    points = frame.points(i)
+    return {
+        'points': points,
+        'houses': frame.houses(i),
+        'aspects': frame.aspects(i),
+        'essential_dignities': essential_dignities(points)
+    }
+
+
 # Initialize Flask application
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3001", "http://localhost:3000"]}})
@@ -337,60 +447,608 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:3001", "http://localh
 chart_cache = TTLCache(maxsize=100, ttl=30)
 cache_lock = threading.Lock()
 
+# Set TRAFFIC_LOG to record chart requests as JSONL for loadtest.py replay
+TRAFFIC_LOG = os.environ.get('TRAFFIC_LOG')
+traffic_lock = threading.Lock()
+
+@app.after_request
+def record_traffic(response):
+    if TRAFFIC_LOG and request.path in ('/chart', '/quick-chart'):
+        line = json.dumps({'offset': time.time(), 'endpoint': request.path,
+                           'body': request.get_json(silent=True)})
+        with traffic_lock:
+            with open(TRAFFIC_LOG, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    return response
+
+# Response fields a client can ask for with fields=points,houses,...
+CHART_FIELDS = ['points', 'houses', 'aspects', 'essential_dignities', 'validity']
+# Validity costs many times a quick chart, so /quick-chart only adds it on request
+QUICK_CHART_FIELDS = ['houses', 'points']
+
+def requested_fields(data: Dict, default: List[str]) -> List[str]:
+    """The 'fields' of a request (list or comma-separated string) in CHART_FIELDS order"""
+    fields = data.get('fields')
+    if not fields:
+        return default
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = {field.strip() for field in fields}
+    unknown = fields - set(CHART_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}; available fields are {CHART_FIELDS}")
+    return [field for field in CHART_FIELDS if field in fields]
+
+def chart_cache_key(data: Dict) -> str:
+    # Coordinates as floats, so 41, 41.0 and "41" (and predicted frames) share a key
+    return f"{data['date']}_{data['time']}_{float(data['lat'])}_{float(data['lon'])}_{data.get('fields', '')}"
+
+def fast_chart_result(data: Dict, fields: List[str], tier: str) -> Dict:
+    """The requested fields of a chart from one of the fast precision tiers"""
+    jd = ephemeris.julian_day(data['date'], data['time'])
+    lat, lon = float(data['lat']), float(data['lon'])
+    chart = precision.fast_chart(jd, lat, lon, tier)
+    result = {}
+    if 'points' in fields or 'essential_dignities' in fields:
+        points = {}
+        for body, longitude, latitude, speed, house in zip(ephemeris.BODIES, chart.longitude, chart.latitude,
+                                                           chart.speed, chart.house):
+            points[body] = {
+                'longitude': longitude,
+                'latitude': latitude,
+                'movement': 'Stationary' if abs(speed) < STATIONARY_SPEED else ('Direct' if speed > 0 else 'Retrograde'),
+                'sign': ephemeris.SIGNS[int(longitude // 30) % 12],
+                'house': house,
+                'next_event': None
+            }
+        points[ASCENDANT] = {'longitude': chart.asc, 'latitude': 0, 'movement': 'Direct',
+                             'sign': ephemeris.SIGNS[int(chart.asc // 30) % 12], 'house': 1, 'next_event': None}
+        if 'points' in fields:
+            result['points'] = points
+        if 'essential_dignities' in fields:
+            result['essential_dignities'] = essential_dignities(points)
+    if 'houses' in fields:
+        result['houses'] = {f"House{h + 1}": cusp for h, cusp in enumerate(chart.cusps)}
+    if 'aspects' in fields:
+        result['aspects'] = [{'planet1': first, 'planet2': second, 'aspect_type': kind, 'angle': angle,
+                              'orb': orb, 'applying': False} for first, second, kind, angle, orb in chart.aspects]
+    if 'validity' in fields:
+        groups = (['signs', 'houses'] if 'points' in fields else []) + (['aspects'] if 'aspects' in fields else [])
+        if groups:
+            result['validity'] = chart_validity(jd, lat, lon, groups=groups)
+    return result
+
+def chart_result(data: Dict, default_fields: List[str] = CHART_FIELDS, tier: str = 'exact') -> Dict:
+    """Compute only the requested fields of a chart at one precision tier"""
+    fields = requested_fields(data, default_fields)
+    if tier != 'exact':
+        # Validity costs more than a fast chart; only computed when asked for explicitly
+        if not data.get('fields'):
+            fields = [field for field in fields if field != 'validity']
+        result = fast_chart_result(data, fields, tier)
+        result['precision'] = tier
+        return result
+    chart = AstroChart(
+        data['date'].replace('-', '/'),
+        data['time'],
+        float(data['lat']),
+        float(data['lon'])
+    )
+    result = {}
+    if 'points' in fields:
+        result['points'] = {name: vars(point) for name, point in chart.get_all_points().items()}
+    if 'houses' in fields:
+        result['houses'] = chart.get_house_cusps()
+    if 'aspects' in fields:
+        result['aspects'] = [vars(aspect) for aspect in chart.calculate_aspects()]
+    if 'essential_dignities' in fields:
+        result['essential_dignities'] = chart.essential_dignities
+    if 'validity' in fields:
+        # Only the groups backed by discrete fields of this response
+        groups = (['signs', 'houses'] if 'points' in fields else []) + (['aspects'] if 'aspects' in fields else [])
+        if groups:
+            result['validity'] = chart_validity(chart.datetime.jd, float(data['lat']), float(data['lon']),
+                                                groups=groups)
+    result['precision'] = 'exact'
+    return result
+
+def quick_chart_result(data: Dict, tier: str = 'exact') -> Dict:
+    return chart_result(data, QUICK_CHART_FIELDS, tier)
+
+# Admission control: ADMISSION_SLOTS computations at a time, bounded queues
+# per endpoint, /chart served before /quick-chart before speculative work
+admission_control = AdmissionController(
+    slots=int(os.environ.get('ADMISSION_SLOTS', 4)),
+    policies={
+        '/chart': Policy(priority=0, max_queue=int(os.environ.get('CHART_QUEUE', 32)), deadline=5.0),
+        '/quick-chart': Policy(priority=1, max_queue=int(os.environ.get('QUICK_CHART_QUEUE', 16)), deadline=0.5),
+        'speculative': Policy(priority=2, max_queue=0, deadline=0.0)
+    },
+    default=Policy(priority=1, max_queue=16, deadline=10.0)
+)
+
+# Precision tier per request: 'precision' names one, 'budget_ms' (or the
+# X-Latency-Budget header) picks the most precise tier expected to fit, and
+# /quick-chart otherwise steps down once requests queue for a compute slot
+tier_selector = precision.TierSelector(load_step=admission_control.slots)
+
+def choose_tier(data: Dict, degrade: bool) -> str:
+    requested = data.get('precision')
+    if requested is not None and requested not in precision.TIERS:
+        raise ValueError(f"Unknown precision {requested!r}; tiers are {precision.TIERS}")
+    budget = data.get('budget_ms', request.headers.get('X-Latency-Budget'))
+    return tier_selector.choose(requested, float(budget) if budget is not None else None,
+                                default='exact', degrade=degrade, load=admission_control.load())
+
+def timed_chart_result(data: Dict, default_fields: List[str], tier: str) -> Dict:
+    with tier_selector.running():
+        started = time.perf_counter()
+        result = chart_result(data, default_fields, tier)
+        tier_selector.record(tier, time.perf_counter() - started)
+    return result
+
+# Speculative prefetch of the next frames of date scrubs and globe drags;
+# PREFETCH_DEPTH=0 turns it off
+PREFETCH_DEPTH = int(os.environ.get('PREFETCH_DEPTH', 4))
+prefetcher = Prefetcher({'/chart': chart_result, '/quick-chart': quick_chart_result},
+                        key=chart_cache_key, depth=PREFETCH_DEPTH, admission=admission_control)
+
+def request_chart_data() -> Dict:
+    """JSON body of a chart request, with fields= from the query string if not in the body"""
+    data = request.json
+    if 'fields' not in data and request.args.get('fields'):
+        data = dict(data, fields=request.args['fields'])
+    return data
+
+def client_id() -> str:
+    return f"{request.remote_addr}|{request.headers.get('X-Session-Id', request.user_agent.string)}"
+
 @app.route('/chart', methods=['POST'])
+@profiling.profiled
 def get_chart():
     try:
-        data = request.json
-        cache_key = f"{data['date']}_{data['time']}_{data['lat']}_{data['lon']}"
-        
-        with cache_lock:
-            if cache_key in chart_cache:
-                return jsonify(chart_cache[cache_key])
-        
-        chart = AstroChart(
-            data['date'].replace('-', '/'),
-            data['time'],
-            float(data['lat']),
-            float(data['lon'])
-        )
-        
-        result = {
-            'points': {name: vars(point) for name, point in chart.get_all_points().items()},
-            'houses': chart.get_house_cusps(),
-            'aspects': [vars(aspect) for aspect in chart.calculate_aspects()],
-            'essential_dignities': chart.essential_dignities
-        }
+        data = request_chart_data()
+        cache_key = chart_cache_key(data)
         
         with cache_lock:
-            chart_cache[cache_key] = result
+            result = chart_cache.get(cache_key)
+        cache_status = 'HIT'
+        if result is None:
+            result = prefetcher.lookup('/chart', data)
+            cache_status = 'HIT-SPECULATIVE'
+        if result is None:
+            tier = choose_tier(data, degrade=False)
+            with admission_control.slot('/chart', admission.request_deadline()), prefetcher.foreground():
+                result = timed_chart_result(data, CHART_FIELDS, tier)
+            cache_status = 'MISS'
+            print(result)
+        # Only exact charts are shared with later requests
+        if cache_status != 'HIT' and result['precision'] == 'exact':
+            with cache_lock:
+                chart_cache[cache_key] = result
 
-        print(result)
+        # Observed after the work is done so speculation starts on an idle worker
+        if PREFETCH_DEPTH:
+            prefetcher.observe(client_id(), '/chart', data)
             
-        return jsonify(result)
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Precision'] = result['precision']
+        return response
         
+    except Rejected as rejected:
+        return admission.shed_response(rejected)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/quick-chart', methods=['POST'])
+@profiling.profiled
 def get_quick_chart():
     try:
-        data = request.json
-        chart = AstroChart(
-            data['date'].replace('-', '/'),
-            data['time'],
-            float(data['lat']),
-            float(data['lon'])
-        )
+        data = request_chart_data()
+        result = prefetcher.lookup('/quick-chart', data)
+        cache_status = 'HIT-SPECULATIVE'
+        if result is None:
+            tier = choose_tier(data, degrade=True)
+            with admission_control.slot('/quick-chart', admission.request_deadline()), prefetcher.foreground():
+                result = timed_chart_result(data, QUICK_CHART_FIELDS, tier)
+            cache_status = 'MISS'
+
+        if PREFETCH_DEPTH:
+            prefetcher.observe(client_id(), '/quick-chart', data)
         
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Precision'] = result['precision']
+        return response
+        
+    except Rejected as rejected:
+        return admission.shed_response(rejected)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Precomputed similarity grids, shared between /predict requests
+predict_index_cache = TTLCache(maxsize=8, ttl=3600)
+predict_index_lock = threading.Lock()
+
+def get_moment_index(start_jd, end_jd, step_days, lat, lon, include_angles):
+    # Planet longitudes are geocentric, so the location only matters for angles
+    if not include_angles:
+        lat = lon = 0.0
+    index_key = (round(start_jd, 6), round(end_jd, 6), round(step_days, 6),
+                 round(lat, 2), round(lon, 2), include_angles)
+    with predict_index_lock:
+        index = predict_index_cache.get(index_key)
+    if index is None:
+        index = MomentIndex(start_jd, end_jd, step_days, lat, lon, include_angles)
+        with predict_index_lock:
+            predict_index_cache[index_key] = index
+    return index
+
+@app.route('/predict', methods=['POST'])
+@admission.admitted(admission_control, '/predict')
+def get_predictions():
+    try:
+        data = request.json
+        include_angles = bool(data.get('include_angles', False))
+        k = max(1, int(data.get('k', 20)))
+        step_minutes = float(data.get('step_minutes', 60))
+        if step_minutes <= 0:
+            return jsonify({"error": "step_minutes must be positive"}), 400
+        step_days = step_minutes / 1440.0
+        # Location to search at; defaults to the reference chart's location
+        target = data.get('location') or {'lat': data['lat'], 'lon': data['lon']}
+
+        reference_jd = ephemeris.julian_day(data['date'], data['time'])
+        vector = chart_vector(reference_jd, float(data['lat']), float(data['lon']), include_angles)
+
+        start_jd = ephemeris.julian_day(data['start'], data.get('start_time', '00:00'))
+        end_jd = ephemeris.julian_day(data['end'], data.get('end_time', '00:00'))
+        if end_jd <= start_jd:
+            return jsonify({"error": "end must be after start"}), 400
+
+        index = get_moment_index(start_jd, end_jd, step_days,
+                                 float(target['lat']), float(target['lon']), include_angles)
+        matches = []
+        for match in index.query(vector, k=k):
+            date, time = ephemeris.jd_to_date_time(match.jd)
+            matches.append({'date': date, 'time': time, 'similarity': match.similarity})
+
+        return jsonify({'matches': matches, 'candidates': len(index)})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def range_julian_day(date_str, time_str) -> float:
+    """Julian day of a strictly checked 'YYYY-MM-DD' / 'HH:MM' pair (flatlib
+    rolls month 13 or 25:00 over), raising ValueError"""
+    if not isinstance(date_str, str) or not isinstance(time_str, str):
+        raise ValueError(f"dates and times must be strings, got {date_str!r} {time_str!r}")
+    datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
+    return ephemeris.julian_day(date_str, time_str)
+
+@app.route('/lunar-calendar', methods=['POST'])
+@admission.admitted(admission_control, '/lunar-calendar')
+def get_lunar_calendar():
+    try:
+        data = request.json
+        start_jd = range_julian_day(data['start'], data.get('start_time', '00:00'))
+        end_jd = range_julian_day(data['end'], data.get('end_time', '00:00'))
+        if end_jd <= start_jd:
+            return jsonify({"error": "end must be after start"}), 400
+
+        calendar = lunar_calendar(start_jd, end_jd)
         result = {
-            'houses': chart.get_house_cusps(),
-            'points': {name: vars(point) for name, point in chart.get_all_points().items()}
+            'phases': [{'time': ephemeris.jd_to_iso(e['jd']), 'phase': e['phase']}
+                       for e in calendar['phases']],
+            'ingresses': [{'time': ephemeris.jd_to_iso(e['jd']), 'sign': e['sign']}
+                          for e in calendar['ingresses']],
+            'void_of_course': [{
+                'start': ephemeris.jd_to_iso(v['start']),
+                'end': ephemeris.jd_to_iso(v['end']),
+                'last_aspect': {
+                    'planet': v['last_aspect']['planet'],
+                    'aspect': v['last_aspect']['aspect']
+                } if v['last_aspect'] else None,
+                'next_sign': v['next_sign']
+            } for v in calendar['void_of_course']]
         }
-        
+
         return jsonify(result)
-        
+
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid range: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/events', methods=['POST'])
+def get_events():
+    try:
+        data = request.json
+        start_jd = ephemeris.julian_day(data['start'], data.get('start_time', '00:00'))
+        end_jd = ephemeris.julian_day(data['end'], data.get('end_time', '00:00'))
+        index = get_event_index()
+        if index is None:
+            return jsonify({"error": "No event index loaded; build it with python events.py "
+                                     f"{EVENT_INDEX_YEARS[0]} {EVENT_INDEX_YEARS[1]}"}), 503
+        if not (index.covers(start_jd) and index.covers(end_jd - 1e-9)):
+            return jsonify({"error": f"Event index covers {index.start_year}-{index.end_year} only"}), 400
+
+        bodies = data.get('bodies')
+        unknown = [body for body in bodies or [] if body not in ephemeris.BODIES]
+        if unknown:
+            return jsonify({"error": f"Unknown bodies: {unknown}"}), 400
+        events = index.events_between(start_jd, end_jd, bodies)
+        for event in events:
+            event['time'] = ephemeris.jd_to_iso(event.pop('jd'))
+
+        return jsonify({'events': events})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/astrocartography', methods=['POST'])
+@admission.admitted(admission_control, '/astrocartography')
+def get_astrocartography():
+    try:
+        data = request.json
+        jd = ephemeris.julian_day(data['date'], data['time'])
+        bodies = data.get('bodies') or ephemeris.BODIES
+        unknown = [body for body in bodies if body not in ephemeris.BODIES]
+        if unknown:
+            return jsonify({"error": f"Unknown bodies: {unknown}"}), 400
+        lat_step = min(max(float(data.get('lat_step', 1.0)), 0.1), 10.0)
+
+        lines = astrocartography(jd, bodies, data.get('aspects'), lat_step)
+        return jsonify({'lines': lines})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/progressions', methods=['POST'])
+@admission.admitted(admission_control, '/progressions')
+def get_progressions():
+    try:
+        data = request.json
+        natal_jd = ephemeris.julian_day(data['date'], data['time'])
+        if 'ages' in data:
+            ages = [float(age) for age in data['ages']]
+        else:
+            ages = age_range(float(data.get('start_age', 0)), float(data.get('end_age', 90)),
+                             float(data.get('step_years', 1)))
+
+        result = progressions(natal_jd, float(data['lat']), float(data['lon']), ages,
+                              angle_method=data.get('angles', 'solar_arc'),
+                              orb=float(data.get('orb', 1.0)))
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/electional', methods=['POST'])
+@admission.admitted(admission_control, '/electional')
+def get_electional():
+    try:
+        data = request.json
+        start_jd = ephemeris.julian_day(data['start'], data.get('start_time', '00:00'))
+        end_jd = ephemeris.julian_day(data['end'], data.get('end_time', '00:00'))
+        if end_jd <= start_jd:
+            return jsonify({"error": "end must be after start"}), 400
+
+        result = electional_search(
+            start_jd, end_jd, float(data['lat']), float(data['lon']),
+            rules=data.get('rules', DEFAULT_RULES),
+            step_days=max(float(data.get('step_minutes', 5)), 1.0) / 1440.0,
+            k=max(1, int(data.get('k', 10))),
+            tolerance=float(data.get('tolerance', 0.5)),
+            gap_days=float(data.get('min_gap_minutes', 60)) / 1440.0
+        )
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/almanac', methods=['POST'])
+@admission.admitted(admission_control, '/almanac')
+def get_almanac():
+    try:
+        data = request.json
+        if 'year' in data:
+            year = int(data['year'])
+            start_jd = ephemeris.julian_day(f"{year:04d}-01-01", '00:00')
+            end_jd = ephemeris.julian_day(f"{year + 1:04d}-01-01", '00:00')
+        else:
+            start_jd = ephemeris.julian_day(data['start'], data.get('start_time', '00:00'))
+            end_jd = ephemeris.julian_day(data['end'], data.get('end_time', '00:00'))
+        if end_jd <= start_jd:
+            return jsonify({"error": "end must be after start"}), 400
+        bodies = data.get('bodies') or ephemeris.BODIES
+        unknown = [body for body in bodies if body not in ephemeris.BODIES]
+        if unknown:
+            return jsonify({"error": f"Unknown bodies: {unknown}"}), 400
+
+        return jsonify(almanac(start_jd, end_jd, float(data['lat']), float(data['lon']), bodies))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/planetary-hour', methods=['POST'])
+def get_planetary_hour():
+    try:
+        data = request.json
+        jd = ephemeris.julian_day(data['date'], data['time'])
+        hour = planetary_hour(jd, float(data['lat']), float(data['lon']))
+        if hour is None:
+            return jsonify({"error": "No planetary hours here at this time (the Sun does not rise or set)"}), 404
+        return jsonify(hour)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+@admission.admitted(admission_control, '/tiles')
+def get_tile(layer, z, x, y):
+    try:
+        jd = ephemeris.julian_day(request.args['date'], request.args.get('time', '00:00'))
+        png = tiles.get_tile(layer, jd, z, x, y)
+        if png is None:
+            return jsonify({"error": f"No tile {layer}/{z}/{x}/{y}; layers are {tiles.LAYERS}"}), 404
+
+        response = Response(png, mimetype='image/png')
+        # A tile for a fixed moment never changes
+        response.headers['Cache-Control'] = 'public, max-age=604800, immutable'
+        response.set_etag(f"{layer}-{jd:.6f}-{z}-{x}-{y}")
+        return response.make_conditional(request)
+
+    except KeyError:
+        return jsonify({"error": "date query parameter is required"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Admin endpoints are only available locally"}), 403
+    try:
+        if request.method == 'POST':
+            data = request.json
+            with profiling.settings_lock:
+                if 'enabled' in data:
+                    profiling.settings['enabled'] = bool(data['enabled'])
+                if data.get('mode') in ('sample', 'cprofile'):
+                    profiling.settings['mode'] = data['mode']
+                if 'sample_rate' in data:
+                    profiling.settings['sample_rate'] = min(max(float(data['sample_rate']), 0.0), 1.0)
+        with profiling.settings_lock:
+            settings = dict(profiling.settings)
+        return jsonify({'settings': settings, 'profiles': profiling.list_profiles()})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Saved charts, opened on first use
+chart_store = None
+chart_store_lock = threading.Lock()
+
+def get_chart_store() -> ChartStore:
+    global chart_store
+    with chart_store_lock:
+        if chart_store is None:
+            chart_store = ChartStore()
+    return chart_store
+
+@app.route('/charts', methods=['GET', 'POST'])
+def saved_charts():
+    try:
+        store = get_chart_store()
+        if request.method == 'POST':
+            data = request.json
+            records = data if isinstance(data, list) else [data]
+            ids = store.save_many(records)
+            return jsonify({'ids': ids}), 201
+        limit = int(request.args.get('limit', 100))
+        offset = int(request.args.get('offset', 0))
+        return jsonify({'count': store.count(), 'charts': store.query(limit=limit, offset=offset)})
+
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid chart: {e}"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/charts/<int:chart_id>', methods=['GET', 'DELETE'])
+def saved_chart(chart_id):
+    try:
+        store = get_chart_store()
+        if request.method == 'DELETE':
+            if not store.delete(chart_id):
+                return jsonify({"error": f"No chart {chart_id}"}), 404
+            return jsonify({'deleted': chart_id})
+        chart = store.get(chart_id)
+        if chart is None:
+            return jsonify({"error": f"No chart {chart_id}"}), 404
+        return jsonify(chart)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/charts/query', methods=['POST'])
+def query_saved_charts():
+    try:
+        data = request.json
+        charts = get_chart_store().query(
+            placements=data.get('placements', []),
+            aspects=data.get('aspects', []),
+            limit=int(data.get('limit', 100)),
+            offset=int(data.get('offset', 0))
+        )
+        return jsonify({'charts': charts})
+
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/charts/export', methods=['GET'])
+def export_saved_charts():
+    store = get_chart_store()
+    lines = (json.dumps(record) + '\n' for record in store.export_records())
+    return Response(lines, mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=charts.jsonl'})
+
+@app.route('/charts/import', methods=['POST'])
+def import_saved_charts():
+    try:
+        if request.is_json:
+            records = request.json
+        else:
+            records = (json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip())
+        ids = get_chart_store().import_records(records)
+        return jsonify({'imported': len(ids), 'ids': ids}), 201
+
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid chart: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Transit alerts for saved charts, emitted to TRANSIT_ALERTS (file:<path>, webhook:<url> or queue)
+TRANSIT_ALERTS = os.environ.get('TRANSIT_ALERTS')
+transit_scheduler = TransitScheduler(
+    get_chart_store(), make_sink(TRANSIT_ALERTS),
+    interval=float(os.environ.get('TRANSIT_INTERVAL', 60))
+).start() if TRANSIT_ALERTS else None
+
+@app.route('/charts/<int:chart_id>/transits', methods=['GET'])
+def saved_chart_transits(chart_id):
+    if transit_scheduler is None:
+        return jsonify({"error": "Transit alerts are disabled; set TRANSIT_ALERTS to enable them"}), 503
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    events = transit_scheduler.upcoming(chart_id, limit=limit)
+    if events is None:
+        return jsonify({"error": f"No scheduled chart {chart_id}"}), 404
+    return jsonify({'transits': events})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = {'prefetch': prefetcher.metrics(), 'precision': tier_selector.metrics(),
+               'admission': admission_control.metrics()}
+    if transit_scheduler is not None:
+        metrics['transits'] = transit_scheduler.metrics()
+    return jsonify(metrics)
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
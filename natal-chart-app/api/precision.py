@@ -0,0 +1,376 @@
+import math
+import threading
+import numpy as np
+from bisect import bisect_right
+from dataclasses import dataclass
+from cachetools import LRUCache
+from typing import Dict, List, Optional, Tuple
+
+import swisseph
+
+import ephemeris
+from chartframe import ASCENDANT
+
+# Precision tiers for chart computation, least precise first:
+#
+#   analytic      no ephemeris calls for the bodies: Keplerian mean elements
+#                 with linear rates (Standish, JPL "Approximate Positions of
+#                 the Planets", fit for 1800-2050) for the Sun and planets,
+#                 and the main terms of the Meeus (ch. 47) lunar series, with
+#                 their analytic speeds. Measured against the Swiss Ephemeris
+#                 over 1900-2050: see ANALYTIC_ERROR (arc-minutes); latitudes
+#                 are within 1.3'. Costs the same for every date, with no cache
+#   interpolated  exact positions sampled at 0h UT each day (cached), cubic
+#                 Hermite interpolation from positions and speeds; within a
+#                 few arc-seconds for every body. Cheapest once the two days
+#                 around a moment are cached
+#   exact         AstroChart / flatlib, as before
+#
+# Both fast tiers use the analytic Ascendant/MC and Alcabitus cusps, which
+# match the Swiss Ephemeris to floating point precision at every latitude.
+
+TIERS = ['analytic', 'interpolated', 'exact']
+
+# Arc-minutes, 99th percentile / maximum over 20000 random moments 1900-2050
+ANALYTIC_ERROR = {
+    'Sun': (0.4, 0.5), 'Moon': (0.5, 0.8), 'Mercury': (0.8, 1.2), 'Venus': (1.1, 2.0),
+    'Mars': (2.0, 3.7), 'Jupiter': (8.9, 10.3), 'Saturn': (12.6, 13.5), 'Uranus': (2.0, 2.3),
+    'Neptune': (1.2, 1.3), 'Pluto': (1.2, 1.4)
+}
+
+# === Analytic tier === #
+
+# a (AU), e, I, L, longitude of perihelion, longitude of node (degrees) at
+# J2000 and their rates per Julian century, J2000 ecliptic and equinox
+ELEMENTS = {
+    'Mercury': ([0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593],
+                [0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081]),
+    'Venus': ([0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255],
+              [0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418]),
+    'Earth': ([1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0],
+              [0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0]),
+    'Mars': ([1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891],
+             [0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343]),
+    'Jupiter': ([5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909],
+                [-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106]),
+    'Saturn': ([9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448],
+               [-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794]),
+    'Uranus': ([19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503],
+               [-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589]),
+    'Neptune': ([30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574],
+                [0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.00508664]),
+    'Pluto': ([39.48211675, 0.24882730, 17.14001206, 238.92903833, 224.06891629, 110.30393684],
+              [-0.00031596, 0.00005170, 0.00004818, 145.20780515, -0.04062942, -0.01183482])
+}
+# Lunar longitude and latitude terms: multiples of D, M, M', F and the
+# coefficient in 1e-6 degrees (Meeus tables 47.A and 47.B, largest terms)
+MOON_LONGITUDE = [
+    (0, 0, 1, 0, 6288774), (2, 0, -1, 0, 1274027), (2, 0, 0, 0, 658314), (0, 0, 2, 0, 213618),
+    (0, 1, 0, 0, -185116), (0, 0, 0, 2, -114332), (2, 0, -2, 0, 58793), (2, -1, -1, 0, 57066),
+    (2, 0, 1, 0, 53322), (2, -1, 0, 0, 45758), (0, 1, -1, 0, -40923), (1, 0, 0, 0, -34720),
+    (0, 1, 1, 0, -30383), (2, 0, 0, -2, 15327), (0, 0, 1, 2, -12528), (0, 0, 1, -2, 10980),
+    (4, 0, -1, 0, 10675), (0, 0, 3, 0, 10034), (4, 0, -2, 0, 8548), (2, 1, -1, 0, -7888),
+    (2, 1, 0, 0, -6766), (1, 0, -1, 0, -5163), (1, 1, 0, 0, 4987), (2, -1, 1, 0, 4036),
+    (2, 0, 2, 0, 3994), (4, 0, 0, 0, 3861), (2, 0, -3, 0, 3665), (0, 1, -2, 0, -2689),
+    (2, 0, -1, 2, -2602), (2, -1, -2, 0, 2390), (1, 0, 1, 0, -2348), (2, -2, 0, 0, 2236),
+    (0, 1, 2, 0, -2120), (0, 2, 0, 0, -2069)
+]
+MOON_LATITUDE = [
+    (0, 0, 0, 1, 5128122), (0, 0, 1, 1, 280602), (0, 0, 1, -1, 277693), (2, 0, 0, -1, 173237),
+    (2, 0, -1, 1, 55413), (2, 0, -1, -1, 46271), (2, 0, 0, 1, 32573), (0, 0, 2, 1, 17198),
+    (2, 0, 1, -1, 9266), (0, 0, 2, -1, 8822), (2, -1, 0, -1, 8216), (2, 0, -2, -1, 4324),
+    (2, 0, 1, 1, 4200), (2, 1, 0, -1, -3359), (2, -1, -1, 1, 2463), (2, -1, 0, 1, 2211),
+    (2, -1, -1, -1, 2065), (0, 1, -1, -1, -1870), (4, 0, -1, -1, 1828), (0, 1, 0, 1, -1794),
+    (0, 0, 0, 3, -1749), (0, 1, -1, 1, -1565), (1, 0, 0, 1, -1491), (0, 1, 1, 1, -1475),
+    (0, 1, 1, -1, -1410), (0, 1, 0, -1, -1344), (1, 0, 0, -1, -1335), (0, 0, 3, 1, 1107),
+    (4, 0, 0, -1, 1021), (4, 0, -1, 1, 833)
+]
+
+J2000 = 2451545.0
+CENTURY = 36525.0
+# Light travel time for one AU, in days
+LIGHT_TIME = 0.0057755183
+# General precession in longitude, degrees per century
+PRECESSION = 1.3969713
+
+
+def _orbit(body: str, t: float) -> Tuple[Tuple[float, float, float], Tuple[float, float, float]]:
+    """Heliocentric ecliptic (J2000) position (AU) and velocity (AU per
+    century) of a planet at t Julian centuries from J2000"""
+    base, rates = ELEMENTS[body]
+    a, e, inc, mean_lon, peri, node = [value + rate * t for value, rate in zip(base, rates)]
+    mean_anomaly = math.radians((mean_lon - peri + 180.0) % 360.0 - 180.0)
+    anomaly = mean_anomaly + e * math.sin(mean_anomaly)
+    # Newton's method from a first-order start: e < 0.25, so three steps converge
+    for _ in range(3):
+        anomaly -= (anomaly - e * math.sin(anomaly) - mean_anomaly) / (1.0 - e * math.cos(anomaly))
+    sin_a, cos_a = math.sin(anomaly), math.cos(anomaly)
+    anomaly_rate = math.radians(rates[3] - rates[4]) / (1.0 - e * cos_a)
+    root = math.sqrt(1.0 - e * e)
+    x, y = a * (cos_a - e), a * root * sin_a
+    vx, vy = -a * sin_a * anomaly_rate, a * root * cos_a * anomaly_rate
+    w, o, i = math.radians(peri - node), math.radians(node), math.radians(inc)
+    cw, sw, co, so, ci, si = math.cos(w), math.sin(w), math.cos(o), math.sin(o), math.cos(i), math.sin(i)
+    xx, xy = cw * co - sw * so * ci, -sw * co - cw * so * ci
+    yx, yy = cw * so + sw * co * ci, -sw * so + cw * co * ci
+    zx, zy = sw * si, cw * si
+    return ((xx * x + xy * y, yx * x + yy * y, zx * x + zy * y),
+            (xx * vx + xy * vy, yx * vx + yy * vy, zx * vx + zy * vy))
+
+
+# Rates of D, M, M' and F in degrees per century, for the lunar speed
+_MOON_RATES = (445267.1114034, 35999.0502909, 477198.8675055, 483202.0175233)
+
+
+def _moon(t: float) -> Tuple[float, float, float]:
+    """Geocentric longitude and latitude of the Moon (mean equinox of date)
+    and its speed in degrees per day"""
+    lp = 218.3164477 + 481267.88123421 * t - 0.0015786 * t * t
+    d = 297.8501921 + 445267.1114034 * t - 0.0018819 * t * t
+    m = 357.5291092 + 35999.0502909 * t - 0.0001536 * t * t
+    mp = 134.9633964 + 477198.8675055 * t + 0.0087414 * t * t
+    f = 93.2720950 + 483202.0175233 * t - 0.0036539 * t * t
+    a1, a2, a3 = 119.75 + 131.849 * t, 53.09 + 479264.290 * t, 313.45 + 481266.484 * t
+    e = 1.0 - 0.002516 * t - 0.0000074 * t * t
+    eccentricity = (1.0, e, e * e)      # terms with M are scaled by e^|M|
+    rd, rm, rmp, rf = _MOON_RATES
+    sigma_l = sigma_v = sigma_b = 0.0
+    for cd, cm, cmp, cf, coefficient in MOON_LONGITUDE:
+        phase = math.radians(cd * d + cm * m + cmp * mp + cf * f)
+        amplitude = coefficient * eccentricity[abs(cm)]
+        sigma_l += amplitude * math.sin(phase)
+        sigma_v += amplitude * math.cos(phase) * math.radians(cd * rd + cm * rm + cmp * rmp + cf * rf)
+    for cd, cm, cmp, cf, coefficient in MOON_LATITUDE:
+        sigma_b += coefficient * eccentricity[abs(cm)] * math.sin(math.radians(cd * d + cm * m + cmp * mp + cf * f))
+    sigma_l += (3958 * math.sin(math.radians(a1)) + 1962 * math.sin(math.radians(lp - f))
+                + 318 * math.sin(math.radians(a2)))
+    sigma_b += (-2235 * math.sin(math.radians(lp)) + 382 * math.sin(math.radians(a3))
+                + 175 * math.sin(math.radians(a1 - f)) + 175 * math.sin(math.radians(a1 + f))
+                + 127 * math.sin(math.radians(lp - mp)) - 115 * math.sin(math.radians(lp + mp)))
+    return lp + sigma_l / 1e6, sigma_b / 1e6, (481267.88123421 + sigma_v / 1e6) / CENTURY
+
+
+def analytic_positions(jd: float) -> Tuple[List[float], List[float], List[float]]:
+    """Longitude, latitude and speed of every body at one moment, as plain lists.
+
+    Each planet's orbit is evaluated once: the light-time correction moves it
+    back along its velocity, and the speed comes from the same velocities.
+    """
+    t = (jd + swisseph.deltat(jd) - J2000) / CENTURY
+    # J2000 ecliptic to the true equinox of date: general precession plus
+    # the two largest nutation terms
+    nutation = (-17.20 * math.sin(math.radians(125.04452 - 1934.136261 * t))
+                - 1.32 * math.sin(math.radians(2 * (280.4665 + 36000.7698 * t)))) / 3600.0
+    precession = PRECESSION * t + 0.0003086 * t * t + nutation
+    (ex, ey, ez), (evx, evy, evz) = _orbit('Earth', t)
+    longitude, latitude, speed = [], [], []
+    for body in ephemeris.BODIES:
+        if body == 'Moon':
+            lon, lat, lon_speed = _moon(t)
+            longitude.append((lon + nutation) % 360.0)
+            latitude.append(lat)
+            speed.append(lon_speed)
+            continue
+        if body == 'Sun':
+            (x, y, z), (vx, vy, vz) = (-ex, -ey, -ez), (-evx, -evy, -evz)
+            pvx = pvy = pvz = 0.0
+        else:
+            (px, py, pz), (pvx, pvy, pvz) = _orbit(body, t)
+            x, y, z, vx, vy, vz = px - ex, py - ey, pz - ez, pvx - evx, pvy - evy, pvz - evz
+        distance = math.sqrt(x * x + y * y + z * z)
+        # Where the body was when the light left it
+        delay = distance * LIGHT_TIME / CENTURY
+        x, y, z = x - pvx * delay, y - pvy * delay, z - pvz * delay
+        lon = math.degrees(math.atan2(y, x)) + precession
+        if body == 'Sun':
+            # Annual aberration
+            lon -= 20.4898 / 3600.0 / distance
+        longitude.append(lon % 360.0)
+        latitude.append(math.degrees(math.asin(z / math.sqrt(x * x + y * y + z * z))))
+        speed.append((math.degrees((x * vy - y * vx) / (x * x + y * y)) + PRECESSION) / CENTURY)
+    return longitude, latitude, speed
+
+# === Interpolated tier === #
+
+day_samples = LRUCache(maxsize=4096)
+day_samples_lock = threading.Lock()
+
+
+def _day_sample(day: int) -> np.ndarray:
+    """Exact longitude, latitude and speed of every body at 0h UT of a day, (bodies, 3)"""
+    with day_samples_lock:
+        sample = day_samples.get(day)
+    if sample is None:
+        sample = np.array([ephemeris.body_positions(body, [day + 0.5]) for body in ephemeris.BODIES])[:, :, 0]
+        with day_samples_lock:
+            day_samples[day] = sample
+    return sample
+
+
+def interpolated_grid(jds) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Longitude, latitude and speed of every body over a grid, each shaped (bodies, n)"""
+    jds = np.atleast_1d(np.asarray(jds, dtype=np.float64))
+    days = np.floor(jds - 0.5).astype(np.int64)
+    first = int(days.min())
+    samples = np.stack([_day_sample(day) for day in range(first, int(days.max()) + 2)])  # (days, bodies, 3)
+    start, end = samples[days - first].transpose(1, 2, 0), samples[days - first + 1].transpose(1, 2, 0)
+    s = jds - (days + 0.5)
+    lon0, lon1 = start[:, 0], start[:, 0] + ephemeris.signed_difference(end[:, 0], start[:, 0])
+    v0, v1 = start[:, 2], end[:, 2]
+    # Cubic Hermite basis on [0, 1] with a one-day step
+    h00, h10, h01, h11 = 2 * s ** 3 - 3 * s ** 2 + 1, s ** 3 - 2 * s ** 2 + s, -2 * s ** 3 + 3 * s ** 2, s ** 3 - s ** 2
+    lon = (h00 * lon0 + h10 * v0 + h01 * lon1 + h11 * v1) % 360.0
+    speed = ((6 * s ** 2 - 6 * s) * lon0 + (3 * s ** 2 - 4 * s + 1) * v0
+             + (-6 * s ** 2 + 6 * s) * lon1 + (3 * s ** 2 - 2 * s) * v1)
+    lat = start[:, 1] + s * (end[:, 1] - start[:, 1])
+    return lon, lat, speed
+
+
+def interpolated_positions(jd: float) -> Tuple[List[float], List[float], List[float]]:
+    """Longitude, latitude and speed of every body at one moment, as plain lists"""
+    day = math.floor(jd - 0.5)
+    start, end = _day_sample(day).tolist(), _day_sample(day + 1).tolist()
+    s = jd - (day + 0.5)
+    s2, s3 = s * s, s * s * s
+    h00, h10, h01, h11 = 2 * s3 - 3 * s2 + 1, s3 - 2 * s2 + s, -2 * s3 + 3 * s2, s3 - s2
+    d00, d10, d01, d11 = 6 * s2 - 6 * s, 3 * s2 - 4 * s + 1, -6 * s2 + 6 * s, 3 * s2 - 2 * s
+    lons, lats, speeds = [], [], []
+    for (lon0, lat0, v0), (lon1, lat1, v1) in zip(start, end):
+        lon1 = lon0 + (180.0 - (180.0 - (lon1 - lon0)) % 360.0)
+        lons.append((h00 * lon0 + h10 * v0 + h01 * lon1 + h11 * v1) % 360.0)
+        lats.append(lat0 + s * (lat1 - lat0))
+        speeds.append(d00 * lon0 + d10 * v0 + d01 * lon1 + d11 * v1)
+    return lons, lats, speeds
+
+
+# === Single fast charts === #
+
+@dataclass
+class FastChart:
+    """One chart from a fast tier, as plain floats and lists (bodies in ephemeris.BODIES order)"""
+    longitude: List[float]
+    latitude: List[float]
+    speed: List[float]
+    house: List[int]
+    asc: float
+    mc: float
+    cusps: List[float]
+    aspects: List[tuple]      # (point1, point2, aspect type, angle, orb), in ChartFrame order
+
+
+# Aspects that can hold at each whole degree of separation (0-180), so a pair
+# is only tested against the one or two aspects near its separation
+_ASPECTS_NEAR = [[(name, aspect['angle'], aspect['orb']) for name, aspect in ephemeris.ASPECTS.items()
+                  if abs(degree - aspect['angle']) <= aspect['orb'] + 1] for degree in range(181)]
+_ASPECT_POINTS = list(ephemeris.BODIES) + [ASCENDANT]
+
+
+def fast_chart(jd: float, lat: float, lon: float, tier: str = 'interpolated') -> FastChart:
+    """One chart from the analytic or interpolated tier.
+
+    Everything is scalar Python: for a single chart NumPy's per-call overhead
+    costs more than the arithmetic, and the exact tier is only a few hundred
+    microseconds.
+    """
+    if tier == 'analytic':
+        longitude, latitude, speed = analytic_positions(jd)
+    else:
+        longitude, latitude, speed = interpolated_positions(jd)
+    asc, mc, cusps = ephemeris.chart_angles(ephemeris.sidereal_time(jd) + lon, lat, ephemeris.obliquity(jd))
+    first = cusps[0]
+    offsets = [(cusp - first) % 360.0 for cusp in cusps]
+    house = [bisect_right(offsets, (body_lon - first) % 360.0) for body_lon in longitude]
+
+    points = longitude + [asc]
+    aspects = []
+    for i in range(len(points) - 1):
+        for j in range(i + 1, len(points)):
+            diff = abs(points[i] - points[j])
+            if diff > 180.0:
+                diff = 360.0 - diff
+            for name, angle, orb in _ASPECTS_NEAR[int(diff + 0.5)]:
+                if abs(diff - angle) <= orb:
+                    # Orbs don't overlap: one aspect per pair at most
+                    aspects.append((_ASPECT_POINTS[i], _ASPECT_POINTS[j], name, diff, abs(diff - angle)))
+                    break
+    return FastChart(longitude=longitude, latitude=latitude, speed=speed, house=house,
+                     asc=asc, mc=mc, cusps=cusps, aspects=aspects)
+
+
+# === Tier selection === #
+
+# Seconds per /quick-chart, from `python accuracy.py` (warm day cache; the
+# interpolated tier costs about 0.4 ms on days it has not sampled yet). The
+# running averages take over from the first requests on.
+INITIAL_COSTS = {'analytic': 0.0002, 'interpolated': 0.0001, 'exact': 0.0007}
+
+class TierSelector:
+    """Picks the most precise tier that fits a latency budget or the current load.
+
+    Costs per tier are running averages of measured compute times. load is
+    the number of requests computing or queued for a slot when the request
+    arrives (the tier is picked before it queues), defaulting to those in
+    flight here. With a budget, the budget is shared by that load (they
+    compete for the same CPU); without one, the default tier steps down one
+    level per load_step (the number of compute slots: a step once requests
+    start to queue). A step only goes to a tier that currently costs less:
+    the most precise cheaper one below, or none, so shedding precision always
+    sheds work.
+    """
+
+    def __init__(self, initial_costs: Optional[Dict[str, float]] = None, smoothing: float = 0.1,
+                 load_step: int = 4):
+        self.costs = dict(initial_costs or INITIAL_COSTS)
+        self.smoothing = smoothing
+        self.load_step = max(1, load_step)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def choose(self, requested: Optional[str] = None, budget_ms: Optional[float] = None,
+               default: str = 'exact', degrade: bool = True, load: Optional[int] = None) -> str:
+        if requested in TIERS:
+            return requested
+        with self.lock:
+            if load is None:
+                load = self.in_flight
+            costs = dict(self.costs)
+        if budget_ms is not None:
+            budget = budget_ms / 1000.0 / max(1, load)
+            for tier in reversed(TIERS):
+                if costs[tier] <= budget:
+                    return tier
+            return min(TIERS, key=costs.get)
+        if not degrade:
+            return default
+        tier = default
+        for _ in range(load // self.load_step):
+            cheaper = [lower for lower in TIERS[:TIERS.index(tier)] if costs[lower] < costs[tier]]
+            if not cheaper:
+                break
+            tier = cheaper[-1]
+        return tier
+
+    def record(self, tier: str, seconds: float):
+        with self.lock:
+            self.costs[tier] += self.smoothing * (seconds - self.costs[tier])
+
+    def running(self):
+        """Context manager counting a request as in flight"""
+        selector = self
+
+        class _Running:
+            def __enter__(self):
+                with selector.lock:
+                    selector.in_flight += 1
+
+            def __exit__(self, *exc):
+                with selector.lock:
+                    selector.in_flight -= 1
+                return False
+
+        return _Running()
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {'in_flight': self.in_flight,
+                    'cost_ms': {tier: round(cost * 1000, 3) for tier, cost in self.costs.items()}}
@@ -0,0 +1,161 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache, TTLCache
+from typing import Callable, Dict, Optional
+
+import ephemeris
+
+# Speculative prefetch for scrubbing sessions. Every real /chart or
+# /quick-chart request is observed per client; when the last few requests
+# of a client step by a constant amount in time and/or location (a date
+# slider tick, a globe drag), the next frames along that direction are
+# computed ahead of time on an idle worker. Results go into a separate
+# speculative cache so they never evict charts that were really requested;
+# a hit promotes the entry into the caller's cache. Queued speculation is
+# dropped as soon as real traffic arrives.
+
+# Requests further apart than this (seconds) start a new session
+SESSION_GAP = 2.0
+# Consecutive steps must agree to within this fraction to count as a scrub
+STEP_TOLERANCE = 0.05
+
+
+def _decimals(value) -> int:
+    """Decimal places of a coordinate as sent (a number or a numeric string)"""
+    text = str(float(value))
+    return len(text.split('.')[1]) if '.' in text else 0
+
+
+class Prefetcher:
+    def __init__(self, compute: Dict[str, Callable[[dict], dict]], key: Callable[[dict], str],
+                 depth: int = 4, workers: int = 1, cache_size: int = 500, ttl: float = 30,
+                 admission=None):
+        self.compute = compute
+        # Optional AdmissionController; speculation only runs on a slot nobody waits for
+        self.admission = admission
+        self.key = key
+        self.depth = depth
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.lock = threading.Lock()
+        self.sessions = LRUCache(maxsize=10000)
+        self.pending = {}
+        self.active = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self.stats = {'scheduled': 0, 'computed': 0, 'cancelled': 0, 'hits': 0, 'errors': 0}
+
+    # === Real traffic === #
+
+    def foreground(self):
+        """Context manager around real request handling; pauses speculation"""
+        prefetcher = self
+
+        class _Foreground:
+            def __enter__(self):
+                with prefetcher.lock:
+                    prefetcher.active += 1
+                    for future in prefetcher.pending.values():
+                        if future.cancel():
+                            prefetcher.stats['cancelled'] += 1
+                    prefetcher.pending.clear()
+
+            def __exit__(self, *exc):
+                with prefetcher.lock:
+                    prefetcher.active -= 1
+                return False
+
+        return _Foreground()
+
+    def lookup(self, endpoint: str, data: dict) -> Optional[dict]:
+        """A speculatively computed result for this request, if any"""
+        with self.lock:
+            result = self.cache.pop((endpoint, self.key(data)), None)
+            if result is not None:
+                self.stats['hits'] += 1
+        return result
+
+    def observe(self, client: str, endpoint: str, data: dict):
+        """Record a real request and schedule the predicted next frames"""
+        try:
+            point = (time.time(), ephemeris.julian_day(data['date'], data['time']),
+                     float(data['lat']), float(data['lon']))
+        except (KeyError, ValueError, TypeError):
+            return
+        with self.lock:
+            history = self.sessions.setdefault((client, endpoint), deque(maxlen=3))
+            if history and point[0] - history[-1][0] > SESSION_GAP:
+                history.clear()
+            history.append(point)
+            if len(history) < 3:
+                return
+            step = self._constant_step(history)
+        if step is None:
+            return
+        self._schedule(endpoint, data, point, step)
+
+    # === Speculation === #
+
+    @staticmethod
+    def _constant_step(history):
+        (_, jd0, lat0, lon0), (_, jd1, lat1, lon1), (_, jd2, lat2, lon2) = history
+        first = (jd1 - jd0, lat1 - lat0, ephemeris.signed_difference(lon1, lon0))
+        second = (jd2 - jd1, lat2 - lat1, ephemeris.signed_difference(lon2, lon1))
+        if not any(abs(v) > 1e-9 for v in second):
+            return None
+        for a, b in zip(first, second):
+            if abs(a - b) > STEP_TOLERANCE * max(abs(a), abs(b)) + 1e-9:
+                return None
+        return second
+
+    def _schedule(self, endpoint, data, point, step):
+        _, jd, lat, lon = point
+        lat_decimals, lon_decimals = _decimals(data['lat']), _decimals(data['lon'])
+        for k in range(1, self.depth + 1):
+            next_lat = lat + k * step[1]
+            if not -90 <= next_lat <= 90:
+                break
+            date, time_str = ephemeris.jd_to_date_time(jd + k * step[0])
+            frame = dict(data, date=date, time=time_str,
+                         lat=round(next_lat, lat_decimals),
+                         lon=round((lon + k * step[2] + 180) % 360 - 180, lon_decimals))
+            cache_key = (endpoint, self.key(frame))
+            with self.lock:
+                if cache_key in self.cache or cache_key in self.pending or self.active:
+                    continue
+                self.pending[cache_key] = self.executor.submit(self._run, endpoint, frame, cache_key)
+                self.stats['scheduled'] += 1
+
+    def _run(self, endpoint, frame, cache_key):
+        with self.lock:
+            self.pending.pop(cache_key, None)
+            if self.active:
+                self.stats['cancelled'] += 1
+                return
+        if self.admission is not None and not self.admission.try_acquire('speculative'):
+            with self.lock:
+                self.stats['cancelled'] += 1
+            return
+        try:
+            result = self.compute[endpoint](frame)
+        except Exception:
+            with self.lock:
+                self.stats['errors'] += 1
+            return
+        finally:
+            if self.admission is not None:
+                self.admission.release()
+        with self.lock:
+            self.cache[cache_key] = result
+            self.stats['computed'] += 1
+
+    def metrics(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['cached'] = len(self.cache)
+            stats['pending'] = len(self.pending)
+        computed = stats['computed']
+        stats['hit_rate'] = stats['hits'] / computed if computed else 0.0
+        # Computed frames that were never served (still cached ones may yet be)
+        stats['wasted'] = computed - stats['hits'] - stats['cached']
+        return stats
@@ -0,0 +1,170 @@
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import cProfile
+import threading
+from collections import Counter
+from functools import wraps
+from flask import request, make_response
+
+# Opt-in request profiling for the chart handlers.
+#
+# A request is profiled when it sends 'X-Profile: 1' (or 'X-Profile: cprofile'),
+# when profiling is switched on through /admin/profiling, or at random with
+# probability PROFILE_SAMPLE_RATE (always-on sampling, default off). Stack
+# samples are written as collapsed stacks ('a;b;c count' lines, the input
+# format of flamegraph.pl and speedscope), cProfile runs as .prof files, both
+# named after the request ID (the client's X-Request-ID when it is a plain
+# hex/dash token, a server-generated one otherwise). PROFILE_MAX_BYTES bounds the directory size by
+# deleting the oldest profiles first.
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'data', 'profiles'))
+PROFILE_MAX_BYTES = int(os.environ.get('PROFILE_MAX_BYTES', 50 * 1024 * 1024))
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.001))
+
+REQUEST_ID = re.compile(r'[0-9a-f-]{1,64}')
+
+settings = {
+    'enabled': False,   # profile every request (admin toggle)
+    'mode': 'sample',   # 'sample' (collapsed stacks) or 'cprofile'
+    'sample_rate': float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+}
+settings_lock = threading.Lock()
+prune_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+
+def _profile_mode():
+    """The profiler to use for the current request, or None"""
+    header = request.headers.get('X-Profile', '').lower()
+    if header in ('1', 'true', 'sample'):
+        return 'sample'
+    if header == 'cprofile':
+        return 'cprofile'
+    with settings_lock:
+        if settings['enabled']:
+            return settings['mode']
+        if settings['sample_rate'] > 0 and random.random() < settings['sample_rate']:
+            return 'sample'
+    return None
+
+
+def _prune():
+    """Delete the oldest profiles until the directory fits PROFILE_MAX_BYTES"""
+    with prune_lock:
+        files = []
+        for name in os.listdir(PROFILE_DIR):
+            path = os.path.join(PROFILE_DIR, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= PROFILE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def _request_id() -> str:
+    """The client's X-Request-ID if it is safe to use in a file name, else a new one"""
+    request_id = request.headers.get('X-Request-ID', '').lower()
+    return request_id if REQUEST_ID.fullmatch(request_id) else uuid.uuid4().hex
+
+
+def _profile_path(request_id: str, suffix: str) -> str:
+    """File for a profile, refusing anything that resolves outside PROFILE_DIR"""
+    endpoint = request.path.strip('/').replace('/', '_') or 'root'
+    root = os.path.realpath(PROFILE_DIR)
+    path = os.path.realpath(os.path.join(root, f"{request_id}_{endpoint}{suffix}"))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"profile path {path} is outside {root}")
+    return path
+
+
+def _write_profile(request_id: str, mode: str, result, elapsed: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if mode == 'cprofile':
+        path = _profile_path(request_id, '.prof')
+        result.dump_stats(path)
+    else:
+        path = _profile_path(request_id, '.collapsed')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# {request.path} {elapsed * 1000:.1f}ms {request.get_data(as_text=True)}\n")
+            for stack, count in result.most_common():
+                f.write(f"{stack} {count}\n")
+    _prune()
+    return path
+
+
+def profiled(handler):
+    """Wrap a Flask view so opted-in requests are profiled"""
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        mode = _profile_mode()
+        if mode is None:
+            return handler(*args, **kwargs)
+
+        request_id = _request_id()
+        started = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            rv = profiler.runcall(handler, *args, **kwargs)
+            result = profiler
+        else:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            try:
+                rv = handler(*args, **kwargs)
+            finally:
+                result = sampler.stop()
+        elapsed = time.perf_counter() - started
+
+        response = make_response(rv)
+        try:
+            _write_profile(request_id, mode, result, elapsed)
+            response.headers['X-Profile-Id'] = request_id
+        except Exception as e:
+            print(f"Could not write profile for {request_id}: {e}")
+        return response
+    return wrapper
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(os.listdir(PROFILE_DIR))
@@ -0,0 +1,139 @@
+import numpy as np
+from flatlib import const
+from typing import Dict, List
+
+import ephemeris
+from chartframe import ASCENDANT, ASPECT_NAMES, cross_aspect_columns
+
+# Secondary progressions and solar arc directions over a span of ages. With
+# secondary progressions each day after birth stands for one year of life,
+# so the progressed positions for ages a0..a1 are one ephemeris sweep over
+# birth + a0 .. birth + a1 days. The solar arc (progressed minus natal Sun)
+# then directs every natal point and both angles; aspects of the progressed
+# and directed points to the natal chart come from one vectorized
+# cross-aspect pass over all ages.
+
+TROPICAL_YEAR = 365.242199
+
+# Mean solar arc per year for Naibod-progressed angles (deg)
+NAIBOD_RATE = 0.98564736
+
+ANGLE_METHODS = ('solar_arc', 'naibod')
+
+MIDHEAVEN = 'MC'
+
+# Natal points taking part: bodies plus both angles
+POINTS = ephemeris.BODIES + [ASCENDANT, MIDHEAVEN]
+
+# Progressions move slowly (the Moon about 1 deg/year), so aspects are
+# counted within a tight orb
+DEFAULT_ORB = 1.0
+
+MAX_AGES = 2000
+
+
+def age_range(start: float, end: float, step: float) -> np.ndarray:
+    """Ages start, start + step, ... up to and including end"""
+    if step <= 0:
+        raise ValueError("step_years must be positive")
+    return np.arange(start, end + step / 2, step)
+
+
+def _ascendant_from_mc(mc: np.ndarray, lat: float, eps: float) -> np.ndarray:
+    """Ascendant of the sidereal angle (RAMC) that culminates at the MC longitude"""
+    armc, _ = ephemeris.ecliptic_to_equatorial(mc, eps)
+    asc, _ = ephemeris.ascendant_mc(armc, lat, eps)
+    return asc
+
+
+def _point_rows(lons: np.ndarray, speeds: np.ndarray, i: int, names: List[str]) -> Dict[str, dict]:
+    return {name: {
+        'longitude': float(lons[k, i]),
+        'sign': ephemeris.SIGNS[int(lons[k, i] // 30) % 12],
+        'speed': round(float(speeds[k, i]), 6)
+    } for k, name in enumerate(names)}
+
+
+def _aspect_rows(columns: Dict[str, np.ndarray], i: int, moving: np.ndarray, speeds: np.ndarray,
+                 natal: np.ndarray, kind: str) -> List[dict]:
+    rows = []
+    for a in range(columns['aspect_offsets'][i], columns['aspect_offsets'][i + 1]):
+        m, f = columns['aspect_moving'][a], columns['aspect_fixed'][a]
+        if m == f:
+            continue  # a point's own natal place only measures its motion (the arc itself when directed)
+        angle = ephemeris.ASPECTS[ASPECT_NAMES[columns['aspect_type'][a]]]['angle']
+        # Applying while the separation moves towards the exact angle
+        separation = ephemeris.signed_difference(moving[m, i], natal[f])
+        closing = np.sign(separation) * speeds[m, i] * (abs(separation) - angle)
+        rows.append({
+            kind: POINTS[m],
+            'natal': POINTS[f],
+            'aspect_type': ASPECT_NAMES[columns['aspect_type'][a]],
+            'angle': float(columns['aspect_angle'][a]),
+            'orb': float(columns['aspect_orb'][a]),
+            'applying': bool(closing < 0)
+        })
+    return rows
+
+
+def progressions(natal_jd: float, lat: float, lon: float, ages: np.ndarray,
+                 angle_method: str = 'solar_arc', orb: float = DEFAULT_ORB) -> Dict:
+    """Progressed and solar-arc directed charts of a natal chart at each age (years)"""
+    if angle_method not in ANGLE_METHODS:
+        raise ValueError(f"Unknown angle method {angle_method}; use one of {list(ANGLE_METHODS)}")
+    ages = np.asarray(ages, dtype=np.float64)
+    if ages.size == 0 or (ages < 0).any():
+        raise ValueError("ages must be non-negative")
+    if ages.size > MAX_AGES:
+        raise ValueError(f"At most {MAX_AGES} ages per request")
+    eps = ephemeris.obliquity(natal_jd)
+
+    # One sweep: the natal moment followed by a day per year of age
+    jds = np.concatenate([[natal_jd], natal_jd + ages])
+    lons = np.empty((len(ephemeris.BODIES), jds.size), dtype=np.float64)
+    speeds = np.empty_like(lons)
+    for k, body in enumerate(ephemeris.BODIES):
+        lons[k], _, speeds[k] = ephemeris.body_positions(body, jds)
+    natal_asc, natal_mc = ephemeris.angles([natal_jd], lat, lon)
+    natal = np.concatenate([lons[:, 0], natal_asc, natal_mc])
+
+    # Progressed speeds are per day of ephemeris time, i.e. per year of life
+    sun = ephemeris.BODIES.index(const.SUN)
+    arc = (lons[sun, 1:] - natal[sun]) % 360.0
+    arc_rate = speeds[sun, 1:]
+    if angle_method == 'solar_arc':
+        mc_arc, mc_rate = arc, arc_rate
+    else:
+        mc_arc, mc_rate = NAIBOD_RATE * ages, np.full(ages.size, NAIBOD_RATE)
+    progressed_mc = (natal[-1] + mc_arc) % 360.0
+    progressed_asc = _ascendant_from_mc(progressed_mc, lat, eps)
+    # The Ascendant's rate from a small step of the MC
+    asc_rate = ephemeris.signed_difference(_ascendant_from_mc(progressed_mc + 0.01, lat, eps), progressed_asc) / 0.01 * mc_rate
+
+    progressed = np.vstack([lons[:, 1:], progressed_asc, progressed_mc])
+    progressed_speed = np.vstack([speeds[:, 1:], asc_rate, mc_rate])
+    directed = (natal[:, None] + arc[None, :]) % 360.0
+    directed_speed = np.broadcast_to(arc_rate, directed.shape)
+
+    progressed_aspects = cross_aspect_columns(progressed, natal, orb)
+    directed_aspects = cross_aspect_columns(directed, natal, orb)
+
+    rows = []
+    for i, age in enumerate(ages):
+        rows.append({
+            'age': round(float(age), 6),
+            'date': ephemeris.jd_to_iso(natal_jd + age * TROPICAL_YEAR),
+            'progressed_date': ephemeris.jd_to_iso(natal_jd + age),
+            'solar_arc': float(arc[i]),
+            'progressed': _point_rows(progressed, progressed_speed, i, POINTS),
+            'directed': _point_rows(directed, directed_speed, i, POINTS),
+            'aspects': (_aspect_rows(progressed_aspects, i, progressed, progressed_speed, natal, 'progressed')
+                        + _aspect_rows(directed_aspects, i, directed, directed_speed, natal, 'directed'))
+        })
+    return {
+        'natal': {name: {'longitude': float(natal[k]), 'sign': ephemeris.SIGNS[int(natal[k] // 30) % 12]}
+                  for k, name in enumerate(POINTS)},
+        'angle_method': angle_method,
+        'orb': orb,
+        'ages': rows
+    }
@@ -0,0 +1,94 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+
+import ephemeris
+
+# Charts are encoded as fixed-length circular feature vectors: (cos, sin) of
+# each body's longitude, optionally followed by the Ascendant and Midheaven.
+# Vectors are scaled so the dot product of two charts is the mean cosine of
+# their per-body separations (1.0 = identical sky, -1.0 = every body opposed).
+
+# Grid moments per index: the grid is built inside an admission slot, at
+# about 0.12 ms per moment (10000 is about 14 months hourly, 1.2 s)
+MAX_SLOTS = 10000
+
+
+def encode_longitudes(lons: np.ndarray) -> np.ndarray:
+    """Encode a (n, bodies) longitude matrix as (n, 2 * bodies) unit-mean vectors"""
+    lons = np.atleast_2d(np.asarray(lons, dtype=np.float64))
+    radians = np.radians(lons)
+    scale = 1.0 / np.sqrt(lons.shape[1])
+    vectors = np.empty((lons.shape[0], lons.shape[1] * 2), dtype=np.float64)
+    vectors[:, 0::2] = np.cos(radians) * scale
+    vectors[:, 1::2] = np.sin(radians) * scale
+    return vectors
+
+
+def chart_longitudes(jds, lat: float, lon: float, include_angles: bool = False) -> np.ndarray:
+    """Longitudes of every feature body (plus angles if asked) over a time grid"""
+    lons = ephemeris.longitudes(ephemeris.BODIES, jds)
+    if include_angles:
+        asc, mc = ephemeris.angles(jds, lat, lon)
+        lons = np.column_stack([lons, asc, mc])
+    return lons
+
+
+def chart_vector(jd: float, lat: float, lon: float, include_angles: bool = False) -> np.ndarray:
+    """Feature vector for a single moment"""
+    return encode_longitudes(chart_longitudes([jd], lat, lon, include_angles))[0]
+
+
+@dataclass
+class Match:
+    jd: float
+    similarity: float
+
+
+class MomentIndex:
+    """Nearest-neighbor index over a precomputed time grid at one location.
+
+    The grid is encoded once; each query is a single matrix-vector product
+    followed by a top-k selection, instead of one AstroChart per candidate.
+    """
+
+    def __init__(self, start_jd: float, end_jd: float, step_days: float,
+                 lat: float = 0.0, lon: float = 0.0, include_angles: bool = False):
+        self.lat = lat
+        self.lon = lon
+        self.include_angles = include_angles
+        if step_days <= 0:
+            raise ValueError("step must be positive")
+        slots = int((end_jd - start_jd) / step_days) + 1
+        if slots > MAX_SLOTS:
+            raise ValueError(f"{slots} slots; at most {MAX_SLOTS} per search (use a larger step)")
+        self.jds = ephemeris.time_grid(start_jd, end_jd, step_days)
+        self.vectors = encode_longitudes(chart_longitudes(self.jds, lat, lon, include_angles))
+
+    def __len__(self):
+        return len(self.jds)
+
+    def similarities(self, vector: np.ndarray) -> np.ndarray:
+        """Similarity of every grid moment to the query vector"""
+        return self.vectors @ vector
+
+    def query(self, vector: np.ndarray, k: int = 20,
+              after_jd: Optional[float] = None) -> List[Match]:
+        """The k most similar distinct moments, in chronological order.
+
+        Adjacent grid slots around one good moment are nearly identical, so
+        only local similarity peaks count as candidates. A peak needs a
+        neighbour on both sides: the first and last slots are only the
+        search range cut through a rising or falling slope.
+        """
+        scores = self.similarities(vector)
+        peaks = np.zeros(scores.size, dtype=bool)
+        peaks[1:-1] = (scores[1:-1] >= scores[:-2]) & (scores[1:-1] > scores[2:])
+        if after_jd is not None:
+            peaks &= self.jds > after_jd
+        candidates = np.nonzero(peaks)[0]
+        if candidates.size > k:
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+        candidates.sort()
+        return [Match(jd=float(self.jds[i]), similarity=float(scores[i])) for i in candidates]
@@ -0,0 +1,114 @@
+import os
+import zlib
+import struct
+import threading
+import numpy as np
+from cachetools import LRUCache
+from typing import Optional
+
+import ephemeris
+
+# Lazily generated overlay tiles for the globe. A tile is addressed by
+# (moment, layer, z/x/y) in the Web Mercator tile scheme; all of its pixels
+# are classified in one vectorized batch from the analytic Ascendant/MC and
+# Alcabitus cusp formulas, encoded as a paletted PNG, and kept in a
+# byte-bounded LRU (optionally mirrored to disk) so panning and zooming
+# reuse earlier work.
+#
+# Layers:
+#   asc-sign, mc-sign   sign on the Ascendant / Midheaven (class = sign 1-12)
+#   <body>-house        house the body falls in, e.g. sun-house (class = house 1-12)
+#
+# Class 0 is transparent (no data).
+
+TILE_SIZE = 256
+MAX_ZOOM = 12
+TILE_CACHE_BYTES = int(os.environ.get('TILE_CACHE_BYTES', 64 * 1024 * 1024))
+TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR')
+
+# Twelve distinguishable colours, one per sign/house; class 0 is transparent
+PALETTE = [(0, 0, 0),
+           (230, 80, 60), (140, 110, 60), (240, 200, 60), (90, 170, 220),
+           (250, 150, 40), (120, 160, 80), (220, 130, 170), (130, 40, 60),
+           (160, 90, 200), (90, 90, 110), (60, 200, 180), (70, 110, 200)]
+ALPHA = [0] + [110] * 12
+
+BODY_LAYERS = {f'{body.lower()}-house': body for body in ephemeris.BODIES}
+LAYERS = ['asc-sign', 'mc-sign'] + list(BODY_LAYERS)
+
+tile_cache = LRUCache(maxsize=TILE_CACHE_BYTES, getsizeof=len)
+tile_cache_lock = threading.Lock()
+
+
+def tile_coordinates(z: int, x: int, y: int, size: int = TILE_SIZE):
+    """Latitude/longitude of every pixel centre of a Web Mercator tile, (size, size)"""
+    scale = 2 ** z
+    pixel = (np.arange(size) + 0.5) / size
+    lons = (x + pixel) / scale * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixel) / scale))))
+    return np.meshgrid(lats, lons, indexing='ij')
+
+
+def classify(layer: str, jd: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Class (0-12) of every pixel of a layer at one moment"""
+    eps = ephemeris.obliquity(jd)
+    armc = ephemeris.sidereal_time(jd) + lons
+    if layer in ('asc-sign', 'mc-sign'):
+        asc, mc = ephemeris.ascendant_mc(armc, lats, eps)
+        return (ephemeris.sign_index(asc if layer == 'asc-sign' else mc) + 1).astype(np.uint8)
+    body = BODY_LAYERS[layer]
+    cusps = ephemeris.alcabitus_cusps(armc.ravel(), lats.ravel(), eps)
+    body_lon = ephemeris.body_longitude(body, jd)
+    houses = ephemeris.assign_houses(np.full((1, cusps.shape[1]), body_lon), cusps)[0]
+    return houses.reshape(lats.shape).astype(np.uint8)
+
+
+def encode_png(classes: np.ndarray) -> bytes:
+    """Paletted PNG (with transparency) of a 2-D uint8 class grid"""
+    height, width = classes.shape
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    # Each scanline starts with filter type 0
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), classes]).tobytes()
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+            + chunk(b'PLTE', bytes(c for color in PALETTE for c in color))
+            + chunk(b'tRNS', bytes(ALPHA))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def _disk_path(key) -> str:
+    layer, jd, z, x, y = key
+    return os.path.join(TILE_CACHE_DIR, layer, f'{jd:.6f}', str(z), str(x), f'{y}.png')
+
+
+def get_tile(layer: str, jd: float, z: int, x: int, y: int) -> Optional[bytes]:
+    """PNG bytes for one tile, from memory, disk or freshly computed; None if out of range"""
+    if layer not in LAYERS or not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return None
+    key = (layer, round(jd, 6), z, x, y)
+    with tile_cache_lock:
+        png = tile_cache.get(key)
+    if png is not None:
+        return png
+
+    if TILE_CACHE_DIR and os.path.exists(_disk_path(key)):
+        with open(_disk_path(key), 'rb') as f:
+            png = f.read()
+    else:
+        lats, lons = tile_coordinates(z, x, y)
+        png = encode_png(classify(layer, jd, lats, lons))
+        if TILE_CACHE_DIR:
+            path = _disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(png)
+            os.replace(path + '.tmp', path)
+
+    with tile_cache_lock:
+        tile_cache[key] = png
+    return png
@@ -0,0 +1,304 @@
+import os
+import json
+import heapq
+import queue
+import itertools
+import threading
+import time
+import urllib.request
+import numpy as np
+from flatlib import const
+from typing import Dict, List, Optional, Tuple
+
+import ephemeris
+import precision
+from chartstore import POINTS, ChartStore
+
+# Transit alerts for saved charts. A background scheduler keeps every saved
+# chart's upcoming transit-to-natal aspect perfections in one time-ordered
+# heap and emits each event to a sink LEAD_DAYS before it perfects.
+#
+# Transiting positions are sampled once per SEGMENT_DAYS segment and shared
+# by every chart; each chart's perfections are sign changes of the offset
+# between a transiting body and a natal point +/- an aspect angle, found for
+# batches of charts at once and refined with one Newton step on the
+# interpolated ephemeris. The horizon grows a segment at a time, a chart is
+# only recomputed when it is added or its moment or place changes (checked
+# cheaply through SQLite's data_version), and between events a tick just
+# peeks at the top of the heap.
+
+# The Moon would add an event every couple of hours per chart
+TRANSIT_BODIES = [body for body in ephemeris.BODIES if body != const.MOON]
+
+SAMPLE_STEP = 0.25         # days; Mercury moves at most ~2.2 deg/day
+SEGMENT_DAYS = 30.0
+LOOKAHEAD_DAYS = 60.0
+LEAD_DAYS = 1.0
+
+# Charts per vectorized batch (bounds the (targets, samples) offset arrays)
+BATCH_CHARTS = 256
+
+# Offsets of the aspected degree from a natal point, with the aspect name
+_OFFSETS = sorted({(sign * a['angle']) % 360.0: name for name, a in ephemeris.ASPECTS.items()
+                   for sign in (1, -1)}.items())
+OFFSET_ANGLES = np.array([angle for angle, _ in _OFFSETS])
+OFFSET_NAMES = [name for _, name in _OFFSETS]
+
+
+def now_jd() -> float:
+    return time.time() / 86400.0 + 2440587.5
+
+
+# === Sinks === #
+
+class FileSink:
+    """Appends one JSON line per event"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def emit(self, event: dict):
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event) + '\n')
+
+
+class QueueSink:
+    """Puts events on an in-process queue for a consumer thread"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def emit(self, event: dict):
+        self.queue.put_nowait(event)
+
+
+class WebhookSink:
+    """POSTs each event as JSON to a URL (no retries)"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, event: dict):
+        request = urllib.request.Request(self.url, data=json.dumps(event).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+
+def make_sink(spec: str):
+    """Sink from a spec: 'file:<path>', 'webhook:<url>' or 'queue'"""
+    kind, _, target = spec.partition(':')
+    if kind == 'file':
+        return FileSink(target)
+    if kind == 'webhook':
+        return WebhookSink(target)
+    if kind == 'queue':
+        return QueueSink()
+    raise ValueError(f"Unknown transit sink {spec!r}; use file:<path>, webhook:<url> or queue")
+
+
+# === Perfections === #
+
+def _sample(start: float, end: float, bodies: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    jds = ephemeris.time_grid(start, end, SAMPLE_STEP)
+    if jds[-1] < end:
+        jds = np.append(jds, end)
+    return jds, np.array([ephemeris.body_positions(body, jds)[0] for body in bodies])
+
+
+def perfections(natal: np.ndarray, jds: np.ndarray, lons: np.ndarray, bodies: List[str]) -> List[dict]:
+    """Transit-to-natal aspect perfections in a sampled span.
+
+    natal is (charts, points) longitudes (NaN for missing points), lons the
+    (bodies, samples) transiting longitudes at jds. Returns events with the
+    chart row, body, point and aspect indices and the refined time.
+    """
+    targets = (natal[:, :, None] + OFFSET_ANGLES[None, None, :]).reshape(-1)         # (charts * points * offsets)
+    # Each body sweeps a short arc in a segment (Pluto barely a degree), so
+    # only targets inside that arc are sampled densely
+    unwrapped = lons[:, :1] + np.concatenate(
+        [np.zeros((lons.shape[0], 1)), np.cumsum(ephemeris.signed_difference(lons[:, 1:], lons[:, :-1]), axis=1)], axis=1)
+    low, high = unwrapped.min(axis=1), unwrapped.max(axis=1)
+    body, target, i, d0, d1 = [], [], [], [], []
+    for b in range(lons.shape[0]):
+        with np.errstate(invalid='ignore'):
+            candidates = np.nonzero((targets - low[b]) % 360.0 <= high[b] - low[b])[0]
+        offsets = ephemeris.signed_difference(lons[b][None, :], targets[candidates][:, None])  # (candidates, samples)
+        negative = offsets < 0
+        change = negative[:, :-1] != negative[:, 1:]
+        # A jump through the far side of the circle is not a perfection
+        change &= np.abs(offsets[:, :-1]) + np.abs(offsets[:, 1:]) < 180.0
+        rows, columns = np.nonzero(change)
+        body.append(np.full(rows.size, b))
+        target.append(candidates[rows])
+        i.append(columns)
+        d0.append(offsets[rows, columns])
+        d1.append(offsets[rows, columns + 1])
+    body, target, i, d0, d1 = (np.concatenate(values) for values in (body, target, i, d0, d1))
+    if body.size == 0:
+        return []
+    t = jds[i] + (jds[i + 1] - jds[i]) * d0 / (d0 - d1)
+
+    # One Newton step on the interpolated ephemeris (a few arc-seconds)
+    body_index = np.array([ephemeris.BODIES.index(name) for name in bodies])[body]
+    lon, _, speed = precision.interpolated_grid(t)
+    columns = np.arange(t.size)
+    error = ephemeris.signed_difference(lon[body_index, columns], targets[target])
+    step = error / np.where(np.abs(speed[body_index, columns]) > 1e-3, speed[body_index, columns], np.inf)
+    t = np.where(np.abs(step) < SAMPLE_STEP, t - step, t)
+
+    per_chart = len(POINTS) * OFFSET_ANGLES.size
+    return [{'row': int(target[n] // per_chart), 'body': int(body[n]),
+             'point': int(target[n] % per_chart // OFFSET_ANGLES.size),
+             'offset': int(target[n] % OFFSET_ANGLES.size), 'jd': float(t[n])}
+            for n in range(t.size)]
+
+
+# === Scheduler === #
+
+class TransitScheduler:
+    def __init__(self, store: ChartStore, sink, bodies: List[str] = TRANSIT_BODIES,
+                 lookahead: float = LOOKAHEAD_DAYS, segment: float = SEGMENT_DAYS,
+                 lead: float = LEAD_DAYS, interval: float = 60.0):
+        self.store = store
+        self.sink = sink
+        self.bodies = list(bodies)
+        self.lookahead = lookahead
+        self.segment = segment
+        self.lead = lead
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.heap = []                  # (due jd, sequence, chart version, event)
+        self.sequence = itertools.count()
+        self.fingerprints = {}          # chart id -> (jd, lat, lon)
+        self.versions = {}              # chart id -> version; older heap entries are stale
+        self.natal = {}                 # chart id -> (points,) longitudes
+        self.segments = []              # (jds, lons) of the covered horizon
+        self.horizon = None
+        self.data_version = None
+        self.stats = {'emitted': 0, 'stale': 0, 'recomputed': 0, 'segments': 0, 'sink_errors': 0,
+                      'last_tick_ms': 0.0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='transit-scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Transit scheduler tick failed: {e}")
+            self._stop.wait(self.interval)
+
+    def tick(self, now: Optional[float] = None) -> int:
+        """Pick up chart changes, extend the horizon and emit due events; returns events emitted.
+
+        Always tick from the same thread (the scheduler's own): data_version
+        is per connection and ChartStore keeps one connection per thread.
+        """
+        now = now_jd() if now is None else now
+        started = time.perf_counter()
+        with self.lock:
+            if self.horizon is None:
+                self.horizon = now
+            self.segments = [(jds, lons) for jds, lons in self.segments if jds[-1] >= now]
+            self._sync(now)
+            while self.horizon < now + self.lookahead:
+                self._extend()
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                _, _, version, event = heapq.heappop(self.heap)
+                if self.versions.get(event['chart_id']) != version:
+                    self.stats['stale'] += 1
+                    continue
+                due.append(event)
+        for event in due:
+            try:
+                self.sink.emit(event)
+                self.stats['emitted'] += 1
+            except Exception:
+                self.stats['sink_errors'] += 1
+        self.stats['last_tick_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return len(due)
+
+    def _sync(self, now: float):
+        """Recompute charts that were added or changed since the last tick"""
+        data_version = self.store.data_version()
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+        fingerprints = self.store.fingerprints()
+        removed = set(self.fingerprints) - set(fingerprints)
+        for chart_id in removed:
+            del self.versions[chart_id]
+            self.natal.pop(chart_id, None)
+        changed = [chart_id for chart_id, fingerprint in fingerprints.items()
+                   if self.fingerprints.get(chart_id) != fingerprint]
+        if removed or any(chart_id in self.fingerprints for chart_id in changed):
+            # Drop the events of deleted and changed charts now rather than as they come due
+            self.heap = [entry for entry in self.heap
+                         if self.versions.get(entry[3]['chart_id']) == entry[2] and entry[3]['chart_id'] not in changed]
+            heapq.heapify(self.heap)
+        self.fingerprints = fingerprints
+        if not changed:
+            return
+        natal = self.store.natal_longitudes(changed)
+        for chart_id in changed:
+            self.versions[chart_id] = self.versions.get(chart_id, 0) + 1
+            self.natal[chart_id] = np.array([natal.get(chart_id, {}).get(point, np.nan) for point in POINTS])
+        for jds, lons in self.segments:
+            self._schedule(changed, jds, lons, after=now)
+        self.stats['recomputed'] += len(changed)
+
+    def _extend(self):
+        """Cover one more segment beyond the horizon for every chart"""
+        start, end = self.horizon, self.horizon + self.segment
+        jds, lons = _sample(start, end, self.bodies)
+        self.segments.append((jds, lons))
+        self._schedule(list(self.natal), jds, lons, after=start)
+        self.horizon = end
+        self.stats['segments'] += 1
+
+    def _schedule(self, chart_ids: List[int], jds: np.ndarray, lons: np.ndarray, after: float):
+        for begin in range(0, len(chart_ids), BATCH_CHARTS):
+            batch = chart_ids[begin:begin + BATCH_CHARTS]
+            natal = np.array([self.natal[chart_id] for chart_id in batch])
+            for found in perfections(natal, jds, lons, self.bodies):
+                if found['jd'] < after:
+                    continue
+                chart_id = batch[found['row']]
+                event = {
+                    'chart_id': chart_id,
+                    'transit': self.bodies[found['body']],
+                    'natal': POINTS[found['point']],
+                    'aspect': OFFSET_NAMES[found['offset']],
+                    'time': ephemeris.jd_to_iso(found['jd']),
+                    'jd': found['jd']
+                }
+                heapq.heappush(self.heap, (found['jd'] - self.lead, next(self.sequence),
+                                           self.versions[chart_id], event))
+
+    def upcoming(self, chart_id: int, limit: int = 20) -> Optional[List[dict]]:
+        """The next scheduled perfections of one chart; None if the chart is unknown"""
+        with self.lock:
+            version = self.versions.get(chart_id)
+            if version is None:
+                return None
+            events = [entry for entry in self.heap if entry[3]['chart_id'] == chart_id and entry[2] == version]
+        return [event for _, _, _, event in heapq.nsmallest(limit, events)]
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, 'charts': len(self.versions), 'scheduled': len(self.heap),
+                    'horizon': ephemeris.jd_to_iso(self.horizon) if self.horizon is not None else None}
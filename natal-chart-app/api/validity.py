@@ -0,0 +1,176 @@
+import numpy as np
+from typing import Callable, Dict, Optional, Sequence
+
+import ephemeris
+from chartframe import ASCENDANT
+
+# Validity windows for chart responses: for each field group, the span of
+# request times (and of nearby locations) over which that group of a chart
+# stays exactly the same, so a client scrubbing a slider can skip requests
+# until the next boundary.
+#
+#   signs     sign of every point (bodies and Ascendant)
+#   houses    house every point falls in
+#   aspects   which pairs are in which aspect
+#
+# Body motion over the horizon is modelled from the speed and its change
+# (a cubic in time from the speeds one day either side), cusp motion comes
+# from the sidereal angle advancing at the sidereal rate through the
+# analytic Alcabitus cusps. Each group is then evaluated on a coarse grid
+# over the horizon and at every minute (requests are minute-resolution)
+# around each change, likewise for small lat/lon steps; all of it costs
+# three ephemeris calls per body.
+
+POINTS = ephemeris.BODIES + [ASCENDANT]
+
+HORIZON_DAYS = 1.0
+STEP_DAYS = 1.0 / 1440.0
+SIDEREAL_RATE = 360.98564736629  # degrees of RAMC per day
+
+NEIGHBOURHOOD_DEGREES = 5.0
+NEIGHBOURHOOD_STEP = 0.05
+
+# Samples are taken every COARSE_STEPS steps and densely only where something changes
+COARSE_STEPS = 15
+
+GROUPS = ('signs', 'houses', 'aspects')
+
+_FIRST, _SECOND = np.triu_indices(len(POINTS), 1)
+_ASPECT_ANGLES = np.array([a['angle'] for a in ephemeris.ASPECTS.values()], dtype=np.float64)
+_ASPECT_ORBS = np.array([a['orb'] for a in ephemeris.ASPECTS.values()], dtype=np.float64)
+
+
+def _states(body_lons: np.ndarray, armc: np.ndarray, lat: np.ndarray, eps: float,
+            groups: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Discrete chart state of each group, shaped (components, n)"""
+    asc, _ = ephemeris.ascendant_mc(armc, lat, eps)
+    lons = np.vstack([body_lons, asc[None, :]])              # (points, n)
+    states = {}
+    if 'signs' in groups:
+        states['signs'] = ephemeris.sign_index(lons)
+    if 'houses' in groups:
+        houses = ephemeris.assign_houses(lons, ephemeris.alcabitus_cusps(armc, lat, eps))
+        # The Ascendant is the first cusp; floating point noise must not move it to the 12th
+        houses[-1] = 1
+        states['houses'] = houses
+    if 'aspects' in groups:
+        diff = np.abs(ephemeris.signed_difference(lons[_FIRST], lons[_SECOND]))
+        within = np.abs(diff[:, None, :] - _ASPECT_ANGLES[None, :, None]) <= _ASPECT_ORBS[None, :, None]
+        # Aspect orbs don't overlap, so one aspect type (or -1) per pair
+        states['aspects'] = np.where(within.any(axis=1), within.argmax(axis=1), -1)
+    return states
+
+
+def _sample(evaluate: Callable[[np.ndarray], Dict[str, np.ndarray]], limit: int, coarse: int):
+    """States at integer offsets -limit..limit: every coarse-th one, plus every
+    offset inside the coarse intervals where a component changes.
+
+    Returns (offsets, states, center) with offsets sorted and center the
+    position of offset 0.
+    """
+    half = np.unique(np.append(np.arange(0, limit + 1, coarse), limit))
+    offsets = np.concatenate([-half[:0:-1], half])
+    states = evaluate(offsets)
+    center = half.size - 1
+
+    brackets = set()
+    for values in states.values():
+        changed = values != values[:, center:center + 1]
+        forward, backward = changed[:, center:], changed[:, :center + 1][:, ::-1]
+        brackets.update((center + forward.argmax(axis=1))[forward.any(axis=1)].tolist())
+        brackets.update((center - backward.argmax(axis=1))[backward.any(axis=1)].tolist())
+    fine = [np.arange(offsets[j] + 1, offsets[j + 1]) if j < center else np.arange(offsets[j - 1] + 1, offsets[j])
+            for j in brackets]
+    fine = np.concatenate(fine) if fine else np.empty(0, dtype=offsets.dtype)
+    if fine.size:
+        fine_states = evaluate(fine)
+        order = np.argsort(np.concatenate([offsets, fine]), kind='stable')
+        states = {group: np.concatenate([values, fine_states[group]], axis=1)[:, order]
+                  for group, values in states.items()}
+        offsets = np.concatenate([offsets, fine])[order]
+        center = int(np.searchsorted(offsets, 0))
+    return offsets, states, center
+
+
+def _unchanged_range(offsets: np.ndarray, states: np.ndarray, center: int):
+    """Offsets of the first and last sample equal to the center one; None if it never changes"""
+    changed = (states != states[:, center:center + 1]).any(axis=0)
+    forward = np.flatnonzero(changed[center:])
+    backward = np.flatnonzero(changed[:center + 1][::-1])
+    return (int(offsets[center - backward[0] + 1]) if backward.size else None,
+            int(offsets[center + forward[0] - 1]) if forward.size else None)
+
+
+def _time_window(first, last, jd: float) -> Dict[str, Optional[str]]:
+    return {
+        'start': ephemeris.jd_to_iso(jd + first * STEP_DAYS) if first is not None else None,
+        'end': ephemeris.jd_to_iso(jd + last * STEP_DAYS) if last is not None else None
+    }
+
+
+def _coordinate_range(first, last, value: float):
+    return [round(value + first * NEIGHBOURHOOD_STEP, 4) if first is not None else None,
+            round(value + last * NEIGHBOURHOOD_STEP, 4) if last is not None else None]
+
+
+def chart_validity(jd: float, lat: float, lon: float, groups: Sequence[str] = GROUPS,
+                   neighbourhood: bool = True) -> Dict:
+    """Validity windows of the requested field groups of the chart at (jd, lat, lon).
+
+    Times are the first and last minute (ISO, UTC) whose chart has the same
+    group; None means unchanged up to HORIZON_DAYS away. With neighbourhood,
+    'lat' and 'lon' give the range of each coordinate (the other held fixed)
+    over which the group is unchanged, None beyond NEIGHBOURHOOD_DEGREES.
+    Per-point sign and house windows are listed under 'points'.
+    """
+    groups = [group for group in GROUPS if group in groups]
+    eps = ephemeris.obliquity(jd)
+    armc0 = ephemeris.sidereal_time(jd) + lon
+
+    # Cubic motion model per body from speeds at jd - 1, jd, jd + 1
+    base = np.empty((len(ephemeris.BODIES), 4), dtype=np.float64)
+    for k, body in enumerate(ephemeris.BODIES):
+        lons, _, speeds = ephemeris.body_positions(body, [jd - 1.0, jd, jd + 1.0])
+        base[k] = (lons[1], speeds[1], (speeds[2] - speeds[0]) / 2.0, speeds[2] - 2.0 * speeds[1] + speeds[0])
+
+    def body_lons(days):
+        days = np.asarray(days, dtype=np.float64)[None, :]
+        return (base[:, :1] + base[:, 1:2] * days + base[:, 2:3] * days ** 2 / 2.0
+                + base[:, 3:4] * days ** 3 / 6.0) % 360.0
+
+    def along_time(steps):
+        days = steps * STEP_DAYS
+        return _states(body_lons(days), armc0 + SIDEREAL_RATE * days, np.full(steps.size, lat), eps, groups)
+
+    limit = int(round(HORIZON_DAYS / STEP_DAYS))
+    offsets, times, center = _sample(along_time, limit, COARSE_STEPS)
+    validity = {'horizon_days': HORIZON_DAYS}
+    for group in groups:
+        validity[group] = _time_window(*_unchanged_range(offsets, times[group], center), jd)
+
+    if neighbourhood:
+        now = body_lons([0.0])
+
+        def along_lat(steps):
+            lats = np.clip(lat + steps * NEIGHBOURHOOD_STEP, -90.0, 90.0)
+            return _states(np.repeat(now, steps.size, axis=1), np.full(steps.size, armc0), lats, eps, groups)
+
+        def along_lon(steps):
+            return _states(np.repeat(now, steps.size, axis=1), armc0 + steps * NEIGHBOURHOOD_STEP,
+                           np.full(steps.size, lat), eps, groups)
+
+        limit = int(round(NEIGHBOURHOOD_DEGREES / NEIGHBOURHOOD_STEP))
+        for axis, evaluate, value in (('lat', along_lat, lat), ('lon', along_lon, lon)):
+            steps, states, middle = _sample(evaluate, limit, COARSE_STEPS)
+            for group in groups:
+                validity[group][axis] = _coordinate_range(*_unchanged_range(steps, states[group], middle), value)
+
+    points = {}
+    for p, name in enumerate(POINTS):
+        windows = {group[:-1]: _time_window(*_unchanged_range(offsets, times[group][p:p + 1], center), jd)
+                   for group in ('signs', 'houses') if group in groups}
+        if windows:
+            points[name] = windows
+    if points:
+        validity['points'] = points
+    return validity